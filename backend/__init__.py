@@ -10,6 +10,8 @@ db = SQLAlchemy()
 
 def create_app(config_name=None):
     app = Flask(__name__, instance_relative_config=True)
+    from .multipart import IngestRequest
+    app.request_class = IngestRequest # Upload routes stream file parts straight to storage
 
     # Configuration
     # Default configuration
@@ -24,7 +26,7 @@ def create_app(config_name=None):
     # This ensures the database is always inside the project's 'instance' folder (e.g., 'D:\\projects\\photo_map_project\\instance\\')
     default_db_path = os.path.join(app.instance_path, 'photomap.db')
     # Ensure forward slashes for SQLite URI, especially on Windows.
-    default_sqlite_uri = f"sqlite:///{default_db_path.replace('\\', '/')}"
+    default_sqlite_uri = "sqlite:///" + default_db_path.replace('\\', '/')
 
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev_secret_key_should_be_random'),
@@ -33,7 +35,49 @@ def create_app(config_name=None):
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         # UPLOAD_FOLDER from .flaskenv ('backend/static/uploads') is relative to project root.
         # The default here is also relative to project root for consistency.
-        UPLOAD_FOLDER=os.environ.get('UPLOAD_FOLDER', 'backend/static/uploads')
+        UPLOAD_FOLDER=os.environ.get('UPLOAD_FOLDER', 'backend/static/uploads'),
+        # Batch uploads: files accepted per request and processes used for EXIF work
+        MAX_BATCH_FILES=int(os.environ.get('MAX_BATCH_FILES', '500')),
+        EXIF_POOL_WORKERS=int(os.environ.get('EXIF_POOL_WORKERS', '0')) or None,
+        # Entries in the content-hash -> extracted location cache used for deduplication
+        LOCATION_CACHE_SIZE=int(os.environ.get('LOCATION_CACHE_SIZE', '10000')),
+        # Deepest zoom served from precomputed clusters; deeper zooms return single photos
+        CLUSTER_MAX_ZOOM=int(os.environ.get('CLUSTER_MAX_ZOOM', '16')),
+        # Encoded vector tiles kept in memory, and how long clients may reuse one before revalidating
+        TILE_CACHE_BYTES=int(os.environ.get('TILE_CACHE_BYTES', str(64 * 1024 * 1024))),
+        TILE_MAX_AGE=int(os.environ.get('TILE_MAX_AGE', '60')),
+        # Originals whose path, size and ETag are kept in memory for /api/images/<id>/original
+        ORIGINAL_CACHE_SIZE=int(os.environ.get('ORIGINAL_CACHE_SIZE', '4096')),
+        # Internal nginx location aliased to UPLOAD_FOLDER; when set, originals are sent with X-Accel-Redirect
+        ORIGINAL_ACCEL_REDIRECT=os.environ.get('ORIGINAL_ACCEL_REDIRECT', ''),
+        # Largest grid /api/heatmap computes, in cells per side
+        HEATMAP_MAX_RESOLUTION=int(os.environ.get('HEATMAP_MAX_RESOLUTION', '256')),
+        # Job kinds queued with every upload and run by `flask run-worker`
+        POST_UPLOAD_JOBS=[kind for kind in os.environ.get('POST_UPLOAD_JOBS', 'derivatives,exif').split(',') if kind],
+        # Offline reverse geocoder dataset (built with `flask build-geocoder`); skipped if missing
+        GEOCODER_PATH=os.environ.get('GEOCODER_PATH', os.path.join(app.instance_path, 'places.bin')),
+        GEOCODER_MAX_DISTANCE_KM=float(os.environ.get('GEOCODER_MAX_DISTANCE_KM', '100')),
+        # SQLite engine tuning (see database.py); SQLITE_TUNING=0 keeps driver defaults
+        SQLITE_TUNING=os.environ.get('SQLITE_TUNING', '1') == '1',
+        SQLITE_JOURNAL_MODE=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        SQLITE_SYNCHRONOUS=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        SQLITE_BUSY_TIMEOUT_MS=int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '10000')),
+        SQLITE_CACHE_SIZE_KB=int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(64 * 1024))),
+        SQLITE_MMAP_SIZE=int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        SQLITE_POOL_SIZE=int(os.environ.get('SQLITE_POOL_SIZE', '10')),
+        # Resumable uploads (/api/uploads): largest announced size, and idle time before a session is dropped
+        RESUMABLE_MAX_BYTES=int(os.environ.get('RESUMABLE_MAX_BYTES', str(4 * 1024 ** 3))),
+        RESUMABLE_SESSION_TTL=int(os.environ.get('RESUMABLE_SESSION_TTL', str(24 * 3600))),
+        # Asyncio server (backend/asgi.py): requests per group commit, threads for Flask-served routes
+        ASYNC_COMMIT_BATCH=int(os.environ.get('ASYNC_COMMIT_BATCH', '256')),
+        ASYNC_WSGI_WORKERS=int(os.environ.get('ASYNC_WSGI_WORKERS', '16')),
+        # Sampling profiler for requests sent with `X-Profile: 1` (or a random share of all requests)
+        PROFILER_ENABLED=os.environ.get('PROFILER_ENABLED', '0') == '1',
+        PROFILER_SAMPLE_RATE=float(os.environ.get('PROFILER_SAMPLE_RATE', '0')),
+        PROFILER_INTERVAL=float(os.environ.get('PROFILER_INTERVAL', '0.005')),
+        PROFILER_DIR=os.environ.get('PROFILER_DIR', os.path.join(app.instance_path, 'profiles')),
+        # Run db.create_all() at startup; turn off once the schema is managed separately
+        AUTO_CREATE_SCHEMA=os.environ.get('AUTO_CREATE_SCHEMA', '1') == '1'
     )
 
     # Load instance config if it exists, e.g., config.py
@@ -57,16 +101,63 @@ def create_app(config_name=None):
         app.logger.error(f"Error creating upload folder {absolute_upload_folder}: {e}")
 
     # Initialize extensions
+    from .database import configure_sqlite, install_pragmas, create_missing_indexes
+    configure_sqlite(app)
     db.init_app(app)
-    CORS(app) # Configure more strictly for production
+    # Configure more strictly for production. Scripts need to read the resumable upload headers.
+    CORS(app, expose_headers=['Location', 'Upload-Offset', 'Upload-Length'])
+
+    from .services.dedup import LocationCache
+    from .services.clustering import ClusterIndex
+    from .services.tile_cache import TileCache
+    from .services.geo_analytics import PointColumns
+    from .services.originals import OriginalCache
+    app.extensions['location_cache'] = LocationCache(app.config['LOCATION_CACHE_SIZE'])
+    app.extensions['cluster_index'] = ClusterIndex(app.config['CLUSTER_MAX_ZOOM'])
+    app.extensions['tile_cache'] = TileCache(app.config['TILE_CACHE_BYTES'])
+    app.extensions['point_columns'] = PointColumns()
+    app.extensions['original_cache'] = OriginalCache(app.config['ORIGINAL_CACHE_SIZE'])
+
+    from . import instrumentation
+    instrumentation.init_app(app) # Request timing, /metrics and the optional profiler
+
+    from .services.geocoder import ReverseGeocoder
+    app.extensions['geocoder'] = None
+    if os.path.exists(app.config['GEOCODER_PATH']):
+        try:
+            app.extensions['geocoder'] = ReverseGeocoder(
+                app.config['GEOCODER_PATH'], app.config['GEOCODER_MAX_DISTANCE_KM'])
+        except (OSError, ValueError) as e:
+            app.logger.error(f"Could not load reverse geocoder {app.config['GEOCODER_PATH']}: {e}")
 
     with app.app_context():
+        install_pragmas(app)
         from . import models # Import models to ensure they are registered with SQLAlchemy
-        db.create_all()     # Create database tables for all models
+        from . import spatial # Registers the R*Tree DDL that accompanies the images table
+        from .signals import images_reset
+
+        # In-memory indexes catch up with new rows by id on each request; a
+        # recreated table empties them
+        @images_reset.connect_via(app)
+        def reset_indexes(sender):
+            sender.extensions['cluster_index'].reset()
+            sender.extensions['tile_cache'].clear()
+            sender.extensions['point_columns'].reset()
+            sender.extensions['original_cache'].clear()
+
+        if app.config['AUTO_CREATE_SCHEMA']:
+            db.create_all()     # Create database tables for all models
+            create_missing_indexes()
+            spatial.ensure_spatial_index()
+
+        from . import jobs # Registers the background job handlers
 
         from . import routes # Import and register blueprints
         app.register_blueprint(routes.bp)
 
+    from .cli import register_commands
+    register_commands(app)
+
     @app.route('/hello-init') # Test route
     def hello_init():
         return 'Hello from backend/__init__.py!'
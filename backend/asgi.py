@@ -0,0 +1,8 @@
+# Entry point for ASGI servers, e.g.:
+#   uvicorn backend.asgi:app --host 0.0.0.0 --port 5000
+# Upload routes run on the event loop; all other routes are served by the
+# Flask app from backend/__init__.py:create_app().
+
+from backend.async_app import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,409 @@
+"""Asyncio server for the /api routes (entry point: ``backend/asgi.py``).
+
+The upload routes run natively on the event loop: multipart bodies are parsed
+as they arrive and every file part is streamed straight into its temp file
+(each chunk written from a thread), Pillow work goes to the shared process
+pool, and rows go through ``CommitQueue``, a single writer thread that
+commits whatever has queued up in one transaction. A slow client therefore
+holds a coroutine, not a worker thread.
+
+Every other route is served by the Flask app through a WSGI adapter, so both
+servers expose the same API and share one database, caches and signals.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.endpoints import HTTPEndpoint
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.utils import secure_filename
+
+from . import create_app, db
+from .routes import INVALID_FORMAT_MESSAGE, SAVE_ERROR_MESSAGE, allowed_file, file_extension, new_temp_path
+from .services.image_processor import process_image_data
+from .services.ingest import IngestWriter
+from .services.pool import get_executor
+from .uploads import UploadBatch, add_images, saved_outcomes, remove_file
+
+NO_FILE_MESSAGE = 'No image file provided'
+
+class MultipartError(ValueError):
+    pass
+
+class FilePart:
+    """One file field of a multipart body, streamed into a temp file."""
+
+    def __init__(self, filename, mime_type):
+        self.filename = filename
+        self.mime_type = mime_type
+        self.error = None
+        self.temp_path = None
+        self.writer = None
+        self.stored = None
+
+def _header_value(value):
+    return value.decode('utf-8', 'replace')
+
+async def receive_files(request, field_name, upload_folder, max_files, ignore_extra=False):
+    """Parses a multipart body as it arrives and streams the files sent under
+    ``field_name`` into temp files in ``upload_folder``.
+
+    Returns the FileParts in request order. Parts with an empty or disallowed
+    filename carry an ``error`` and no file. More than ``max_files`` parts
+    raise MultipartError, or are skipped if ``ignore_extra``. On any failure
+    the temp files written so far are removed.
+    """
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in options:
+        raise MultipartError(NO_FILE_MESSAGE)
+
+    parts = []
+    events = []  # (kind, part, data) produced by the parser callbacks
+    headers = {}
+    header = {'field': b'', 'value': b''}
+    current = {'part': None}
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header['field'] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header['value'] += data[start:end]
+
+    def on_header_end():
+        headers[header['field'].lower()] = header['value']
+        header['field'] = header['value'] = b''
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b'content-disposition', b''))
+        current['part'] = None
+        if _header_value(disposition.get(b'name', b'')) != field_name or b'filename' not in disposition:
+            return
+        if len(parts) >= max_files:
+            if ignore_extra:
+                return
+            raise MultipartError(f'Too many files in one batch (maximum {max_files}).')
+        mime_type = _header_value(headers.get(b'content-type', b'')).split(';')[0].strip()
+        part = FilePart(_header_value(disposition[b'filename']), mime_type or None)
+        if part.filename == '':
+            part.error = 'No selected file'
+        elif not allowed_file(part.filename):
+            part.error = INVALID_FORMAT_MESSAGE
+        parts.append(part)
+        current['part'] = part
+        events.append(('begin', part, None))
+
+    def on_part_data(data, start, end):
+        part = current['part']
+        if part is not None and part.error is None:
+            events.append(('data', part, data[start:end]))
+
+    def on_part_end():
+        part = current['part']
+        if part is not None and part.error is None:
+            events.append(('end', part, None))
+        current['part'] = None
+
+    parser = MultipartParser(options[b'boundary'], {
+        'on_part_begin': on_part_begin,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await _apply_events(events, upload_folder)
+        parser.finalize()
+        await _apply_events(events, upload_folder)
+    except BaseException as e:
+        for part in parts:
+            if part.writer is not None:
+                part.writer.abort()
+            if part.temp_path is not None:
+                remove_file(part.temp_path)
+        if isinstance(e, MultipartParseError):
+            raise MultipartError('Malformed multipart body.') from e
+        raise
+    return parts
+
+async def _apply_events(events, upload_folder):
+    # File I/O runs in the thread pool; consecutive chunks of a part are joined
+    # so each network read costs at most one thread hop per file
+    pending_part, pending = None, []
+    for kind, part, data in events:
+        if kind == 'data' and part is pending_part:
+            pending.append(data)
+            continue
+        if pending:
+            await run_in_threadpool(pending_part.writer.write, b''.join(pending))
+        pending_part, pending = None, []
+        if kind == 'data':
+            pending_part, pending = part, [data]
+        elif kind == 'begin':
+            part.temp_path = new_temp_path(upload_folder)
+            part.writer = await run_in_threadpool(IngestWriter, part.temp_path)
+        elif kind == 'end':
+            part.stored = await run_in_threadpool(part.writer.close)
+            part.writer = None
+    if pending:
+        await run_in_threadpool(pending_part.writer.write, b''.join(pending))
+    events.clear()
+
+class CommitQueue:
+    """Funnels inserts from concurrent requests into one writer thread.
+
+    While a commit is in flight new submissions queue up and the next
+    transaction takes all of them (group commit), so SQLite sees a single
+    writer and one WAL sync per batch instead of requests contending for the
+    lock.
+    """
+
+    def __init__(self, flask_app, max_batch=256):
+        self.flask_app = flask_app
+        self.max_batch = max_batch
+        self._executor = None
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, rows):
+        """Inserts ``rows``, ``(image_kwargs, gps_data_found, duplicate)``
+        tuples, in one transaction and queues their post-upload jobs.
+
+        Returns ``(upload_result, location_entry)`` per row, or raises the
+        database error.
+        """
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(
+                    self._executor, self._commit_batch, [rows for rows, _ in batch])
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            for (_, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue  # The request went away
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def _commit_batch(self, batches):
+        try:
+            return self._commit(batches)
+        except Exception as e:
+            if len(batches) == 1:
+                self.flask_app.logger.error(f"Database error: {e}")
+                return [e]
+        # One bad request must not fail the others that shared its transaction
+        return [self._commit_batch([rows])[0] for rows in batches]
+
+    def _commit(self, batches):
+        with self.flask_app.app_context():
+            try:
+                records = [add_images(rows) for rows in batches]
+                db.session.flush()
+                outcomes = [saved_outcomes(batch_records, rows) for batch_records, rows in zip(records, batches)]
+                db.session.commit()
+                return outcomes
+            except Exception:
+                db.session.rollback()
+                raise
+
+def _in_app_context(flask_app, func, *args):
+    with flask_app.app_context():
+        return func(*args)
+
+async def run_in_app(flask_app, func, *args):
+    """Runs a blocking helper in the thread pool, inside an app context."""
+    return await run_in_threadpool(_in_app_context, flask_app, func, *args)
+
+async def locate(temp_path, gps_info, max_workers):
+    """Location dict for a received file, computed off the event loop.
+
+    With the GPS already parsed from the header only ``check_image`` opens
+    the file, which is cheap enough for a thread; full Pillow parsing goes
+    to the process pool.
+    """
+    if gps_info is not None:
+        return await run_in_threadpool(process_image_data, temp_path, gps_info=gps_info)
+    future = get_executor(max_workers).submit(process_image_data, temp_path)
+    return await asyncio.wrap_future(future)
+
+async def store_uploads(state, parts):
+    """Runs received parts through an ``UploadBatch``, like the Flask upload
+    routes, with Pillow work gathered on the process pool and the insert
+    joining a group commit. Returns ``UploadBatch.results``."""
+    flask_app = state.flask_app
+    metrics = flask_app.extensions['metrics']
+    batch = UploadBatch(metrics)
+    for part in parts:
+        if part.error is None:
+            metrics.received(part.stored['size'])
+            batch.add(secure_filename(part.filename), file_extension(part.filename), part.mime_type,
+                      part.temp_path, part.stored)
+        else:
+            batch.reject(part.filename, part.error, 'no_file' if part.filename == '' else 'invalid_format')
+
+    await run_in_app(flask_app, batch.deduplicate)
+    with metrics.stage('exif'):
+        located = await asyncio.gather(
+            *(locate(temp_path, gps_info, flask_app.config['EXIF_POOL_WORKERS'])
+              for temp_path, gps_info in batch.pending()),
+            return_exceptions=True)
+    await run_in_app(flask_app, batch.locate, located)
+
+    rows = batch.rows()
+    if not rows:
+        return batch.results
+    try:
+        # Includes the wait for the group commit this request joins
+        with metrics.stage('db_commit'):
+            saved = await state.commit_queue.submit(rows)
+    except Exception:
+        await run_in_app(flask_app, batch.failed_to_save)
+        return batch.results
+    await run_in_app(flask_app, batch.saved, saved)
+    return batch.results
+
+class UploadImage(HTTPEndpoint):
+    async def post(self, request):
+        state = request.app.state
+        try:
+            parts = await receive_files(request, 'image', state.flask_app.config['UPLOAD_FOLDER'],
+                                        max_files=1, ignore_extra=True)
+        except MultipartError as e:
+            state.metrics.failed('malformed_request')
+            return JSONResponse({'error': str(e)}, status_code=400)
+        except OSError as e:
+            state.flask_app.logger.error(f"Error saving file: {e}")
+            state.metrics.failed('save_failed')
+            return JSONResponse({'error': SAVE_ERROR_MESSAGE}, status_code=500)
+        if not parts:
+            state.metrics.failed('no_file')
+            return JSONResponse({'error': NO_FILE_MESSAGE}, status_code=400)
+
+        result = (await store_uploads(state, parts))[0]
+        if 'error' in result:
+            return JSONResponse({'error': result['error']}, status_code=result['status'])
+        return JSONResponse(result, status_code=201)
+
+class UploadImages(HTTPEndpoint):
+    async def post(self, request):
+        state = request.app.state
+        config = state.flask_app.config
+        try:
+            parts = await receive_files(request, 'images', config['UPLOAD_FOLDER'],
+                                        max_files=config['MAX_BATCH_FILES'])
+        except MultipartError as e:
+            state.metrics.failed('malformed_request')
+            return JSONResponse({'error': str(e)}, status_code=400)
+        except OSError as e:
+            state.flask_app.logger.error(f"Error saving file: {e}")
+            state.metrics.failed('save_failed')
+            return JSONResponse({'error': SAVE_ERROR_MESSAGE}, status_code=500)
+        if not parts:
+            state.metrics.failed('no_file')
+            return JSONResponse({'error': 'No image files provided'}, status_code=400)
+
+        results = await store_uploads(state, parts)
+        for result in results:
+            result.pop('status', None)
+        created = sum(1 for result in results if 'error' not in result)
+        return JSONResponse({
+            'results': results,
+            'created': created,
+            'failed': len(results) - created
+        }, status_code=201 if created else 400)
+
+class RequestTimer:
+    """ASGI middleware feeding the Flask app's request histogram for the
+    routes served here; Flask's own hooks only see the mounted routes."""
+
+    def __init__(self, app, metrics, endpoint):
+        self.app = app
+        self.metrics = metrics
+        self.endpoint = endpoint
+
+    async def __call__(self, scope, receive, send):
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.request_seconds.observe(
+                time.perf_counter() - start, endpoint=self.endpoint, method=scope['method'], status=status)
+
+def create_asgi_app(flask_app=None):
+    """Wraps ``flask_app`` (default: a new ``create_app()``) in the asyncio server."""
+    if flask_app is None:
+        flask_app = create_app()
+    commit_queue = CommitQueue(flask_app, max_batch=flask_app.config['ASYNC_COMMIT_BATCH'])
+
+    @asynccontextmanager
+    async def lifespan(app):
+        commit_queue.start()
+        yield
+        await commit_queue.stop()
+
+    # Same policy as CORS(app) on the Flask side, for the routes that bypass it
+    cors = Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    metrics = flask_app.extensions['metrics']
+    app = Starlette(routes=[
+        Route('/api/upload_image', UploadImage,
+              middleware=[cors, Middleware(RequestTimer, metrics=metrics, endpoint='api.upload_image')]),
+        Route('/api/upload_images', UploadImages,
+              middleware=[cors, Middleware(RequestTimer, metrics=metrics, endpoint='api.upload_images')]),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config['ASYNC_WSGI_WORKERS'])),
+    ], lifespan=lifespan)
+    app.state.flask_app = flask_app
+    app.state.commit_queue = commit_queue
+    app.state.metrics = metrics
+    return app
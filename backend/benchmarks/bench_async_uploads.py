@@ -0,0 +1,198 @@
+"""Load generator: many slow upload clients against the async and sync servers.
+
+Starts each server in a subprocess and drives it with ``--clients``
+concurrent connections that each trickle one image upload (``--chunk`` bytes
+every ``--interval`` seconds, like a phone on a poor uplink), starting a new
+upload as soon as the last one finishes. The sync baseline is the Flask app
+on a WSGI server with ``--threads`` request threads; the async server
+(backend/asgi.py under uvicorn) gets the same thread budget for the routes it
+forwards to Flask.
+
+Usage: python -m backend.benchmarks.bench_async_uploads [--clients 100] [--seconds 15] [--threads 16]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from .corpus import generate_corpus
+
+def serve_sync(fd, threads):
+    """The baseline: the Flask app on a WSGI server with a fixed pool of
+    request threads, the model of e.g. gunicorn's gthread worker. A request
+    holds its thread while its body is read."""
+    import logging
+    from werkzeug.serving import BaseWSGIServer
+    from backend import create_app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No access log
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer('127.0.0.1', 0, create_app(), fd=fd).serve_forever()
+
+# Socket buffers on both ends are pinned to ``--buffer`` bytes (accepted
+# connections inherit the listening socket's). Loopback otherwise autotunes
+# them to megabytes, so the kernels would absorb a queued slow client's whole
+# body before the server reads a byte; over a real network the data in
+# flight is bounded by the uplink.
+
+def listen_socket(rcvbuf=None):
+    sock = socket.socket()
+    if rcvbuf is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+def start_server(command, workdir, name, threads, rcvbuf=None):
+    """Runs ``python -m <command> --fd N`` on a fresh database and upload folder
+    in ``workdir``. Returns the process and its base URL once it answers."""
+    sock = listen_socket(rcvbuf)
+    base_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, f'{name}.db'),
+               UPLOAD_FOLDER=os.path.join(workdir, f'{name}-uploads'),
+               ASYNC_WSGI_WORKERS=str(threads),
+               POST_UPLOAD_JOBS='')
+    process = subprocess.Popen([sys.executable, '-m'] + command + ['--fd', str(sock.fileno())],
+                               env=env, pass_fds=[sock.fileno()])
+    sock.close()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'{base_url}/api/dedup/stats', timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{command[0]} did not start')
+
+def multipart_body(name, data):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{name}"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n').encode()
+    return f'multipart/form-data; boundary={boundary}', head + data + f'\r\n--{boundary}--\r\n'.encode()
+
+async def trickle(body, chunk, interval):
+    for offset in range(0, len(body), chunk):
+        yield body[offset:offset + chunk]
+        await asyncio.sleep(interval)
+
+async def drive(base_url, blobs, clients, seconds, chunk, interval, sndbuf):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=clients, max_keepalive_connections=clients),
+        socket_options=[(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)])
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, timeout=300) as client:
+        async def worker(n):
+            nonlocal errors
+            while time.monotonic() < deadline:
+                name, data = blobs[n % len(blobs)]
+                n += clients
+                content_type, body = multipart_body(name, data)
+                # An explicit length: WSGI servers do not read chunked request bodies
+                headers = {'Content-Type': content_type, 'Content-Length': str(len(body))}
+                start = time.perf_counter()
+                try:
+                    response = await client.post('/api/upload_image', headers=headers,
+                                                 content=trickle(body, chunk, interval))
+                    ok = response.status_code == 201
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+def report(label, latencies, errors, elapsed, server_cpu):
+    latencies = sorted(latencies)
+    def pct(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else float('nan')
+    print(f"{label}: {len(latencies) / elapsed:8,.1f} uploads/s  p50 {pct(0.5):7.0f} ms  "
+          f"p99 {pct(0.99):7.0f} ms  errors {errors}  "
+          f"server CPU {server_cpu * 1000 / max(len(latencies), 1):.1f} ms/upload")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--seconds', type=float, default=15.0)
+    parser.add_argument('--threads', type=int, default=16, help='request threads of the sync baseline')
+    parser.add_argument('--chunk', type=int, default=32 * 1024, help='bytes sent per interval by each client')
+    parser.add_argument('--interval', type=float, default=0.1)
+    parser.add_argument('--buffer', type=int, default=16 * 1024, help='socket buffer size in bytes, see above')
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--width', type=int, default=1024, help='image width; noisy 1024px JPEGs are ~350 KiB')
+    parser.add_argument('--serve-sync', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--fd', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_sync:
+        serve_sync(args.fd, args.threads)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        paths = generate_corpus(os.path.join(workdir, 'corpus'), args.images,
+                                size=(args.width, args.width * 3 // 4), noise=True)
+        blobs = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                blobs.append((os.path.basename(path), f.read()))
+        average_kib = sum(len(data) for _, data in blobs) / len(blobs) / 1024
+        print(f"{args.clients} clients, ~{average_kib:.0f} KiB per image, "
+              f"{args.chunk // 1024} KiB every {args.interval * 1000:.0f} ms")
+
+        servers = (
+            (f'sync  (Flask, {args.threads} threads)', 'sync',
+             ['backend.benchmarks.bench_async_uploads', '--serve-sync', '--threads', str(args.threads)]),
+            ('async (backend.asgi)          ', 'async',
+             ['uvicorn', '--factory', 'backend.async_app:create_asgi_app',
+              '--log-level', 'warning', '--no-access-log']),
+        )
+        for label, name, command in servers:
+            process, base_url = start_server(command, workdir, name, args.threads, args.buffer)
+            before = resource.getrusage(resource.RUSAGE_CHILDREN)
+            try:
+                results = asyncio.run(drive(base_url, blobs, args.clients, args.seconds,
+                                            args.chunk, args.interval, args.buffer))
+            finally:
+                process.terminate()
+                process.wait()
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            report(label, *results, server_cpu=after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime)
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Throughput of /api/upload_images against N sequential /api/upload_image calls.
+
+Runs against the Flask test client with a file-backed SQLite database, so
+per-request commits pay their real fsync cost.
+
+Usage: python -m backend.benchmarks.bench_batch_upload [--count 500] [--batch-size 100]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from .corpus import generate_corpus
+
+def make_app(workdir, name):
+    # A fresh database and upload folder per run, so deduplication does not
+    # turn the second run into a series of cache hits
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, f'{name}.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, f'{name}-uploads')
+    from backend import create_app
+    return create_app()
+
+def load(paths):
+    blobs = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            blobs.append((os.path.basename(path), f.read()))
+    return blobs
+
+def run_single(client, blobs):
+    start = time.perf_counter()
+    for name, data in blobs:
+        response = client.post('/api/upload_image', content_type='multipart/form-data',
+                               data={'image': (BytesIO(data), name)})
+        assert response.status_code == 201, response.data
+    return time.perf_counter() - start
+
+def run_batch(client, blobs, batch_size):
+    start = time.perf_counter()
+    for offset in range(0, len(blobs), batch_size):
+        batch = blobs[offset:offset + batch_size]
+        response = client.post('/api/upload_images', content_type='multipart/form-data',
+                               data={'images': [(BytesIO(data), name) for name, data in batch]})
+        assert response.status_code == 201, response.data
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--png-ratio', type=float, default=0.25,
+                        help='share of PNGs, which need the Pillow fallback on the process pool')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        png_count = int(args.count * args.png_ratio)
+        paths = generate_corpus(os.path.join(workdir, 'jpg'), args.count - png_count)
+        paths += generate_corpus(os.path.join(workdir, 'png'), png_count, fmt='PNG')
+        blobs = load(paths)
+
+        single_s = run_single(make_app(workdir, 'single').test_client(), blobs)
+
+        client = make_app(workdir, 'batch').test_client()
+        run_batch(client, blobs[:10], 10)  # Warm up the process pool
+        batch_s = run_batch(client, blobs[10:], args.batch_size) * len(blobs) / (len(blobs) - 10)
+
+        print(f"files:              {len(blobs)} ({png_count} PNG)")
+        print(f"sequential singles: {single_s:.3f}s ({len(blobs) / single_s:,.0f} files/s)")
+        print(f"{f'batches of {args.batch_size}:':<20}{batch_s:.3f}s ({len(blobs) / batch_s:,.0f} files/s)")
+        print(f"speedup:            {single_s / batch_s:.1f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Viewport queries through the R*Tree index against a full table scan.
+
+Loads synthetic located rows into a file-backed SQLite database (the
+triggers keep the R*Tree in sync during the load), then times random
+city-sized viewports both ways.
+
+Usage: python -m backend.benchmarks.bench_bbox [--rows 1000000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+
+def make_app(workdir):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    from backend import create_app
+    return create_app()
+
+def load_rows(db, Image, rows, rng, batch=50000):
+    for offset in range(0, rows, batch):
+        db.session.execute(insert(Image), [
+            {
+                'original_filename': f'{i}.jpg',
+                'storage_filename': f'{i}.jpg',
+                'latitude': rng.uniform(-60, 70),
+                'longitude': rng.uniform(-180, 180),
+            }
+            for i in range(offset, min(offset + batch, rows))
+        ])
+        db.session.commit()
+
+def random_viewports(rng, count, span):
+    boxes = []
+    for _ in range(count):
+        lon = rng.uniform(-180, 180 - span)
+        lat = rng.uniform(-60, 70 - span)
+        boxes.append((lon, lat, lon + span, lat + span))
+    return boxes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--span', type=float, default=1.0, help='viewport width/height in degrees')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        app = make_app(workdir)
+        with app.app_context():
+            from backend import db
+            from backend.models import Image
+            from backend.spatial import images_in_bbox
+
+            rng = random.Random(42)
+            start = time.perf_counter()
+            load_rows(db, Image, args.rows, rng)
+            print(f"loaded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+            boxes = random_viewports(rng, args.queries, args.span)
+            scan_sql = text(
+                "SELECT * FROM images NOT INDEXED "
+                "WHERE longitude BETWEEN :a AND :c AND latitude BETWEEN :b AND :d ORDER BY id")
+
+            start = time.perf_counter()
+            indexed_counts = [len(images_in_bbox(*box)) for box in boxes]
+            indexed_s = time.perf_counter() - start
+            db.session.expunge_all()
+
+            start = time.perf_counter()
+            scan_counts = [
+                len(db.session.execute(scan_sql, dict(zip('abcd', box))).all()) for box in boxes
+            ]
+            scan_s = time.perf_counter() - start
+
+            assert indexed_counts == scan_counts
+            avg = sum(indexed_counts) / len(boxes)
+            print(f"viewports:  {len(boxes)} of {args.span} deg, {avg:.1f} matches on average")
+            print(f"R*Tree:     {indexed_s / len(boxes) * 1000:.2f} ms/query")
+            print(f"full scan:  {scan_s / len(boxes) * 1000:.2f} ms/query")
+            print(f"speedup:    {scan_s / indexed_s:.0f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Decode time and bytes served: derivatives against full-size originals.
+
+Times thumbnail generation with and without Pillow's draft() DCT-domain
+downscaling, then compares the bytes a client downloads for a thumbnail or
+preview with the original.
+
+Usage: python -m backend.benchmarks.bench_derivatives [--count 50] [--width 4000 --height 3000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from PIL import Image as PILImage
+
+from backend.services.derivatives import SIZES, generate_derivative
+from .corpus import generate_corpus
+
+def full_decode_thumbnail(source_path, dest_path, max_edge):
+    with PILImage.open(source_path) as img:
+        img.load()
+        img.thumbnail((max_edge, max_edge), PILImage.LANCZOS)
+        img.save(dest_path, 'JPEG', quality=82)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        paths = generate_corpus(os.path.join(workdir, 'originals'), args.count,
+                                size=(args.width, args.height), noise=True)
+        original_bytes = sum(os.path.getsize(p) for p in paths)
+        print(f"originals: {len(paths)} x {args.width}x{args.height}, "
+              f"{original_bytes / len(paths) / 1024:,.0f} KiB average")
+
+        for size_name, max_edge in SIZES.items():
+            out_dir = os.path.join(workdir, size_name)
+            os.makedirs(out_dir)
+
+            start = time.perf_counter()
+            for i, path in enumerate(paths):
+                full_decode_thumbnail(path, os.path.join(out_dir, f'full_{i}.jpg'), max_edge)
+            full_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i, path in enumerate(paths):
+                generate_derivative(path, os.path.join(out_dir, f'draft_{i}.jpg'), max_edge)
+            draft_s = time.perf_counter() - start
+
+            derived_bytes = sum(os.path.getsize(os.path.join(out_dir, f'draft_{i}.jpg')) for i in range(len(paths)))
+            print(f"{size_name} ({max_edge}px):")
+            print(f"  full decode: {full_s / len(paths) * 1000:7.1f} ms/image")
+            print(f"  draft():     {draft_s / len(paths) * 1000:7.1f} ms/image ({full_s / draft_s:.1f}x faster)")
+            print(f"  bytes served: {derived_bytes / len(paths) / 1024:,.1f} KiB vs "
+                  f"{original_bytes / len(paths) / 1024:,.0f} KiB original "
+                  f"({original_bytes / derived_bytes:.0f}x smaller)")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
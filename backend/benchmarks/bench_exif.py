@@ -0,0 +1,55 @@
+"""Compares the header-only GPS parser with the Pillow EXIF path.
+
+Usage: python -m backend.benchmarks.bench_exif [--count 3000]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from backend.services.exif_header import read_gps_info
+from backend.services.image_processor import get_exif_data, get_lat_lon
+from .corpus import generate_corpus
+
+def time_it(fn, paths):
+    start = time.perf_counter()
+    results = [fn(p) for p in paths]
+    return time.perf_counter() - start, results
+
+def pillow_lat_lon(path):
+    return get_lat_lon(get_exif_data(path))
+
+def header_lat_lon(path):
+    gps_info = read_gps_info(path)
+    return get_lat_lon({'GPSInfo': gps_info} if gps_info else {})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=3000)
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=768)
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        paths = generate_corpus(corpus_dir, args.count, size=(args.width, args.height))
+        # Warm the page cache so both runs measure parsing, not disk
+        time_it(header_lat_lon, paths)
+
+        pillow_s, pillow_results = time_it(pillow_lat_lon, paths)
+        header_s, header_results = time_it(header_lat_lon, paths)
+
+        mismatches = sum(
+            1 for a, b in zip(pillow_results, header_results)
+            if (a[0] is None) != (b[0] is None) or (a[0] is not None and abs(a[0] - b[0]) > 1e-9)
+        )
+        print(f"images:           {len(paths)}")
+        print(f"pillow path:      {pillow_s:.3f}s ({len(paths) / pillow_s:,.0f} img/s)")
+        print(f"header-only path: {header_s:.3f}s ({len(paths) / header_s:,.0f} img/s)")
+        print(f"speedup:          {pillow_s / header_s:.1f}x")
+        print(f"mismatches:       {mismatches}")
+    finally:
+        shutil.rmtree(corpus_dir)
+
+if __name__ == '__main__':
+    main()
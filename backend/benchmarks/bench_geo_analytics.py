@@ -0,0 +1,91 @@
+"""Heatmap and radius queries on the NumPy point columns versus plain Python.
+
+Builds PointColumns over synthetic photo locations clustered around a few
+hundred "cities", then times a world heatmap, a city-sized heatmap and
+/api/nearby-style radius queries. The same work done with a Python loop over
+the rows is timed on a sample for comparison.
+
+Usage: python -m backend.benchmarks.bench_geo_analytics [--points 1000000] [--queries 200]
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime
+
+from backend.services.geo_analytics import EARTH_RADIUS_KM, PointColumns
+
+UPLOADED = datetime(2024, 1, 1)
+
+def synthetic_points(count, rng):
+    cities = [(rng.uniform(-50, 60), rng.uniform(-180, 180)) for _ in range(300)]
+    for image_id in range(1, count + 1):
+        lat, lon = rng.choice(cities)
+        yield image_id, lat + rng.gauss(0, 0.2), max(-180.0, min(180.0, lon + rng.gauss(0, 0.2))), UPLOADED
+
+def python_heatmap(points, min_lon, min_lat, max_lon, max_lat, resolution):
+    grid = [[0] * resolution for _ in range(resolution)]
+    for _, lat, lon, _ in points:
+        if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+            row = min(int((max_lat - lat) / (max_lat - min_lat) * resolution), resolution - 1)
+            column = min(int((lon - min_lon) / (max_lon - min_lon) * resolution), resolution - 1)
+            grid[row][column] += 1
+    return grid
+
+def python_nearby(points, lat, lon, radius_km):
+    lat_r = math.radians(lat)
+    found = []
+    for image_id, plat, plon, _ in points:
+        dlat, dlon = math.radians(plat - lat), math.radians(plon - lon)
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat_r) * math.cos(math.radians(plat)) * math.sin(dlon / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+        if distance <= radius_km:
+            found.append((distance, image_id))
+    return sorted(found)
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--python-sample', type=int, default=100000,
+                        help='points the pure Python loops run over; their time is scaled up to --points')
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    points = list(synthetic_points(args.points, rng))
+    columns = PointColumns()
+    start = time.perf_counter()
+    columns.ensure_current(args.points, lambda after_id, until_id: points)
+    print(f"build: {args.points:,} points in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for image_id in range(args.points + 1, args.points + 10001):
+        row = (image_id, rng.uniform(-50, 60), rng.uniform(-180, 180), UPLOADED)
+        columns.ensure_current(image_id, lambda after_id, until_id: [row])
+    print(f"catch-up: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us per committed image")
+
+    sample = points[:args.python_sample]
+    scale = args.points / len(sample)
+    for label, bbox, resolution in (('world heatmap 256', (-180, -90, 180, 90), 256),
+                                    ('city heatmap 64', (2.0, 48.5, 2.8, 49.1), 64)):
+        seconds, _ = timed(lambda: columns.heatmap(*bbox, resolution), 5)
+        python_seconds, _ = timed(lambda: python_heatmap(sample, *bbox, resolution), 1)
+        print(f"{label:<20} numpy {seconds * 1e3:8.2f} ms   python ~{python_seconds * scale * 1e3:9.1f} ms")
+
+    queries = [(rng.uniform(-50, 60), rng.uniform(-180, 180)) for _ in range(args.queries)]
+    for radius in (1.0, 50.0, 1000.0):
+        start = time.perf_counter()
+        for lat, lon in queries:
+            columns.nearby(lat, lon, radius, limit=100)
+        seconds = (time.perf_counter() - start) / len(queries)
+        python_seconds, _ = timed(lambda: python_nearby(sample, *queries[0], radius), 1)
+        print(f"nearby {radius:>6.0f} km       numpy {seconds * 1e3:8.2f} ms   python ~{python_seconds * scale * 1e3:9.1f} ms")
+
+if __name__ == '__main__':
+    main()
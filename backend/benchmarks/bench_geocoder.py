@@ -0,0 +1,55 @@
+"""Lookup latency of the memory-mapped KD-tree reverse geocoder.
+
+Builds a dataset of synthetic places (GeoNames cities1000 has ~150k) and
+times single and batch lookups at random photo locations.
+
+Usage: python -m backend.benchmarks.bench_geocoder [--places 150000] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from backend.services.geocoder import ReverseGeocoder, build_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--places', type=int, default=150000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        path = os.path.join(workdir, 'places.bin')
+        places = [(f'place {i}', rng.uniform(-60, 70), rng.uniform(-180, 180)) for i in range(args.places)]
+        start = time.perf_counter()
+        build_dataset(places, path)
+        print(f"built {args.places:,} places in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(path) / 1024 / 1024:.1f} MiB)")
+
+        start = time.perf_counter()
+        geocoder = ReverseGeocoder(path, max_distance_km=500)
+        print(f"load (mmap): {(time.perf_counter() - start) * 1e6:.0f} us")
+
+        queries = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for lat, lon in queries:
+            geocoder.lookup(lat, lon)
+        single_s = time.perf_counter() - start
+        print(f"single lookups: {single_s / len(queries) * 1e6:.1f} us/lookup")
+
+        # Bursts of photos from the same spot, as in a camera-roll import
+        burst = [q for q in queries[:len(queries) // 10] for _ in range(10)]
+        start = time.perf_counter()
+        geocoder.lookup_many(burst)
+        batch_s = time.perf_counter() - start
+        print(f"batch lookups (10 photos per spot): {batch_s / len(burst) * 1e6:.1f} us/photo")
+        geocoder.close()
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Deep pages of /api/images: keyset cursor against OFFSET, objects against columns.
+
+Loads synthetic rows (spread over a year of upload times) into a
+file-backed SQLite database, then times the page at ``--depth`` rows both
+ways and compares the payload of the two response formats.
+
+Usage: python -m backend.benchmarks.bench_listing [--rows 500000] [--depth 400000] [--page 1000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+def make_app(workdir):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    from backend import create_app
+    return create_app()
+
+def load_rows(db, Image, rows, rng, batch=50000):
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, batch):
+        db.session.execute(insert(Image), [
+            {
+                'original_filename': f'{i}.jpg',
+                'storage_filename': f'{i}.jpg',
+                'uploaded_at': start + timedelta(seconds=int(i * 31536000 / rows)),
+                'latitude': rng.uniform(-60, 70),
+                'longitude': rng.uniform(-180, 180),
+            }
+            for i in range(offset, min(offset + batch, rows))
+        ])
+        db.session.commit()
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--depth', type=int, default=400000, help='rows skipped before the measured page')
+    parser.add_argument('--page', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        app = make_app(workdir)
+        with app.app_context():
+            from backend import db
+            from backend.models import Image
+            from backend.listing import encode_cursor
+
+            load_rows(db, Image, args.rows, random.Random(42))
+
+            # The cursor a client would hold after paging down to --depth
+            key, image_id = db.session.execute(
+                select(Image.uploaded_at, Image.id).order_by(Image.uploaded_at.desc(), Image.id.desc())
+                .offset(args.depth - 1).limit(1)).one()
+            with db.engine.connect() as conn:
+                raw_key = conn.exec_driver_sql('SELECT uploaded_at FROM images WHERE id = ?', (image_id,)).scalar()
+            cursor = encode_cursor(raw_key, image_id)
+
+            offset_stmt = (select(Image.id, Image.latitude, Image.longitude)
+                           .order_by(Image.uploaded_at.desc(), Image.id.desc())
+                           .offset(args.depth).limit(args.page))
+            offset_s, offset_rows = timed(lambda: db.session.execute(offset_stmt).all(), args.repeat)
+
+            client = app.test_client()
+            query = f'/api/images?limit={args.page}&fields=id,latitude,longitude&cursor={cursor}'
+            keyset_s, body = timed(lambda: client.get(query).data, args.repeat)
+            keyset_ids = [image['id'] for image in json.loads(body)['images']]
+            assert keyset_ids == [row.id for row in offset_rows]
+
+            columns_s, columns_body = timed(lambda: client.get(query + '&format=columns').data, args.repeat)
+
+            print(f"rows: {args.rows:,}, page of {args.page} at depth {args.depth:,}")
+            print(f"OFFSET query only:        {offset_s * 1000:8.2f} ms")
+            print(f"keyset request (objects): {keyset_s * 1000:8.2f} ms  {len(body):9,} bytes")
+            print(f"keyset request (columns): {columns_s * 1000:8.2f} ms  {len(columns_body):9,} bytes")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Request cost of /api/images/<id>/original versus a plain send_file route.
+
+Uploads a corpus, then fetches every original through the Flask test client:
+full bodies, 64 KiB ranges and If-None-Match revalidations. The baseline
+looks the row up and calls send_file on every request, as the derivative
+route does; the original route answers repeat requests from its metadata
+cache without touching the database.
+
+Usage: python -m backend.benchmarks.bench_originals [--count 200] [--rounds 5]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from flask import send_file
+
+from .corpus import generate_corpus
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        os.environ.update(DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+                          UPLOAD_FOLDER=os.path.join(workdir, 'uploads'), POST_UPLOAD_JOBS='')
+        from backend import create_app, db
+        from backend.models import Image
+        from backend.services.dedup import original_path
+        app = create_app()
+
+        @app.route('/baseline/<int:image_id>')
+        def baseline(image_id):
+            record = db.session.get(Image, image_id)
+            path = original_path(app.config['UPLOAD_FOLDER'], record.storage_filename, record.source_path)
+            return send_file(path, mimetype=record.mime_type, conditional=True, etag=record.content_hash)
+
+        client = app.test_client()
+        ids = []
+        for path in generate_corpus(os.path.join(workdir, 'corpus'), args.count, size=(1024, 768), noise=True):
+            with open(path, 'rb') as f:
+                data = {'image': (BytesIO(f.read()), os.path.basename(path))}
+            ids.append(client.post('/api/upload_image', content_type='multipart/form-data', data=data).json['imageId'])
+
+        etags = {image_id: client.get(f'/api/images/{image_id}/original').headers['ETag'] for image_id in ids}
+        cases = [
+            ('full body', lambda image_id: {}),
+            ('64 KiB range', lambda image_id: {'Range': 'bytes=65536-131071'}),
+            ('304 revalidation', lambda image_id: {'If-None-Match': etags[image_id]}),
+        ]
+        for label, headers in cases:
+            for name, url in (('send_file', '/baseline/{}'), ('original', '/api/images/{}/original')):
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    for image_id in ids:
+                        client.get(url.format(image_id), headers=headers(image_id)).close()
+                per_request = (time.perf_counter() - start) / (args.rounds * len(ids))
+                print(f"{label:<18} {name:<10} {per_request * 1e6:8.0f} us/request")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
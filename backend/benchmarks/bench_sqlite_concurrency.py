@@ -0,0 +1,108 @@
+"""Uploads and map reads from concurrent threads, with and without SQLite tuning.
+
+Writer threads post single images to /api/upload_image while reader threads
+poll /api/images?bbox=..., each against a file-backed database. The baseline
+run uses SQLITE_TUNING=0 (rollback journal, synchronous=FULL, driver
+defaults), the tuned run the WAL configuration from backend/database.py.
+
+Usage: python -m backend.benchmarks.bench_sqlite_concurrency [--writers 4] [--readers 4] [--seconds 5]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from .corpus import generate_corpus
+
+def make_app(workdir, name, tuned):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, f'{name}.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, f'{name}-uploads')
+    os.environ['SQLITE_TUNING'] = '1' if tuned else '0'
+    # The pool is not under test here; parsing inline keeps threads comparable
+    os.environ['POST_UPLOAD_JOBS'] = ''
+    from backend import create_app
+    return create_app()
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run(app, blobs, writers, readers, seconds):
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {'write': [], 'read': [], 'errors': 0}
+
+    def record(kind, elapsed, ok):
+        with lock:
+            if ok:
+                results[kind].append(elapsed)
+            else:
+                results['errors'] += 1
+
+    def writer(offset):
+        client = app.test_client()
+        n = offset
+        while not stop.is_set():
+            name, data = blobs[n % len(blobs)]
+            n += writers
+            start = time.perf_counter()
+            response = client.post('/api/upload_image', content_type='multipart/form-data',
+                                   data={'image': (BytesIO(data), name)})
+            record('write', time.perf_counter() - start, response.status_code == 201)
+
+    def reader():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get('/api/images?bbox=-180,-90,180,90&limit=200')
+            record('read', time.perf_counter() - start, response.status_code == 200)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+def report(label, results, seconds):
+    print(f"{label}:")
+    for kind in ('write', 'read'):
+        latencies = results[kind]
+        print(f"  {kind}s: {len(latencies) / seconds:8,.1f}/s  "
+              f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms")
+    print(f"  errors: {results['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--images', type=int, default=2000,
+                        help='distinct images to upload, so writes are not deduplicated')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        paths = generate_corpus(os.path.join(workdir, 'corpus'), args.images, size=(64, 64), noise=True)
+        blobs = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                blobs.append((os.path.basename(path), f.read()))
+
+        for label, tuned in (('baseline (SQLITE_TUNING=0)', False), ('tuned (WAL)', True)):
+            app = make_app(workdir, 'tuned' if tuned else 'baseline', tuned)
+            report(label, run(app, blobs, args.writers, args.readers, args.seconds), args.seconds)
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Synthetic image corpora for the benchmarks.
+
+Images are generated with Pillow so the benchmarks run anywhere without a
+checked-in photo collection. GPS coordinates are random but reproducible.
+"""
+import os
+import random
+from io import BytesIO
+from PIL import Image as PILImage, ExifTags
+
+def random_gps(rng):
+    """Returns a random GPS IFD dict in the shape Pillow writes."""
+    lat = rng.uniform(-85, 85)
+    lon = rng.uniform(-180, 180)
+    return {
+        1: 'N' if lat >= 0 else 'S',
+        2: _to_dms(abs(lat)),
+        3: 'E' if lon >= 0 else 'W',
+        4: _to_dms(abs(lon)),
+    }
+
+def _to_dms(value):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 2)
+    return (float(degrees), float(minutes), seconds)
+
+def make_image_bytes(fmt='JPEG', gps=None, size=(640, 480), color=(90, 120, 160), noise=False, tags=None):
+    """Encodes a single image, with a camera make and optional GPS IFD.
+
+    ``tags`` adds or overrides IFD0 tags, e.g. ``{0x0132: '2021:07:04 18:30:00'}``.
+
+    ``noise`` adds grain so the file size and decode cost resemble a real
+    photo rather than a flat colour field.
+    """
+    img = PILImage.new('RGB', size, color)
+    if noise:
+        grain = PILImage.effect_noise(size, 48).convert('RGB')
+        img = PILImage.blend(img, grain, 0.5)
+    exif = PILImage.Exif()
+    exif[0x010F] = 'BenchCam'
+    exif[0x0110] = 'Model 1'
+    for tag, value in (tags or {}).items():
+        exif[tag] = value
+    if gps is not None:
+        exif[ExifTags.IFD.GPSInfo] = gps
+    buf = BytesIO()
+    if fmt == 'JPEG':
+        img.save(buf, fmt, exif=exif, quality=85)
+    else:
+        img.save(buf, fmt)  # PNG/GIF: no EXIF, exercises the Pillow fallback
+    return buf.getvalue()
+
+def generate_corpus(directory, count, fmt='JPEG', gps_ratio=0.8, size=(640, 480), seed=1234, noise=False):
+    """Writes ``count`` images into ``directory`` and returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    ext = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}[fmt]
+    paths = []
+    for i in range(count):
+        gps = random_gps(rng) if rng.random() < gps_ratio else None
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        data = make_image_bytes(fmt, gps=gps, size=size, color=color, noise=noise)
+        path = os.path.join(directory, f"img_{i:06d}.{ext}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+    return paths
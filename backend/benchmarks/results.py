@@ -0,0 +1,104 @@
+"""Machine-readable benchmark results.
+
+A result file is JSON: ``{"meta": {...}, "results": {name: {...}}}``. Every
+result has a ``unit`` and a ``better`` direction (``lower`` for timings,
+``higher`` for throughput). Timings carry a distribution summary whose
+``p50`` is the value used for comparisons. ``compare`` lines up two files by
+result name, so runs from different commits or machines can be diffed.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import PIL
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(samples, unit='s'):
+    """Distribution summary of timing samples (lower is better)."""
+    values = sorted(samples)
+    return {
+        'unit': unit,
+        'better': 'lower',
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'min': values[0] if values else None,
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'p99': percentile(values, 0.99),
+        'max': values[-1] if values else None,
+    }
+
+def rate(count, seconds, unit='files/s'):
+    return {'unit': unit, 'better': 'higher', 'value': count / seconds if seconds else None,
+            'count': count, 'seconds': seconds}
+
+def headline(result):
+    """The single number compared across runs."""
+    return result['p50'] if 'p50' in result else result['value']
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+class Results:
+    def __init__(self, **settings):
+        self.meta = dict(environment(), settings=settings)
+        self.results = {}
+
+    def add(self, name, result):
+        self.results[name] = result
+        return result
+
+    def to_dict(self):
+        return {'meta': self.meta, 'results': self.results}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, current):
+    """Yields ``(name, baseline_value, current_value, change)`` for results in both
+    runs. ``change`` > 1 means slower/worse by that factor, < 1 better."""
+    for name, result in sorted(current['results'].items()):
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        old, new = headline(before), headline(result)
+        if not old or not new:
+            continue
+        change = new / old if result['better'] == 'lower' else old / new
+        yield name, old, new, change
+
+def format_value(value, unit):
+    if unit == 's':
+        if value < 1e-3:
+            return f'{value * 1e6:,.1f} us'
+        if value < 1:
+            return f'{value * 1e3:,.2f} ms'
+        return f'{value:,.2f} s'
+    return f'{value:,.1f} {unit}'
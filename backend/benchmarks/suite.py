@@ -0,0 +1,228 @@
+"""Upload-path benchmark suite with JSON results for comparing runs.
+
+Generates three synthetic corpora (JPEG with GPS EXIF, JPEG without GPS,
+PNG without EXIF) and measures:
+
+  micro.*       get_exif_data, get_decimal_from_dms, get_lat_lon, the
+                header-only read_gps_info and process_image_data, per call
+  client.*      /api/upload_image through the Flask test client, per corpus
+                (no network or server; the request path only)
+  server.*      /api/upload_image on a real local server in a subprocess,
+                driven by --clients concurrent connections over all corpora
+
+Post-upload jobs are not queued, so only the request path is measured.
+Results are written as JSON (see results.py). With --compare, each result is
+set against a previous file, and --max-regression makes the exit status fail
+when anything got slower by more than that factor.
+
+Usage: python -m backend.benchmarks.suite [--quick] [--only micro,client,server]
+                                          [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+import httpx
+
+from backend.services.exif_header import read_gps_info
+from backend.services.image_processor import get_exif_data, get_decimal_from_dms, get_lat_lon, process_image_data
+from . import results as bench_results
+from .bench_async_uploads import multipart_body, serve_sync, start_server
+from .corpus import generate_corpus
+
+SECTIONS = ('micro', 'client', 'server')
+
+# name -> generate_corpus arguments
+CORPORA = {
+    'jpeg-gps': {'fmt': 'JPEG', 'gps_ratio': 1.0, 'seed': 1},
+    'jpeg-nogps': {'fmt': 'JPEG', 'gps_ratio': 0.0, 'seed': 2},
+    'png': {'fmt': 'PNG', 'gps_ratio': 0.0, 'seed': 3},
+}
+
+def build_corpora(workdir, count, size, noise):
+    corpora = {}
+    for name, options in CORPORA.items():
+        paths = generate_corpus(os.path.join(workdir, 'corpus', name), count, size=size, noise=noise, **options)
+        blobs = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                blobs.append((os.path.basename(path), f.read()))
+        corpora[name] = {'paths': paths, 'blobs': blobs}
+    return corpora
+
+def time_calls(fn, inputs, rounds, inner=1):
+    """Per-call seconds for ``fn(*args)`` over ``inputs``, ``rounds`` times.
+
+    Functions that take well under a microsecond are called ``inner`` times
+    per sample, so the timer's own cost does not dominate.
+    """
+    samples = []
+    for _ in range(rounds):
+        for args in inputs:
+            start = time.perf_counter()
+            for _ in range(inner):
+                fn(*args)
+            samples.append((time.perf_counter() - start) / inner)
+    return samples
+
+def run_micro(corpora, rounds, record):
+    for name, corpus in corpora.items():
+        paths = [(path,) for path in corpus['paths']]
+        time_calls(read_gps_info, paths, 1)  # Warm the page cache
+        record(f'micro.get_exif_data[{name}]', time_calls(get_exif_data, paths, rounds))
+        record(f'micro.read_gps_info[{name}]', time_calls(read_gps_info, paths, rounds))
+        record(f'micro.process_image_data[{name}]', time_calls(process_image_data, paths, rounds))
+
+    exif = [get_exif_data(path) for path in corpora['jpeg-gps']['paths']]
+    gps = [data['GPSInfo'] for data in exif if 'GPSInfo' in data]
+    dms = [(info['GPSLatitude'], info['GPSLatitudeRef']) for info in gps]
+    dms += [(info['GPSLongitude'], info['GPSLongitudeRef']) for info in gps]
+    record('micro.get_decimal_from_dms', time_calls(get_decimal_from_dms, dms, rounds, inner=200))
+    record('micro.get_lat_lon[gps]', time_calls(get_lat_lon, [(data,) for data in exif], rounds, inner=200))
+    record('micro.get_lat_lon[no-gps]', time_calls(get_lat_lon, [({},)] * len(exif), rounds, inner=200))
+
+def make_app(workdir, name):
+    # A fresh database and upload folder, so earlier runs do not turn uploads into dedup hits
+    os.environ.update(DATABASE_URL='sqlite:///' + os.path.join(workdir, f'{name}.db'),
+                      UPLOAD_FOLDER=os.path.join(workdir, f'{name}-uploads'),
+                      POST_UPLOAD_JOBS='')
+    from backend import create_app
+    return create_app()
+
+def run_client(corpora, workdir, record, record_rate):
+    for name, corpus in corpora.items():
+        client = make_app(workdir, f'client-{name}').test_client()
+        latencies = []
+        started = time.perf_counter()
+        for filename, data in corpus['blobs']:
+            start = time.perf_counter()
+            response = client.post('/api/upload_image', content_type='multipart/form-data',
+                                   data={'image': (BytesIO(data), filename)})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 201, response.data
+        elapsed = time.perf_counter() - started
+        record(f'client.upload_image[{name}]', latencies)
+        record_rate(f'client.throughput[{name}]', len(latencies), elapsed)
+
+def run_server(corpora, workdir, clients, threads, record, record_rate):
+    blobs = [blob for corpus in corpora.values() for blob in corpus['blobs']]
+    command = ['backend.benchmarks.suite', '--serve', '--threads', str(threads)]
+    process, base_url = start_server(command, workdir, 'server', threads)
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(offset):
+        with httpx.Client(base_url=base_url, timeout=120) as http:
+            for filename, data in blobs[offset::clients]:
+                content_type, body = multipart_body(filename, data)
+                start = time.perf_counter()
+                try:
+                    response = http.post('/api/upload_image', content=body,
+                                         headers={'Content-Type': content_type})
+                    ok = response.status_code == 201
+                except httpx.HTTPError:
+                    ok = False
+                with lock:
+                    (latencies if ok else errors).append(time.perf_counter() - start)
+
+    try:
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    record('server.upload_image', latencies)
+    record_rate('server.throughput', len(latencies), elapsed)['errors'] = len(errors)
+
+def print_comparison(baseline, current, max_regression):
+    regressed = []
+    print(f"\ncompared with {baseline['meta'].get('commit') or '?'} ({baseline['meta'].get('timestamp')}):")
+    for name, old, new, change in bench_results.compare(baseline, current):
+        unit = current['results'][name]['unit']
+        flag = ''
+        if max_regression and change > max_regression:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"  {name:<40} {bench_results.format_value(old, unit):>14} -> "
+              f"{bench_results.format_value(new, unit):>14}  {change:5.2f}x{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', default=','.join(SECTIONS), help='comma-separated sections to run')
+    parser.add_argument('--count', type=int, default=100, help='images per corpus')
+    parser.add_argument('--width', type=int, default=1024, help='image width; noisy 1024px JPEGs are ~350 KiB')
+    parser.add_argument('--rounds', type=int, default=3, help='passes over each corpus in micro-benchmarks')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent connections to the server')
+    parser.add_argument('--threads', type=int, default=8, help='request threads of the server')
+    parser.add_argument('--quick', action='store_true', help='small corpora, one round: a smoke test')
+    parser.add_argument('--output', help='JSON result file (default: instance/benchmarks/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier JSON result file to compare with')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='exit with status 1 if a result is worse than --compare by more than this factor')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--fd', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_sync(args.fd, args.threads)
+        return
+    sections = [section.strip() for section in args.only.split(',') if section.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+    if args.quick:
+        args.count, args.width, args.rounds = min(args.count, 10), min(args.width, 320), 1
+
+    size = (args.width, args.width * 3 // 4)
+    run = bench_results.Results(count=args.count, size=list(size), rounds=args.rounds,
+                                clients=args.clients, threads=args.threads, sections=sections)
+
+    def record(name, samples):
+        result = run.add(name, bench_results.summarize(samples))
+        print(f"{name:<40} p50 {bench_results.format_value(result['p50'], 's'):>12}  "
+              f"p99 {bench_results.format_value(result['p99'], 's'):>12}  (n={result['count']})")
+        return result
+
+    def record_rate(name, count, seconds):
+        result = run.add(name, bench_results.rate(count, seconds))
+        print(f"{name:<40} {bench_results.format_value(result['value'], result['unit']):>16}")
+        return result
+
+    workdir = tempfile.mkdtemp(prefix='gosnapmap-bench-')
+    try:
+        corpora = build_corpora(workdir, args.count, size, noise=True)
+        if 'micro' in sections:
+            run_micro(corpora, args.rounds, record)
+        if 'client' in sections:
+            run_client(corpora, workdir, record, record_rate)
+        if 'server' in sections:
+            run_server(corpora, workdir, args.clients, args.threads, record, record_rate)
+    finally:
+        shutil.rmtree(workdir)
+
+    output = args.output
+    if output is None:
+        directory = os.path.join('instance', 'benchmarks')
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{run.meta['commit'] or 'unknown'}.json")
+    run.write(output)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        regressed = print_comparison(bench_results.load(args.compare), run.to_dict(), args.max_regression)
+        if regressed:
+            print(f"{len(regressed)} result(s) regressed by more than {args.max_regression}x")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Flask CLI commands (`flask <command>`), registered in create_app."""
+import click
+from flask.cli import with_appcontext
+
+@click.command('run-worker')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when the queue is empty.')
+@click.option('--once', is_flag=True, help='Drain the queue once and exit.')
+@with_appcontext
+def run_worker(poll_interval, once):
+    """Run queued post-upload jobs (the kinds in POST_UPLOAD_JOBS: derivatives, exif)."""
+    from .jobs import work
+    ran = work(poll_interval=poll_interval, once=once)
+    if once:
+        click.echo(f"Ran {ran} job(s).")
+
+@click.command('build-geocoder')
+@click.argument('geonames_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('out_path', type=click.Path(dir_okay=False), required=False)
+def build_geocoder(geonames_path, out_path):
+    """Build the reverse geocoder dataset from a GeoNames dump (e.g. cities1000.txt).
+
+    Writes to OUT_PATH, or to GEOCODER_PATH when omitted.
+    """
+    from flask import current_app
+    from .services.geocoder import build_dataset, read_geonames
+    out_path = out_path or current_app.config['GEOCODER_PATH']
+    count = build_dataset(read_geonames(geonames_path), out_path)
+    click.echo(f"Wrote {count} places to {out_path}.")
+
+@click.command('import-photos')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--mode', type=click.Choice(['copy', 'hardlink', 'reference']), default='copy', show_default=True,
+              help='Copy originals into UPLOAD_FOLDER, hardlink them there, or serve them from where they are.')
+@click.option('--batch-size', default=500, show_default=True, help='Files per transaction.')
+@click.option('--workers', type=int, default=None, help='Processes hashing and reading EXIF (default: EXIF_POOL_WORKERS).')
+@click.option('--jobs/--no-jobs', 'queue_jobs', default=True, show_default=True,
+              help='Queue post-upload jobs (derivatives, ...) for the imported photos.')
+@with_appcontext
+def import_photos(directory, mode, batch_size, workers, queue_jobs):
+    """Import every photo under DIRECTORY, skipping files imported before.
+
+    Safe to interrupt and rerun: each batch is committed together with its
+    entries in the import ledger.
+    """
+    import errno
+    from .photo_import import import_photos as run_import
+    try:
+        stats = run_import(directory, mode=mode, batch_size=batch_size, max_workers=workers,
+                           queue_jobs=queue_jobs, echo=click.echo)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        raise click.ClickException('UPLOAD_FOLDER is on another filesystem; hardlinks are impossible, use --mode copy.')
+    click.echo(stats.summary())
+
+@click.command('extract-exif')
+@click.option('--batch-size', default=500, show_default=True, help='Jobs per transaction.')
+@with_appcontext
+def extract_exif(batch_size):
+    """Queue 'exif' jobs for images stored before EXIF extraction existed."""
+    from . import db
+    from .database import batched_writes
+    from .jobs import enqueue
+    from .models import Image, Job
+    queued = db.session.query(Job.image_id).filter(Job.kind == 'exif', Job.status.in_(('queued', 'running')))
+    missing = (Image.query.filter(Image.exif_blob.is_(None), Image.id.notin_(queued))
+               .order_by(Image.id).yield_per(batch_size))
+    with batched_writes(batch_size) as batch:
+        for image in missing:
+            batch.add_all(enqueue(image, ['exif']))
+    click.echo(f"Queued {batch.committed} job(s); run `flask run-worker` to process them.")
+
+def register_commands(app):
+    app.cli.add_command(run_worker)
+    app.cli.add_command(build_geocoder)
+    app.cli.add_command(import_photos)
+    app.cli.add_command(extract_exif)
@@ -0,0 +1,128 @@
+"""SQLite storage-engine setup and write batching.
+
+``configure_sqlite`` runs inside create_app: it sets the engine options
+before the engine is created and applies per-connection pragmas as each
+pooled connection is opened. With the defaults, WAL lets readers proceed
+while a writer commits, ``synchronous=NORMAL`` drops the fsync on every
+commit (WAL stays consistent, at worst the last transactions are lost on
+power failure), and the busy timeout makes concurrent writers wait for the
+lock instead of failing with "database is locked".
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from . import db
+
+DEFAULT_BATCH_SIZE = 500
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+def is_memory_sqlite(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+def engine_options(config):
+    """SQLAlchemy engine options for the configured SQLite database."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    connect_args = dict(options.get('connect_args') or {})
+    # sqlite3's own busy handler, in seconds; the pragma below sets the same
+    connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0)
+    # Pooled connections are handed between request threads
+    connect_args.setdefault('check_same_thread', False)
+    options['connect_args'] = connect_args
+    if not is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        options.setdefault('pool_size', config['SQLITE_POOL_SIZE'])
+        options.setdefault('max_overflow', config['SQLITE_POOL_SIZE'])
+        options.setdefault('pool_pre_ping', False)
+    return options
+
+def connection_pragmas(config):
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),  # Negative means KiB
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('temp_store', 'MEMORY'),
+    ]
+    if not is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        pragmas.insert(0, ('journal_mode', config['SQLITE_JOURNAL_MODE']))
+    return pragmas
+
+def configure_sqlite(app):
+    """Call before db.init_app: sets SQLALCHEMY_ENGINE_OPTIONS for SQLite."""
+    config = app.config
+    if not config['SQLITE_TUNING'] or not is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config)
+
+def install_pragmas(app):
+    """Call after db.init_app, in an app context: applies the pragmas to every
+    new connection of the app's engine."""
+    config = app.config
+    if not config['SQLITE_TUNING'] or not is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return
+    pragmas = connection_pragmas(config)
+
+    @event.listens_for(db.engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def create_missing_indexes():
+    """Creates indexes declared on the models that an existing database lacks.
+
+    ``db.create_all()`` skips tables that already exist, indexes included.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+class WriteBatcher:
+    """Collects ORM objects and commits them ``batch_size`` at a time.
+
+    Each commit is one transaction (one WAL append and, with
+    synchronous=NORMAL, no fsync), instead of one per object.
+    """
+
+    def __init__(self, session, batch_size=DEFAULT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.pending = []
+        self.committed = 0
+
+    def add(self, obj):
+        self.pending.append(obj)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_all(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def flush(self):
+        """Commits whatever is pending. Returns the number of objects written."""
+        if not self.pending:
+            return 0
+        count = len(self.pending)
+        self.session.add_all(self.pending)
+        self.session.commit()
+        self.pending = []
+        self.committed += count
+        return count
+
+@contextmanager
+def batched_writes(batch_size=DEFAULT_BATCH_SIZE, session=None):
+    """Context manager yielding a WriteBatcher; commits the tail on exit and
+    rolls back the uncommitted batch if the block raises."""
+    batcher = WriteBatcher(session or db.session, batch_size)
+    try:
+        yield batcher
+        batcher.flush()
+    except Exception:
+        batcher.session.rollback()
+        raise
@@ -0,0 +1,142 @@
+"""Upload pipeline metrics, the /metrics endpoint and the request profiler.
+
+``init_app`` times every request and serves ``GET /metrics``. Upload code
+records through ``current_app.extensions['metrics']``, a ``PipelineMetrics``:
+
+    with metrics.stage('exif'):
+        location_data = process_image_data(...)
+
+With ``PROFILER_ENABLED`` set, a request carrying ``X-Profile: 1`` (or a
+random ``PROFILER_SAMPLE_RATE`` share of requests) runs under the sampling
+profiler and its collapsed stacks are written to ``PROFILER_DIR`` once the
+response has been closed, so streamed bodies are included.
+"""
+import os
+import random
+import time
+import uuid
+
+from flask import Response, current_app, g, request
+
+from . import db
+from .services.metrics import Registry, CONTENT_TYPE
+from .services.profiler import SamplingProfiler, format_collapsed
+
+STAGES = ('save', 'exif', 'geocode', 'db_commit')
+
+class PipelineMetrics:
+    def __init__(self):
+        self.registry = Registry()
+        self.request_seconds = self.registry.histogram(
+            'gosnapmap_http_request_duration_seconds', 'Time to produce a response, by endpoint.',
+            labels=('endpoint', 'method', 'status'))
+        self.stage_seconds = self.registry.histogram(
+            'gosnapmap_upload_stage_seconds',
+            'Time spent in each upload stage (save, exif, geocode, db_commit).', labels=('stage',))
+        self.upload_bytes = self.registry.counter(
+            'gosnapmap_upload_bytes_total', 'Bytes of uploaded files written to storage.')
+        self.uploads = self.registry.counter(
+            'gosnapmap_uploads_total', 'Uploaded files by outcome (created, duplicate, error).',
+            labels=('outcome',))
+        self.gps = self.registry.counter(
+            'gosnapmap_upload_gps_total', 'Stored uploads by whether GPS coordinates were found.',
+            labels=('found',))
+        self.errors = self.registry.counter(
+            'gosnapmap_upload_errors_total', 'Rejected or failed uploads by error class.',
+            labels=('error',))
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage."""
+        return self.stage_seconds.time(stage=name)
+
+    def received(self, size):
+        self.upload_bytes.inc(size)
+
+    def stored(self, gps_data_found, duplicate):
+        self.uploads.inc(outcome='duplicate' if duplicate else 'created')
+        self.gps.inc(found='true' if gps_data_found else 'false')
+
+    def failed(self, error_class):
+        self.uploads.inc(outcome='error')
+        self.errors.inc(error=error_class)
+
+def cache_and_queue_collector(app):
+    """Scrape-time gauges for the in-memory caches and the job queue."""
+    def collect():
+        from .models import Job
+        location = app.extensions['location_cache'].stats()
+        tiles = app.extensions['tile_cache'].stats()
+        originals = app.extensions['original_cache'].stats()
+        with app.app_context():
+            queued = dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
+        return [
+            ('gosnapmap_location_cache_lookups_total', 'counter', 'Deduplication lookups by outcome.',
+             [({'outcome': 'hit'}, location['hits']), ({'outcome': 'db_hit'}, location['db_hits']),
+              ({'outcome': 'miss'}, location['misses'])]),
+            ('gosnapmap_tile_cache_requests_total', 'counter', 'Vector tile cache lookups by outcome.',
+             [({'outcome': 'hit'}, tiles['hits']), ({'outcome': 'miss'}, tiles['misses'])]),
+            ('gosnapmap_tile_cache_bytes', 'gauge', 'Bytes of encoded tiles held in memory.',
+             [({}, tiles['bytes'])]),
+            ('gosnapmap_original_cache_requests_total', 'counter', 'Original file metadata cache lookups by outcome.',
+             [({'outcome': 'hit'}, originals['hits']), ({'outcome': 'miss'}, originals['misses'])]),
+            ('gosnapmap_jobs', 'gauge', 'Background jobs by status.',
+             [({'status': status}, queued.get(status, 0)) for status in ('queued', 'running', 'done', 'failed')]),
+        ]
+    return collect
+
+def _should_profile(app):
+    if request.headers.get('X-Profile') == '1':
+        return True
+    rate = app.config['PROFILER_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def init_app(app):
+    metrics = PipelineMetrics()
+    metrics.registry.add_collector(cache_and_queue_collector(app))
+    app.extensions['metrics'] = metrics
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if app.config['PROFILER_ENABLED'] and _should_profile(app):
+            g.profiler = SamplingProfiler(interval=app.config['PROFILER_INTERVAL']).start()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            metrics.request_seconds.observe(
+                time.perf_counter() - started,
+                endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            # Streamed bodies (listings, originals) are produced after this hook,
+            # so sampling runs until the server closes the response
+            name, label = profile_name(), f"{request.method} {request.path}"
+            response.headers['X-Profile-File'] = name
+            response.call_on_close(lambda: write_profile(app, profiler.stop(), name, label))
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request does not run if the view raised
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            write_profile(app, profiler.stop(), profile_name(), f"{request.method} {request.path}")
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.registry.render(), content_type=CONTENT_TYPE)
+
+def profile_name():
+    """File name for the current request's profile."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:8]}.folded"
+
+def write_profile(app, samples, name, label):
+    """Writes collapsed stacks to ``name`` in PROFILER_DIR. Runs after the
+    request context is gone for responses the server closes later."""
+    profile_dir = app.config['PROFILER_DIR']
+    os.makedirs(profile_dir, exist_ok=True)
+    with open(os.path.join(profile_dir, name), 'w') as f:
+        f.write(format_collapsed(samples))
+    app.logger.info(f"Profiled {label}: {sum(samples.values())} samples in {name}")
@@ -0,0 +1,189 @@
+"""Durable background jobs for post-upload work.
+
+Jobs are rows in the ``jobs`` table, inserted in the same transaction as the
+image they belong to, so an upload never commits without its follow-up work
+(or vice versa). ``flask run-worker`` claims and runs them outside of any
+request. Handlers are registered by kind and must be idempotent: a job whose
+worker died mid-run is picked up again once its lease expires.
+
+Reverse geocoding is not a job. The offline geocoder answers from a
+memory-mapped KD-tree in about 0.1 ms, which costs no more than inserting a
+job row. Doing it inline lets the upload response carry the address.
+"""
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from . import db
+from .models import Image, Job
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = timedelta(seconds=30)
+LEASE_TIMEOUT = timedelta(minutes=10)
+
+HANDLERS = {}
+
+def utcnow():
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP stores
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def handler(kind):
+    """Registers ``fn(image)`` as the handler for jobs of ``kind``."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def enqueue(image, kinds):
+    """Adds jobs for ``image`` to the current session; the caller commits."""
+    now = utcnow()
+    return [
+        Job(image=image, kind=kind, status='queued', attempts=0, created_at=now, run_after=now)
+        for kind in kinds
+        if kind in HANDLERS
+    ]
+
+def enqueue_post_upload(image):
+    return enqueue(image, current_app.config['POST_UPLOAD_JOBS'])
+
+def claim_next():
+    """Atomically moves the oldest runnable job to 'running' and returns it.
+
+    The conditional UPDATE is the lock: if another worker claimed the same
+    row first it matches nothing and we try the next candidate.
+    """
+    while True:
+        now = utcnow()
+        candidate = (
+            db.session.query(Job.id)
+            .filter(Job.status == 'queued', Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .first()
+        )
+        if candidate is None:
+            db.session.commit()
+            return None
+        claimed = (
+            db.session.query(Job)
+            .filter(Job.id == candidate.id, Job.status == 'queued')
+            .update({'status': 'running', 'attempts': Job.attempts + 1, 'updated_at': now},
+                    synchronize_session=False)
+        )
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, candidate.id)
+
+def run_job(job):
+    """Runs one claimed job and records the outcome, retrying with backoff."""
+    try:
+        HANDLERS[job.kind](job.image)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+        job.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_after = utcnow() + RETRY_BACKOFF * job.attempts
+    else:
+        job.status = 'done'
+        job.last_error = None
+    job.updated_at = utcnow()
+    db.session.commit()
+    return job.status
+
+def requeue_stale(lease_timeout=LEASE_TIMEOUT):
+    """Returns jobs stuck in 'running' longer than the lease to the queue.
+
+    A job that has used up its attempts is marked 'failed' instead: a worker
+    that keeps dying on it (out of memory, a crash in Pillow) must not take
+    down every worker that claims it next.
+    """
+    now = utcnow()
+    stale = db.session.query(Job).filter(Job.status == 'running', Job.updated_at < now - lease_timeout)
+    stale.filter(Job.attempts >= MAX_ATTEMPTS).update(
+        {'status': 'failed', 'last_error': 'Lease expired on the last attempt; the worker probably crashed',
+         'updated_at': now},
+        synchronize_session=False)
+    count = stale.filter(Job.attempts < MAX_ATTEMPTS).update(
+        {'status': 'queued', 'run_after': now}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def run_pending(limit=None):
+    """Runs queued jobs until none are runnable (or ``limit`` ran). Returns the count."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+def work(poll_interval=1.0, once=False):
+    """Worker loop: drains the queue, then sleeps ``poll_interval`` between polls."""
+    requeue_stale()
+    while True:
+        ran = run_pending()
+        if once:
+            return ran
+        if not ran:
+            time.sleep(poll_interval)
+            requeue_stale()
+
+def image_status(image):
+    """Summarises the jobs of one image: pending, failed or done."""
+    jobs = [
+        {'kind': job.kind, 'status': job.status, 'attempts': job.attempts, 'error': job.last_error}
+        for job in sorted(image.jobs, key=lambda j: j.id)
+    ]
+    statuses = {job['status'] for job in jobs}
+    if 'failed' in statuses:
+        overall = 'failed'
+    elif statuses - {'done'}:
+        overall = 'pending'
+    else:
+        overall = 'done'
+    return {'imageId': image.id, 'status': overall, 'jobs': jobs}
+
+# --- Handlers ---
+
+@handler('derivatives')
+def generate_derivatives(image):
+    from .services.derivatives import SIZES, get_derivative
+    for size_name in SIZES:
+        get_derivative(current_app.config['UPLOAD_FOLDER'], image.storage_filename, size_name,
+                       source_path=image.source_path)
+
+@handler('exif')
+def extract_exif(image):
+    """Stores the original's full EXIF and fills the columns that are searched on.
+
+    A duplicate upload copies them from an earlier row with the same content
+    instead of parsing the same bytes again.
+    """
+    from .services.dedup import original_path
+    from .services.exif_store import FIELDS, encode, extract_fields
+    from .services.image_processor import get_exif_data
+    if image.exif_blob is not None:
+        return
+    if image.content_hash is not None:
+        existing = (Image.query
+                    .filter(Image.content_hash == image.content_hash, Image.id != image.id,
+                            Image.exif_blob.isnot(None))
+                    .options(db.undefer(Image.exif_blob))
+                    .first())
+        if existing is not None:
+            image.exif_blob = existing.exif_blob
+            for name in FIELDS:
+                setattr(image, name, getattr(existing, name))
+            return
+    exif_data = get_exif_data(original_path(current_app.config['UPLOAD_FOLDER'], image.storage_filename,
+                                            image.source_path))
+    image.exif_blob = encode(exif_data)
+    for name, value in extract_fields(exif_data).items():
+        setattr(image, name, value)
@@ -0,0 +1,153 @@
+"""Keyset-paginated image listing.
+
+Pages are ordered by ``(uploaded_at, id)``, newest first by default, and
+each page starts after the last row of the previous one (an opaque cursor)
+instead of at an OFFSET, so every page is one range scan of
+``ix_images_uploaded_at_id`` however deep the client has paged. Only the
+requested columns are selected, rows are fetched in batches, and the JSON is
+written out as it is produced.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import select, type_coerce
+
+from . import db
+from .models import Image
+
+FETCH_BATCH = 1000
+
+# Public field name -> column
+FIELDS = {
+    'id': Image.id,
+    'filename': Image.original_filename,
+    'storageName': Image.storage_filename,
+    'latitude': Image.latitude,
+    'longitude': Image.longitude,
+    'address': Image.address,
+    'caption': Image.caption,
+    'uploadedAt': Image.uploaded_at,
+    'mimeType': Image.mime_type,
+    'fileSize': Image.file_size_bytes,
+    'takenAt': Image.taken_at,
+    'cameraMake': Image.camera_make,
+    'cameraModel': Image.camera_model,
+    'orientation': Image.orientation,
+}
+DEFAULT_FIELDS = ('id', 'filename', 'storageName', 'latitude', 'longitude', 'address', 'uploadedAt')
+FORMATS = ('objects', 'columns')
+
+def parse_fields(value):
+    """Parses ?fields=a,b,c. Raises ValueError on unknown names."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"unknown fields: {', '.join(unknown) or '(none)'}; choose from {', '.join(FIELDS)}")
+    return fields
+
+def sort_key():
+    # SQLite keeps DATETIME as text. The server default (CURRENT_TIMESTAMP)
+    # writes no fractional seconds but bound datetimes always carry them, so
+    # equal timestamps would not compare equal; compare the stored text
+    # instead. type_coerce adds no SQL, so the index still applies.
+    if db.engine.dialect.name == 'sqlite':
+        return type_coerce(Image.uploaded_at, db.String)
+    return Image.uploaded_at
+
+def encode_cursor(key, image_id):
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([key, image_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key, image_id = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('invalid cursor')
+    if not isinstance(key, str) or not isinstance(image_id, int):
+        raise ValueError('invalid cursor')
+    if db.engine.dialect.name != 'sqlite':
+        key = datetime.fromisoformat(key)
+    return key, image_id
+
+def page_rows(fields, limit, cursor=None, descending=True):
+    """Yields up to ``limit + 1`` rows of ``fields`` values followed by the
+    sort key and id; the extra row only tells the caller there is a next page."""
+    key = sort_key()
+    stmt = select(*(FIELDS[name] for name in fields), key.label('sort_key'), Image.id.label('sort_id'))
+    if cursor is not None:
+        position = db.tuple_(key, Image.id)
+        stmt = stmt.where(position < cursor if descending else position > cursor)
+    if descending:
+        stmt = stmt.order_by(key.desc(), Image.id.desc())
+    else:
+        stmt = stmt.order_by(key, Image.id)
+    result = db.session.execute(stmt.limit(limit + 1).execution_options(yield_per=FETCH_BATCH))
+    yield from result
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+def _page(rows, fields, limit):
+    """Splits ``page_rows`` output into field values and tracks the next cursor."""
+    state = {'count': 0, 'next_cursor': None}
+    width = len(fields)
+
+    def values():
+        last = None
+        for row in rows:
+            if state['count'] == limit:
+                state['next_cursor'] = encode_cursor(*last)
+                break
+            state['count'] += 1
+            last = (row[width], row[width + 1])
+            yield row[:width]
+    return values(), state
+
+def _footer(state):
+    return f',"count":{state["count"]},"nextCursor":{dumps(state["next_cursor"])}}}'
+
+def stream_objects(rows, fields, limit):
+    """``{"images": [{field: value}], "count", "nextCursor"}``, written in batches."""
+    values, state = _page(rows, fields, limit)
+    yield '{"images":['
+    separator = ''
+    batch = []
+    for row in values:
+        batch.append(dumps(dict(zip(fields, row))))
+        if len(batch) == FETCH_BATCH:
+            yield separator + ','.join(batch)
+            separator, batch = ',', []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']' + _footer(state)
+
+def stream_columns(rows, fields, limit):
+    """``{"fields": [...], "columns": {field: [values]}, "count", "nextCursor"}``.
+
+    Field names are sent once instead of once per row, which roughly halves
+    the payload for map clients. A column can only be written once every row
+    has been read, so rows are gathered into per-field lists (far lighter
+    than row dicts) and each column is written out in batches.
+    """
+    values, state = _page(rows, fields, limit)
+    columns = [list(column) for column in zip(*values)] or [[] for _ in fields]
+    yield f'{{"fields":{dumps(list(fields))},"columns":{{'
+    for n, (name, column) in enumerate(zip(fields, columns)):
+        yield f'{"," if n else ""}{dumps(name)}:['
+        for start in range(0, len(column), FETCH_BATCH):
+            yield ('' if start == 0 else ',') + dumps(column[start:start + FETCH_BATCH])[1:-1]
+        yield ']'
+    yield '}' + _footer(state)
@@ -1,11 +1,25 @@
 from . import db # Import db instance from backend/__init__.py
 
+def _not_sqlite(ddl, target, bind, **kw):
+    return bind.dialect.name != 'sqlite'
+
 class Image(db.Model):
     __tablename__ = 'images' # Explicit table name is good practice
+    __table_args__ = (
+        # Bounding-box fallback for databases without the SQLite R*Tree (see spatial.py)
+        db.Index('ix_images_lat_lon', 'latitude', 'longitude').ddl_if(callable_=_not_sqlite),
+        # Keyset pagination of the gallery listing (see listing.py)
+        db.Index('ix_images_uploaded_at_id', 'uploaded_at', 'id'),
+        # Metadata search (GET /api/images/search)
+        db.Index('ix_images_taken_at_id', 'taken_at', 'id'),
+        db.Index('ix_images_camera', 'camera_make', 'camera_model'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     original_filename = db.Column(db.Text, nullable=False)
-    storage_filename = db.Column(db.Text, nullable=False, unique=True)
+    # Content-addressed (<sha256>.<ext>), so re-uploads of the same photo share one blob
+    storage_filename = db.Column(db.Text, nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True) # SHA-256 hex digest of the file
     # Use db.func.now() for SQLAlchemy < 2.0, or datetime.utcnow for newer versions with appropriate dialect config
     uploaded_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
     latitude = db.Column(db.Float, nullable=True)
@@ -14,6 +28,78 @@ class Image(db.Model):
     caption = db.Column(db.Text, nullable=True)
     mime_type = db.Column(db.Text, nullable=True)
     file_size_bytes = db.Column(db.Integer, nullable=True)
+    # Absolute path of an original imported in place (`flask import-photos --mode reference`);
+    # None when the original is the blob in UPLOAD_FOLDER
+    source_path = db.Column(db.Text, nullable=True)
+    # Full EXIF, extracted once by the 'exif' job (services/exif_store.py). Deferred, so
+    # queries load the compressed blob only when it is accessed.
+    exif_blob = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    taken_at = db.Column(db.DateTime, nullable=True) # DateTimeOriginal, camera local time
+    camera_make = db.Column(db.Text, nullable=True)
+    camera_model = db.Column(db.Text, nullable=True)
+    orientation = db.Column(db.Integer, nullable=True) # EXIF orientation, 1-8
+
+    @property
+    def exif(self):
+        """The stored EXIF as a dict, decoded on access; None if not extracted yet."""
+        if self.exif_blob is None:
+            return None
+        from .services.exif_store import decode
+        return decode(self.exif_blob)
 
     def __repr__(self):
         return f'<Image {self.original_filename} (ID: {self.id})>'
+
+class ImportedFile(db.Model):
+    """Ledger of files loaded by `flask import-photos`, so a rerun skips them."""
+    __tablename__ = 'imported_files'
+
+    path = db.Column(db.Text, primary_key=True) # Absolute source path
+    image_id = db.Column(db.Integer, db.ForeignKey('images.id'), nullable=False, index=True)
+    imported_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    image = db.relationship('Image')
+
+    def __repr__(self):
+        return f'<ImportedFile {self.path} (image {self.image_id})>'
+
+class Job(db.Model):
+    """A unit of post-upload work, queued in the database and run by `flask run-worker`."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # The worker polls for the oldest runnable job in a given status
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('images.id'), nullable=False, index=True)
+    kind = db.Column(db.Text, nullable=False) # Handler name, e.g. 'derivatives'
+    status = db.Column(db.Text, nullable=False, default='queued') # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    run_after = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    image = db.relationship('Image', backref=db.backref('jobs', lazy='select'))
+
+    def __repr__(self):
+        return f'<Job {self.kind} for image {self.image_id} ({self.status})>'
+
+class UploadSession(db.Model):
+    """A resumable upload in progress (see resumable.py)."""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True) # Random hex token, also names the partial file
+    original_filename = db.Column(db.Text, nullable=False)
+    mime_type = db.Column(db.Text, nullable=True)
+    length = db.Column(db.Integer, nullable=False) # Total size announced by the client
+    offset = db.Column(db.Integer, nullable=False, default=0) # Bytes received so far
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), index=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('images.id'), nullable=True) # Set once finalized
+
+    image = db.relationship('Image')
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} ({self.offset}/{self.length} bytes)>'
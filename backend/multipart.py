@@ -0,0 +1,73 @@
+"""Request class that streams multipart file parts straight into storage.
+
+Werkzeug's form parser hands each file part to ``Request._get_file_stream``
+and, by default, spools it into a ``SpooledTemporaryFile`` (on disk above
+500 KB), which the upload routes would then copy a second time.
+``IngestRequest`` lets a view opt in before it touches ``request.files``:
+
+    request.stream_files(new_temp_path, accept=allowed_file)
+
+Every accepted part is then written to its own temp file through an
+``IngestWriter`` while the body is parsed, so each chunk is written, hashed
+and fed to the GPS header parser once, as it arrives. The ``FileStorage``
+in ``request.files`` carries an ``IngestedFile`` as its stream. Temp files
+that no view moved away are removed when the request is closed.
+"""
+import os
+
+from flask import Request
+
+from .services.ingest import IngestWriter
+
+class IngestedFile:
+    """Stream of a file part written to ``temp_path`` during parsing.
+
+    Werkzeug writes the part's chunks and seeks to 0 once it is complete;
+    ``stored`` is then the dict ``stream_to_storage`` would have returned.
+    """
+
+    def __init__(self, temp_path):
+        self.temp_path = temp_path
+        self.stored = None
+        self._writer = IngestWriter(temp_path)
+
+    def write(self, chunk):
+        self._writer.write(chunk)
+
+    def seek(self, offset, whence=0):
+        if self.stored is None:
+            self.stored = self._writer.close()
+        return 0
+
+    def close(self):
+        if self.stored is None:
+            self._writer.abort()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class IngestRequest(Request):
+    _temp_path = None
+    _accept = None
+
+    def stream_files(self, temp_path, accept):
+        """Streams file parts whose filename passes ``accept`` into paths from
+        ``temp_path()``. Must be called before ``files`` is first read."""
+        self._temp_path = temp_path
+        self._accept = accept
+        self._ingested = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self._temp_path is None or not filename or not self._accept(filename):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = IngestedFile(self._temp_path())
+        self._ingested.append(stream)
+        return stream
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            # Also covers parts written before the parser failed, which never
+            # reached ``files``
+            for stream in getattr(self, '_ingested', ()):
+                stream.close()
@@ -0,0 +1,195 @@
+"""Bulk import of an existing photo directory (`flask import-photos`).
+
+The tree is walked lazily with ``os.scandir`` and handled in chunks of
+``batch_size`` files. Each chunk is checked against the ``imported_files``
+ledger, hashed and located on the process pool (the next chunk is already
+running there while the current one is written), reverse geocoded in one
+``lookup_many`` call and committed in a single transaction together with its
+ledger rows. An interrupted import can therefore simply be run again: every
+committed file is skipped and nothing is half-imported.
+
+Modes:
+    copy       stream each file into UPLOAD_FOLDER under its content address
+               (the copy is written while the file is read for hashing)
+    hardlink   link the content-addressed name to the source; same filesystem only
+    reference  leave the file where it is and record it in ``Image.source_path``
+"""
+import errno
+import mimetypes
+import os
+import time
+
+from flask import current_app
+
+from .database import batched_writes
+from .jobs import enqueue_post_upload
+from .models import Image, ImportedFile
+from .routes import allowed_file, new_temp_path
+from .services.dedup import storage_filename_for, commit_blob
+from .services.ingest import ingest_file
+from .services.pool import get_executor
+from .uploads import fill_addresses, remove_file
+
+MODES = ('copy', 'hardlink', 'reference')
+DEFAULT_BATCH_SIZE = 500
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-9)
+        return (f"{self.imported} imported, {self.skipped} skipped, {self.failed} failed "
+                f"in {elapsed:.1f}s ({self.imported / elapsed:,.1f} files/s, "
+                f"{self.bytes / elapsed / 2**20:,.1f} MiB/s)")
+
+def scan(root, exclude=()):
+    """Yields absolute paths of importable files under ``root``, depth first.
+
+    Hidden files and directories are skipped, as are the directories in
+    ``exclude`` (e.g. UPLOAD_FOLDER when it lies inside ``root``). Directory
+    symlinks are not followed.
+    """
+    exclude = {os.path.realpath(path) for path in exclude}
+    stack = [os.path.abspath(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.realpath(entry.path) not in exclude:
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and allowed_file(entry.name):
+                        yield entry.path
+        except OSError as e:
+            current_app.logger.warning(f"Skipping unreadable directory {directory}: {e}")
+            continue
+        stack.extend(sorted(subdirs, reverse=True))
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _already_imported(paths):
+    rows = ImportedFile.query.with_entities(ImportedFile.path).filter(ImportedFile.path.in_(paths))
+    return {path for (path,) in rows}
+
+def _submit(executor, paths, mode, upload_folder):
+    submitted = []
+    for path in paths:
+        temp_path = new_temp_path(upload_folder) if mode == 'copy' else None
+        submitted.append((path, temp_path, executor.submit(ingest_file, path, temp_path)))
+    return submitted
+
+def _place_original(mode, source_path, temp_path, upload_folder, storage_filename):
+    """Puts the original where the new Image row will look for it. Returns ``source_path`` for the row."""
+    if mode == 'copy':
+        commit_blob(temp_path, upload_folder, storage_filename)
+    elif mode == 'hardlink':
+        final_path = os.path.join(upload_folder, storage_filename)
+        try:
+            os.link(source_path, final_path)
+        except FileExistsError:
+            pass
+    else:
+        return source_path
+    return None
+
+def _finish(submitted, mode, upload_folder, batch, stats, queue_jobs, echo):
+    """Collects a chunk's results from the pool and queues its rows on ``batch``."""
+    located = []
+    for path, temp_path, future in submitted:
+        try:
+            stored = future.result()
+            storage_filename = storage_filename_for(stored['content_hash'], path.rsplit('.', 1)[1].lower())
+            source_path = _place_original(mode, path, temp_path, upload_folder, storage_filename)
+        except Exception as e:
+            if temp_path is not None:
+                remove_file(temp_path)
+            if isinstance(e, OSError) and e.errno == errno.EXDEV:
+                raise # Hardlinks across filesystems fail for every file, not just this one
+            echo(f"Failed {path}: {e}")
+            stats.failed += 1
+            continue
+        stored.update(path=path, storage_filename=storage_filename, source_path=source_path)
+        located.append(stored)
+
+    fill_addresses(located)
+    for stored in located:
+        record = Image(
+            original_filename=os.path.basename(stored['path']),
+            storage_filename=stored['storage_filename'],
+            source_path=stored['source_path'],
+            content_hash=stored['content_hash'],
+            latitude=stored['latitude'],
+            longitude=stored['longitude'],
+            address=stored.get('address'),
+            mime_type=mimetypes.guess_type(stored['path'])[0],
+            file_size_bytes=stored['size'],
+        )
+        if queue_jobs:
+            enqueue_post_upload(record) # Attached through Image.jobs, saved with the ledger row
+        # The ledger row cascades to its image, so a file's rows never straddle two transactions
+        batch.add(ImportedFile(path=stored['path'], image=record))
+        stats.imported += 1
+        stats.bytes += stored['size']
+    batch.flush()
+
+def import_photos(root, mode='copy', batch_size=DEFAULT_BATCH_SIZE, max_workers=None,
+                  queue_jobs=True, echo=print, progress_interval=5.0):
+    """Imports every photo under ``root`` that is not in the ledger yet. Returns an ImportStats."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    executor = get_executor(max_workers or current_app.config['EXIF_POOL_WORKERS'])
+    stats = ImportStats()
+    last_report = stats.started
+
+    in_flight = [] # Chunks submitted to the pool and not written yet
+    with batched_writes(batch_size) as batch:
+        try:
+            for paths in _chunks(scan(root, exclude=[upload_folder]), batch_size):
+                done = _already_imported(paths)
+                stats.skipped += len(done)
+                in_flight.append(_submit(executor, [path for path in paths if path not in done], mode, upload_folder))
+                # The pool works on this chunk while the previous one is written
+                if len(in_flight) > 1:
+                    _finish(in_flight[0], mode, upload_folder, batch, stats, queue_jobs, echo)
+                    in_flight.pop(0)
+                if time.perf_counter() - last_report >= progress_interval:
+                    last_report = time.perf_counter()
+                    echo(stats.summary())
+            while in_flight:
+                _finish(in_flight[0], mode, upload_folder, batch, stats, queue_jobs, echo)
+                in_flight.pop(0)
+        finally:
+            # On an aborted import, wait for the pool so no temp copy is left behind
+            for submitted in in_flight:
+                for _, temp_path, future in submitted:
+                    future.cancel()
+                    if temp_path is not None:
+                        try:
+                            future.result()
+                        except Exception:
+                            pass
+                        remove_file(temp_path)
+    return stats
@@ -0,0 +1,113 @@
+"""Resumable chunked uploads.
+
+A client creates a session announcing the file name and size, sends the bytes
+in any number of PATCH requests, each starting at the offset the server has
+recorded, and then finalizes. After a dropped connection it asks for the
+current offset and carries on from there instead of starting over.
+
+Chunks are appended straight to ``UPLOAD_FOLDER/.upload-<id>.part``, on the
+same file system as the final blob. Finalizing reads the assembled file once
+to hash it and parse its GPS header, then renames it to its content address;
+it is never copied. Sessions live in the ``upload_sessions`` table, so any
+web process can take the next chunk.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from werkzeug.exceptions import ClientDisconnected
+
+from . import db
+from .jobs import utcnow
+from .models import UploadSession
+from .services.ingest import CHUNK_SIZE, stream_to_storage
+
+class OffsetConflict(Exception):
+    """The chunk does not start at the session's current offset."""
+
+class AlreadyClaimed(Exception):
+    """Another request is finalizing the session."""
+
+def session_path(upload_folder, session_id):
+    return os.path.join(upload_folder, f".upload-{session_id}.part")
+
+def expire_sessions(upload_folder, max_age):
+    """Deletes sessions idle for longer than ``max_age`` seconds and their partial files."""
+    cutoff = utcnow() - timedelta(seconds=max_age)
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for upload in stale:
+        if upload.image_id is None:
+            path = session_path(upload_folder, upload.id)
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.delete(upload)
+    db.session.commit()
+    return len(stale)
+
+def create_session(upload_folder, original_filename, length, mime_type=None):
+    os.makedirs(upload_folder, exist_ok=True)
+    now = utcnow()
+    upload = UploadSession(id=uuid.uuid4().hex, original_filename=original_filename, mime_type=mime_type,
+                           length=length, offset=0, created_at=now, updated_at=now)
+    open(session_path(upload_folder, upload.id), 'xb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+def append_chunk(upload_folder, upload, offset, stream, chunk_size=CHUNK_SIZE):
+    """Writes ``stream`` at ``offset`` of the session's file. Returns the new offset.
+
+    Raises OffsetConflict if ``offset`` is not where the session stands, and
+    ValueError if the data runs past the announced length. If the client
+    disconnects mid-chunk, the bytes that did arrive are kept and recorded
+    before the error propagates.
+    """
+    if offset != upload.offset:
+        raise OffsetConflict()
+    remaining = upload.length - offset
+    written = 0
+    disconnected = None
+    try:
+        with open(session_path(upload_folder, upload.id), 'r+b') as f:
+            f.seek(offset)
+            try:
+                while True:
+                    # One byte more than allowed, to notice an overlong chunk
+                    chunk = stream.read(min(chunk_size, remaining - written + 1))
+                    if not chunk:
+                        break
+                    if written + len(chunk) > remaining:
+                        raise ValueError('Chunk runs past the announced upload length.')
+                    f.write(chunk)
+                    written += len(chunk)
+            except ClientDisconnected as e:
+                disconnected = e
+    except FileNotFoundError:
+        # Finalize has already claimed the file
+        raise OffsetConflict()
+
+    # Compare-and-set, so two requests racing at the same offset cannot both advance it
+    updated = (UploadSession.query
+               .filter_by(id=upload.id, offset=offset)
+               .update({'offset': offset + written, 'updated_at': utcnow()}, synchronize_session=False))
+    db.session.commit()
+    if not updated:
+        raise OffsetConflict()
+    if disconnected is not None:
+        raise disconnected
+    return offset + written
+
+def claim_for_finalize(upload_folder, upload, temp_path):
+    """Moves the assembled file to ``temp_path`` and returns what ``stream_to_storage``
+    would have: size, content hash and GPS header tags.
+
+    The rename is atomic, so of two concurrent finalize requests only one gets
+    the file; the other raises AlreadyClaimed. Once the rename succeeded the
+    caller owns ``temp_path``, even if reading it fails.
+    """
+    try:
+        os.rename(session_path(upload_folder, upload.id), temp_path)
+    except FileNotFoundError:
+        raise AlreadyClaimed()
+    with open(temp_path, 'rb') as f:
+        return stream_to_storage(f, None)
@@ -1,99 +1,715 @@
 import os
 import uuid
-from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, stream_with_context
 from werkzeug.utils import secure_filename
-from .services.image_processor import process_image_data
+from werkzeug.wsgi import wrap_file
+from .services.pool import process_many
+from .services.dedup import original_path
 from . import db # Import db from backend/__init__.py
-from .models import Image
+from .models import Image, UploadSession
+from .uploads import UploadBatch, commit, remove_file, upload_result
+from .jobs import image_status
+from .resumable import (OffsetConflict, AlreadyClaimed, session_path, expire_sessions, create_session, append_chunk,
+                        claim_for_finalize)
+from .spatial import parse_bbox, images_in_bbox
+from .listing import (FORMATS as LISTING_FORMATS, parse_fields, decode_cursor, page_rows,
+                      stream_objects, stream_columns)
+from .services.clustering import project
+from .services.mvt import encode_points, tile_bounds, MEDIA_TYPE as MVT_MEDIA_TYPE
+from .services.derivatives import get_derivative
+from .services.originals import describe as describe_original
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+INVALID_FORMAT_MESSAGE = 'Invalid image format. Allowed formats: png, jpg, jpeg, gif'
+SAVE_ERROR_MESSAGE = 'Could not save uploaded file.'
+
 def allowed_file(filename):
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+           file_extension(filename) in ALLOWED_EXTENSIONS
+
+def file_extension(filename):
+    """Lower-cased extension of a client file name. Take it before
+    ``secure_filename``, which drops non-ASCII names down to e.g. ``'jpg'``."""
+    return filename.rsplit('.', 1)[1].lower()
+
+def new_temp_path(upload_folder=None):
+    """Returns a path in UPLOAD_FOLDER to stream an upload into before its hash is known."""
+    if upload_folder is None:
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.exists(upload_folder):
+        os.makedirs(upload_folder)
+    return os.path.join(upload_folder, f".{uuid.uuid4()}.part")
+
+def received_files():
+    """``request.files`` with every allowed file already written to its own
+    temp path as the body was parsed (see multipart.py): each file's stream
+    is an ``IngestedFile`` carrying ``temp_path`` and ``stored``."""
+    request.stream_files(new_temp_path, accept=allowed_file)
+    with current_app.extensions['metrics'].stage('save'):
+        return request.files
+
+def store_batch(batch, attach=None):
+    """Runs an ``UploadBatch`` to completion in this request: EXIF work on the
+    shared process pool, then one commit."""
+    batch.deduplicate()
+    # One 'exif' observation for the whole batch, which runs on the pool
+    with batch.metrics.stage('exif'):
+        locations = process_many(batch.pending(), max_workers=current_app.config['EXIF_POOL_WORKERS'])
+    batch.locate(locations)
+    commit(batch, attach)
+    return batch.results
+
+def store_received(temp_path, stored, original_filename, ext, mime_type, attach=None):
+    """Deduplicates, locates and inserts a file already written to ``temp_path``.
+
+    ``stored`` is the dict returned by ``stream_to_storage`` and ``ext`` the
+    extension of the client's file name. ``attach`` is
+    called with a list holding the new Image before the commit, to add rows
+    that must be committed with it. Returns the upload route's response; the temp file is
+    moved to its content-addressed name or removed.
+    """
+    batch = UploadBatch(current_app.extensions['metrics'])
+    batch.add(original_filename, ext, mime_type, temp_path, stored)
+    result = store_batch(batch, attach)[0]
+    if 'error' in result:
+        return jsonify({'error': result['error']}), result['status']
+    return jsonify(result), 201
 
 @bp.route('/upload_image', methods=['POST'])
 def upload_image():
-    if 'image' not in request.files:
+    metrics = current_app.extensions['metrics']
+    try:
+        files = received_files()
+    except OSError as e:
+        current_app.logger.error(f"Error saving file: {e}")
+        metrics.failed('save_failed')
+        return jsonify({'error': SAVE_ERROR_MESSAGE}), 500
+    if 'image' not in files:
+        metrics.failed('no_file')
         return jsonify({'error': 'No image file provided'}), 400
 
-    file = request.files['image']
+    file = files['image']
 
     if file.filename == '':
+        metrics.failed('no_file')
         return jsonify({'error': 'No selected file'}), 400
 
     if file and allowed_file(file.filename):
         original_filename = secure_filename(file.filename)
-        # Create a unique filename for storage to prevent overwrites and handle special chars
-        ext = original_filename.rsplit('.', 1)[1].lower()
-        storage_filename = f"{uuid.uuid4()}.{ext}"
-        
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-            
-        file_path = os.path.join(upload_folder, storage_filename)
-        
-        try:
-            file.save(file_path)
-        except Exception as e:
-            current_app.logger.error(f"Error saving file: {e}")
-            return jsonify({'error': 'Could not save uploaded file.'}), 500
+        metrics.received(file.stream.stored['size'])
+        return store_received(file.stream.temp_path, file.stream.stored, original_filename,
+                              file_extension(file.filename), file.mimetype)
+
+    else:
+        metrics.failed('invalid_format')
+        return jsonify({'error': INVALID_FORMAT_MESSAGE}), 400
+
+@bp.route('/upload_images', methods=['POST'])
+def upload_images():
+    """Batch upload: many files under the 'images' field of one multipart request.
+
+    Files are streamed to disk one after another, EXIF work that needs Pillow
+    runs on the shared process pool, and all rows go in with one commit.
+    Duplicates (of earlier uploads or within the batch) are processed once.
+    Responds with one result per file, in request order.
+    """
+    metrics = current_app.extensions['metrics']
+    try:
+        files = received_files().getlist('images')
+    except OSError as e:
+        current_app.logger.error(f"Error saving file: {e}")
+        metrics.failed('save_failed')
+        return jsonify({'error': SAVE_ERROR_MESSAGE}), 500
+    if not files:
+        metrics.failed('no_file')
+        return jsonify({'error': 'No image files provided'}), 400
+
+    max_files = current_app.config['MAX_BATCH_FILES']
+    if len(files) > max_files:
+        metrics.failed('too_many_files')
+        return jsonify({'error': f'Too many files in one batch (maximum {max_files}).'}), 400
+
+    batch = UploadBatch(metrics)
+    for file in files:
+        if file.filename == '':
+            batch.reject('', 'No selected file', 'no_file')
+            continue
+        if not allowed_file(file.filename):
+            batch.reject(file.filename, INVALID_FORMAT_MESSAGE, 'invalid_format')
+            continue
+        metrics.received(file.stream.stored['size'])
+        batch.add(secure_filename(file.filename), file_extension(file.filename), file.mimetype,
+                  file.stream.temp_path, file.stream.stored)
+
+    results = store_batch(batch)
+    for result in results:
+        result.pop('status', None)
+    created = sum(1 for result in results if 'error' not in result)
+    response_data = {
+        'results': results,
+        'created': created,
+        'failed': len(files) - created
+    }
+    return jsonify(response_data), 201 if created else 400
+
+# --- Resumable uploads (see resumable.py) ---
+
+def upload_session_summary(upload):
+    return {
+        'uploadId': upload.id,
+        'offset': upload.offset,
+        'size': upload.length,
+        'imageId': upload.image_id,
+    }
+
+def with_upload_headers(response, upload):
+    response.headers['Upload-Offset'] = str(upload.offset)
+    response.headers['Upload-Length'] = str(upload.length)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+UPLOAD_NOT_FOUND = 'Upload not found'
+
+@bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """Starts a resumable upload: ``{"filename", "size"[, "mimeType"]}``.
 
+    Responds with the session's ``uploadId``; the file is then sent with
+    ``PATCH /api/uploads/<id>`` and stored by ``POST /api/uploads/<id>/finalize``.
+    """
+    payload = request.get_json(silent=True) or {}
+    filename = payload.get('filename') or ''
+    size = payload.get('size')
+    if not allowed_file(filename):
+        current_app.extensions['metrics'].failed('invalid_format')
+        return jsonify({'error': INVALID_FORMAT_MESSAGE}), 400
+    max_bytes = current_app.config['RESUMABLE_MAX_BYTES']
+    if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= max_bytes:
+        return jsonify({'error': f'size must be an integer between 1 and {max_bytes}'}), 400
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    expire_sessions(upload_folder, current_app.config['RESUMABLE_SESSION_TTL'])
+    # The client's name is kept as sent: secure_filename may drop its extension
+    upload = create_session(upload_folder, filename, size, payload.get('mimeType'))
+    response = with_upload_headers(jsonify(upload_session_summary(upload)), upload)
+    response.headers['Location'] = f'{request.path}/{upload.id}'
+    return response, 201
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Where to resume: the offset in the body and the ``Upload-Offset`` header (HEAD works too)."""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': UPLOAD_NOT_FOUND}), 404
+    return with_upload_headers(jsonify(upload_session_summary(upload)), upload)
+
+@bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_upload(upload_id):
+    """Appends the raw request body at the ``Upload-Offset`` header, which must
+    equal the offset the server has (409 with the current offset otherwise)."""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': UPLOAD_NOT_FOUND}), 404
+    if upload.image_id is not None:
+        return jsonify({'error': 'Upload is already finalized'}), 409
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Upload-Offset header must be an integer'}), 400
+
+    metrics = current_app.extensions['metrics']
+    try:
+        with metrics.stage('save'):
+            new_offset = append_chunk(current_app.config['UPLOAD_FOLDER'], upload, offset, request.stream)
+    except OffsetConflict:
+        db.session.refresh(upload)
+        response = jsonify({'error': 'Upload-Offset does not match', 'offset': upload.offset})
+        return with_upload_headers(response, upload), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    metrics.received(new_offset - offset)
+    db.session.refresh(upload)
+    return with_upload_headers(Response(status=204), upload)
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Processes the assembled file like ``upload_image``, with the same response.
+
+    Repeating the request returns the stored image again with status 200, so a
+    client that lost the first response can safely retry.
+    """
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': UPLOAD_NOT_FOUND}), 404
+    if upload.image is not None:
+        record = upload.image
+        duplicate = Image.query.filter(Image.content_hash == record.content_hash, Image.id < record.id).first() is not None
+        gps_data_found = record.latitude is not None and record.longitude is not None
+        return jsonify(upload_result(record, gps_data_found, duplicate)), 200
+    if upload.offset < upload.length:
+        response = jsonify({'error': 'Upload is incomplete', 'offset': upload.offset})
+        return with_upload_headers(response, upload), 409
+
+    temp_path = new_temp_path()
+    try:
+        stored = claim_for_finalize(current_app.config['UPLOAD_FOLDER'], upload, temp_path)
+    except AlreadyClaimed:
+        return jsonify({'error': 'Upload is already being finalized'}), 409
+    except Exception:
+        discard_finalized_session(upload, temp_path)
+        raise
+
+    def link_session(records):
+        upload.image = records[0]
+
+    response, status = None, 500
+    try:
+        response, status = store_received(temp_path, stored, secure_filename(upload.original_filename),
+                                          file_extension(upload.original_filename), upload.mime_type,
+                                          attach=link_session)
+    finally:
+        if status >= 400:
+            discard_finalized_session(upload, temp_path)
+    return response, status
+
+def discard_finalized_session(upload, temp_path):
+    """The session's file is claimed, so a failed finalize cannot be retried:
+    remove the file and the session, and a retry has to start a new one."""
+    db.session.rollback()
+    remove_file(temp_path)
+    db.session.delete(upload)
+    db.session.commit()
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id):
+    """Abandons an unfinished upload and removes its partial file."""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': UPLOAD_NOT_FOUND}), 404
+    if upload.image_id is None:
+        remove_file(session_path(current_app.config['UPLOAD_FOLDER'], upload.id))
+    db.session.delete(upload)
+    db.session.commit()
+    return '', 204
+
+@bp.route('/dedup/stats', methods=['GET'])
+def dedup_stats():
+    """Hit/miss counters of the content-hash location cache for this process."""
+    return jsonify(current_app.extensions['location_cache'].stats())
+
+DEFAULT_IMAGE_LIMIT = 1000
+MAX_IMAGE_LIMIT = 10000
+
+def image_summary(record):
+    return {
+        'id': record.id,
+        'filename': record.original_filename,
+        'storageName': record.storage_filename,
+        'latitude': record.latitude,
+        'longitude': record.longitude,
+        'address': record.address
+    }
+
+@bp.route('/images', methods=['GET'])
+def list_images():
+    """Images whose location falls inside ?bbox=minLon,minLat,maxLon,maxLat.
+
+    Backed by the spatial index; ?limit caps the result (default 1000) and
+    'truncated' tells the client there were more matches. Without a bbox,
+    pages through all images instead (see list_all_images).
+    """
+    bbox = request.args.get('bbox')
+    if not bbox:
+        return list_all_images()
+    try:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid bbox: {e}'}), 400
+
+    limit = request.args.get('limit', DEFAULT_IMAGE_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_IMAGE_LIMIT))
+
+    # Fetch one extra row to know whether the viewport holds more than the limit
+    records = images_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=limit + 1)
+    truncated = len(records) > limit
+    records = records[:limit]
+    return jsonify({
+        'images': [image_summary(record) for record in records],
+        'count': len(records),
+        'truncated': truncated
+    })
+
+def list_all_images():
+    """Keyset-paginated listing of every image, newest first.
+
+    ?cursor continues from the previous page's 'nextCursor', ?order=asc
+    reverses the order, ?fields selects the returned fields and
+    ?format=columns returns one array per field. The body is streamed.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid fields: {e}'}), 400
+    response_format = request.args.get('format', 'objects')
+    if response_format not in LISTING_FORMATS:
+        return jsonify({'error': f"Invalid format: choose from {', '.join(LISTING_FORMATS)}"}), 400
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid order: choose asc or desc'}), 400
+    cursor = request.args.get('cursor')
+    if cursor:
         try:
-            location_data = process_image_data(file_path)
+            cursor = decode_cursor(cursor)
         except ValueError as e:
-            if str(e) == "Cannot identify image file. The file may be corrupted or not a supported image format.":
-                current_app.logger.error(f"Image processing error: {e}")
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                return jsonify({'error': 'Uploaded file is not a valid image. Please ensure it is a supported format (png, jpg, jpeg, gif) and not corrupted.'}), 400
-            else:
-                # Re-raise other ValueErrors
-                raise
-        except Exception as e: # Catch other potential errors from process_image_data
-            current_app.logger.error(f"Unexpected error during image processing: {e}")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return jsonify({'error': 'An unexpected error occurred while processing the image.'}), 500
+            return jsonify({'error': f'Invalid cursor: {e}'}), 400
 
-        try:
-            new_image_record = Image(
-                original_filename=original_filename,
-                storage_filename=storage_filename,
-                latitude=location_data.get('latitude'),
-                longitude=location_data.get('longitude'),
-                address=location_data.get('address'), # Assuming process_image_data might return address
-                mime_type=file.mimetype,
-                file_size_bytes=os.path.getsize(file_path)
-            )
-            db.session.add(new_image_record)
-            db.session.commit()
-
-            gps_data_found = location_data.get('gps_data_found', False)
-            user_message = 'Image uploaded and processed successfully.'
-            if not gps_data_found:
-                user_message = 'Image processed successfully, but no GPS data was found.'
-            
-            response_data = {
-                'message': user_message,
-                'imageId': new_image_record.id,
-                'filename': original_filename,
-                'storageName': storage_filename,
-                'latitude': new_image_record.latitude, # Will be None if not found
-                'longitude': new_image_record.longitude, # Will be None if not found
-                'address': new_image_record.address,
-                'gps_data_found': gps_data_found
-            }
-            return jsonify(response_data), 201
-        except Exception as e:
-            # If DB operation fails, attempt to delete the saved file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            current_app.logger.error(f"Database error: {e}")
-            return jsonify({'error': 'Could not save image metadata to database.'}), 500
+    limit = request.args.get('limit', DEFAULT_IMAGE_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_IMAGE_LIMIT))
+
+    rows = page_rows(fields, limit, cursor or None, descending=order == 'desc')
+    stream = stream_columns if response_format == 'columns' else stream_objects
+    return Response(stream_with_context(stream(rows, fields, limit)), mimetype='application/json')
 
+def parse_taken_bound(value, end=False):
+    """Parses an ISO date or datetime. A bare date as the upper bound covers that whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        return parsed + timedelta(days=1), False
+    return parsed, True
+
+@bp.route('/images/search', methods=['GET'])
+def search_images():
+    """Images filtered on extracted EXIF fields, oldest capture first.
+
+    ?takenFrom and ?takenTo (ISO dates or datetimes, camera local time),
+    ?make, ?model and ?orientation all use indexed columns; photos whose
+    EXIF has not been extracted yet never match a filter. ?limit caps the
+    result (default 1000) and 'truncated' tells the client there were more.
+    """
+    query = Image.query
+    try:
+        if request.args.get('takenFrom'):
+            start, _ = parse_taken_bound(request.args['takenFrom'])
+            query = query.filter(Image.taken_at >= start)
+        if request.args.get('takenTo'):
+            end, inclusive = parse_taken_bound(request.args['takenTo'], end=True)
+            query = query.filter(Image.taken_at <= end if inclusive else Image.taken_at < end)
+    except ValueError:
+        return jsonify({'error': 'takenFrom and takenTo must be ISO 8601 dates or datetimes'}), 400
+    if request.args.get('make'):
+        query = query.filter(Image.camera_make == request.args['make'])
+    if request.args.get('model'):
+        query = query.filter(Image.camera_model == request.args['model'])
+    if request.args.get('orientation'):
+        orientation = request.args.get('orientation', type=int)
+        if orientation is None:
+            return jsonify({'error': 'orientation must be an integer'}), 400
+        query = query.filter(Image.orientation == orientation)
+
+    limit = request.args.get('limit', DEFAULT_IMAGE_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_IMAGE_LIMIT))
+    # Rows without a capture time sort last (NULLs compare low in SQLite)
+    records = (query.order_by(Image.taken_at.is_(None), Image.taken_at, Image.id)
+               .limit(limit + 1).all())
+    images = [dict(image_summary(record), **exif_summary(record)) for record in records[:limit]]
+    return jsonify({'images': images, 'count': len(images), 'truncated': len(records) > limit})
+
+def exif_summary(record):
+    return {
+        'takenAt': record.taken_at.isoformat() if record.taken_at else None,
+        'cameraMake': record.camera_make,
+        'cameraModel': record.camera_model,
+        'orientation': record.orientation,
+    }
+
+DEFAULT_CLUSTER_LIMIT = 5000
+
+def latest_image_id():
+    """The largest image id committed by any process; in-memory indexes
+    compare it with what they hold to catch up with other writers."""
+    return db.session.query(db.func.max(Image.id)).scalar() or 0
+
+def located_images(after_id, until_id, *columns):
+    return (
+        db.session.query(*columns)
+        .filter(Image.id > after_id, Image.id <= until_id,
+                Image.latitude.isnot(None), Image.longitude.isnot(None))
+        .yield_per(10000)
+    )
+
+def load_cluster_points(after_id, until_id):
+    return located_images(after_id, until_id, Image.id, Image.latitude, Image.longitude)
+
+def load_point_columns(after_id, until_id):
+    return located_images(after_id, until_id, Image.id, Image.latitude, Image.longitude, Image.uploaded_at)
+
+@bp.route('/clusters', methods=['GET'])
+def list_clusters():
+    """Marker clusters for ?bbox=minLon,minLat,maxLon,maxLat at ?zoom=N.
+
+    Clusters come from the precomputed per-zoom grids, so the response size
+    depends on the viewport rather than on how many photos exist. Past
+    CLUSTER_MAX_ZOOM every photo is returned as a cluster of one.
+    """
+    bbox = request.args.get('bbox')
+    zoom = request.args.get('zoom', type=int)
+    if not bbox or zoom is None:
+        return jsonify({'error': 'bbox and zoom parameters are required'}), 400
+    try:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid bbox: {e}'}), 400
+    if zoom < 0 or zoom > 24:
+        return jsonify({'error': 'zoom must be between 0 and 24'}), 400
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_CLUSTER_LIMIT, type=int), DEFAULT_CLUSTER_LIMIT))
+    index = current_app.extensions['cluster_index']
+    if zoom > index.max_zoom:
+        records = images_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=limit + 1)
+        truncated = len(records) > limit
+        clusters = [
+            {'count': 1, 'latitude': r.latitude, 'longitude': r.longitude, 'sampleImageId': r.id}
+            for r in records[:limit]
+        ]
+    else:
+        index.ensure_current(latest_image_id(), load_cluster_points)
+        clusters, truncated = index.query(min_lon, min_lat, max_lon, max_lat, zoom, limit=limit)
+
+    return jsonify({'zoom': zoom, 'clusters': clusters, 'truncated': truncated})
+
+MAX_TILE_FEATURES = 4096
+
+def render_tile(z, x, y, latest_id):
+    """Encodes one tile: precomputed clusters up to CLUSTER_MAX_ZOOM, single
+    photos (at most MAX_TILE_FEATURES) beyond it."""
+    index = current_app.extensions['cluster_index']
+    if z <= index.max_zoom:
+        index.ensure_current(latest_id, load_cluster_points)
+        points = [
+            (sample_id, world_x, world_y, {'count': count, 'image_id': sample_id})
+            for count, world_x, world_y, sample_id in index.tile(z, x, y)
+        ]
     else:
-        return jsonify({'error': 'Invalid image format. Allowed formats: png, jpg, jpeg, gif'}), 400
+        records = images_in_bbox(*tile_bounds(z, x, y), limit=MAX_TILE_FEATURES)
+        points = [
+            (r.id, *project(r.latitude, r.longitude), {'count': 1, 'image_id': r.id})
+            for r in records
+        ]
+    return encode_points('photos', z, x, y, points)
+
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_tile(z, x, y):
+    """Mapbox Vector Tile of photo points, served from the tile cache with an ETag."""
+    tile_cache = current_app.extensions['tile_cache']
+    if z > tile_cache.max_zoom or not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return jsonify({'error': 'Tile coordinates out of range'}), 404
+
+    # Photos committed by any process since the last request drop their tiles
+    latest_id = latest_image_id()
+    tile_cache.ensure_current(latest_id, load_cluster_points)
+    entry = tile_cache.get((z, x, y))
+    if entry is None:
+        entry = tile_cache.put((z, x, y), render_tile(z, x, y, latest_id), version=latest_id)
+    data, etag = entry
+
+    response = current_app.response_class(data, mimetype=MVT_MEDIA_TYPE)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['TILE_MAX_AGE']
+    return response.make_conditional(request)
+
+DEFAULT_HEATMAP_RESOLUTION = 64
+
+@bp.route('/heatmap', methods=['GET'])
+def get_heatmap():
+    """Photo density over ?bbox=minLon,minLat,maxLon,maxLat as a grid of counts.
+
+    ?resolution is the number of cells per side (default 64, at most
+    HEATMAP_MAX_RESOLUTION). 'grid' lists rows from north to south, each
+    from west to east. ?uploadedFrom and ?uploadedTo (ISO dates or
+    datetimes, UTC) restrict it to photos uploaded in that period.
+    """
+    bbox = request.args.get('bbox')
+    if not bbox:
+        return jsonify({'error': 'bbox parameter is required'}), 400
+    try:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid bbox: {e}'}), 400
+    if min_lon == max_lon or min_lat == max_lat:
+        return jsonify({'error': 'Invalid bbox: it has no area'}), 400
+    resolution = request.args.get('resolution', DEFAULT_HEATMAP_RESOLUTION, type=int)
+    max_resolution = current_app.config['HEATMAP_MAX_RESOLUTION']
+    if not 1 <= resolution <= max_resolution:
+        return jsonify({'error': f'resolution must be between 1 and {max_resolution}'}), 400
+    try:
+        uploaded_from = request.args.get('uploadedFrom')
+        uploaded_from = parse_taken_bound(uploaded_from)[0] if uploaded_from else None
+        uploaded_to = request.args.get('uploadedTo')
+        uploaded_to = parse_taken_bound(uploaded_to, end=True)[0] if uploaded_to else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid upload time: {e}'}), 400
+
+    columns = current_app.extensions['point_columns']
+    columns.ensure_current(latest_image_id(), load_point_columns)
+    grid = columns.heatmap(min_lon, min_lat, max_lon, max_lat, resolution,
+                           uploaded_from=uploaded_from, uploaded_to=uploaded_to)
+    return jsonify({
+        'bbox': [min_lon, min_lat, max_lon, max_lat],
+        'resolution': resolution,
+        'total': int(grid.sum()),
+        'max': int(grid.max()),
+        'grid': grid.tolist(),
+    })
+
+DEFAULT_NEARBY_LIMIT = 100
+MAX_NEARBY_LIMIT = 1000
+MAX_NEARBY_RADIUS_KM = 20038  # Half the Earth's circumference
+
+@bp.route('/nearby', methods=['GET'])
+def get_nearby():
+    """Photos within ?radius km (default 1) of ?lat and ?lon, nearest first.
+
+    ?limit caps the result (default 100, at most 1000); 'total' counts every
+    photo inside the radius.
+    """
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius = request.args.get('radius', 1.0, type=float)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon parameters are required'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat or lon is out of range'}), 400
+    if not 0 < radius <= MAX_NEARBY_RADIUS_KM:
+        return jsonify({'error': f'radius must be between 0 and {MAX_NEARBY_RADIUS_KM} km'}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_NEARBY_LIMIT, type=int), MAX_NEARBY_LIMIT))
+
+    columns = current_app.extensions['point_columns']
+    columns.ensure_current(latest_image_id(), load_point_columns)
+    rows, total = columns.nearby(lat, lon, radius, limit)
+    return jsonify({
+        'images': [
+            {'imageId': image_id, 'latitude': latitude, 'longitude': longitude, 'distanceKm': round(distance, 4)}
+            for image_id, latitude, longitude, distance in rows
+        ],
+        'total': total,
+        'truncated': total > len(rows),
+    })
+
+DERIVATIVE_MAX_AGE = 365 * 24 * 3600
+
+@bp.route('/images/<int:image_id>/<any(thumb, preview):size>', methods=['GET'])
+def get_image_derivative(image_id, size):
+    """Thumbnail or preview JPEG, generated on first request and cached on disk.
+
+    Derivatives of content-addressed originals never change, so they are
+    served with a one-year immutable Cache-Control.
+    """
+    record = db.session.get(Image, image_id)
+    if record is None:
+        return jsonify({'error': 'Image not found'}), 404
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.exists(original_path(upload_folder, record.storage_filename, record.source_path)):
+        return jsonify({'error': 'Original file is missing'}), 404
+    try:
+        path = get_derivative(upload_folder, record.storage_filename, size, source_path=record.source_path)
+    except Exception as e:
+        current_app.logger.error(f"Error generating {size} for image {image_id}: {e}")
+        return jsonify({'error': 'Could not generate image derivative.'}), 500
+
+    response = send_file(path, mimetype='image/jpeg', max_age=DERIVATIVE_MAX_AGE, conditional=True, etag=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+ORIGINAL_MAX_AGE = 365 * 24 * 3600
+
+def find_original(image_id):
+    """The cached ``Original`` for an image, looked up and stat-ed on a miss.
+    Returns None if the image or its file does not exist."""
+    cache = current_app.extensions['original_cache']
+    entry = cache.get(image_id)
+    if entry is not None:
+        return entry
+    record = db.session.get(Image, image_id)
+    if record is None:
+        return None
+    path = original_path(current_app.config['UPLOAD_FOLDER'], record.storage_filename, record.source_path)
+    in_upload_folder = record.source_path is None
+    accel_prefix = current_app.config['ORIGINAL_ACCEL_REDIRECT']
+    accel_path = f"{accel_prefix.rstrip('/')}/{record.storage_filename}" if accel_prefix and in_upload_folder else None
+    try:
+        entry = describe_original(path, record.mime_type, record.content_hash,
+                                  immutable=in_upload_folder, accel_path=accel_path)
+    except OSError:
+        return None
+    cache.put(image_id, entry)
+    return entry
+
+@bp.route('/images/<int:image_id>/original', methods=['GET'])
+def get_image_original(image_id):
+    """The uploaded file itself, with Range support and a strong ETag.
+
+    Content-addressed blobs use their SHA-256 as the ETag and are cacheable
+    for a year as immutable. With ORIGINAL_ACCEL_REDIRECT set, the body is
+    left to the front-end server; otherwise it goes out through the WSGI
+    server's file wrapper (sendfile under Gunicorn).
+    """
+    entry = find_original(image_id)
+    if entry is None:
+        return jsonify({'error': 'Image not found'}), 404
+
+    if entry.accel_path:
+        response = current_app.response_class(mimetype=entry.mimetype)
+        response.headers['X-Accel-Redirect'] = entry.accel_path
+    else:
+        try:
+            file = open(entry.path, 'rb')
+        except OSError:
+            current_app.extensions['original_cache'].discard(image_id)
+            return jsonify({'error': 'Original file is missing'}), 404
+        response = current_app.response_class(wrap_file(request.environ, file), mimetype=entry.mimetype,
+                                              direct_passthrough=True)
+        response.content_length = entry.size
+    response.set_etag(entry.etag)
+    response.last_modified = entry.mtime
+    if entry.immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = ORIGINAL_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    if entry.accel_path:
+        # The front-end server answers Range requests from the file
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            del response.headers['X-Accel-Redirect']
+        return response
+    return response.make_conditional(request, accept_ranges=True, complete_length=entry.size)
+
+@bp.route('/images/<int:image_id>/exif', methods=['GET'])
+def get_image_exif(image_id):
+    """The full EXIF stored by the 'exif' job, plus the extracted fields.
+
+    Served from the database; the original file is not opened.
+    """
+    record = db.session.get(Image, image_id)
+    if record is None:
+        return jsonify({'error': 'Image not found'}), 404
+    exif = record.exif
+    if exif is None:
+        return jsonify({'error': 'EXIF has not been extracted for this image yet'}), 404
+    return jsonify(dict(exif_summary(record), imageId=record.id, exif=exif))
+
+@bp.route('/images/<int:image_id>/status', methods=['GET'])
+def get_image_status(image_id):
+    """Progress of the background jobs queued for an image."""
+    record = db.session.get(Image, image_id)
+    if record is None:
+        return jsonify({'error': 'Image not found'}), 404
+    return jsonify(image_status(record))
@@ -0,0 +1,164 @@
+"""Hierarchical marker clustering on a Web Mercator grid.
+
+Every zoom level keeps a sparse grid of cells (``2 ** (zoom + GRID_BITS)``
+per axis, i.e. roughly 64 px cells on 256 px tiles). A point's cell at each
+level is derived from its finest cell by bit shifts, so a new photo updates
+one cell per level in O(max_zoom) with no rebuild, and a query only touches
+the cells inside the viewport. New photos are found by id in the database,
+so rows committed by other processes are picked up too.
+"""
+import math
+import threading
+
+DEFAULT_MAX_ZOOM = 16
+GRID_BITS = 2
+MAX_LATITUDE = 85.05112878
+
+def project(lat, lon):
+    """Projects WGS84 degrees to Web Mercator world coordinates in [0, 1)."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+def unproject(x, y):
+    """Inverse of ``project``; returns (lat, lon)."""
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+class ClusterIndex:
+    """Per-zoom grid aggregates of image locations.
+
+    Each cell holds ``[count, sum_x, sum_y, sample_image_id]``; the centroid
+    is the mean of the projected coordinates and the sample is the oldest
+    image in the cell.
+    """
+
+    def __init__(self, max_zoom=DEFAULT_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self._finest_bits = max_zoom + GRID_BITS
+        self._levels = None
+        self._built_max_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._levels is not None
+
+    def reset(self):
+        with self._lock:
+            self._levels = None
+            self._built_max_id = 0
+
+    def ensure_current(self, latest_id, load_points):
+        """Brings the index up to ``latest_id``, the largest image id in the database.
+
+        ``load_points(after_id, until_id)`` yields ``(id, latitude, longitude)``
+        for located images with ``after_id < id <= until_id``. The first call
+        builds the whole index; later ones only add the rows committed since,
+        by this process or any other. An id going backwards means the table
+        was recreated, so the index is rebuilt.
+        """
+        if self._levels is not None and latest_id == self._built_max_id:
+            return
+        with self._lock:
+            if self._levels is not None and latest_id == self._built_max_id:
+                return
+            if self._levels is None or latest_id < self._built_max_id:
+                levels, after_id = [dict() for _ in range(self.max_zoom + 1)], 0
+            else:
+                levels, after_id = self._levels, self._built_max_id
+            for image_id, lat, lon in load_points(after_id, latest_id):
+                self._insert(levels, image_id, lat, lon)
+            self._levels = levels
+            self._built_max_id = latest_id
+
+    def _insert(self, levels, image_id, lat, lon):
+        x, y = project(lat, lon)
+        scale = 1 << self._finest_bits
+        fx, fy = int(x * scale), int(y * scale)
+        for zoom, cells in enumerate(levels):
+            shift = self.max_zoom - zoom
+            key = ((fx >> shift) << 32) | (fy >> shift)
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [1, x, y, image_id]
+            else:
+                cell[0] += 1
+                cell[1] += x
+                cell[2] += y
+                if image_id < cell[3]:
+                    cell[3] = image_id
+
+    def query(self, min_lon, min_lat, max_lon, max_lat, zoom, limit=None):
+        """Returns clusters at ``zoom`` whose cells intersect the bounding box.
+
+        ``zoom`` must not exceed ``max_zoom``. Boxes crossing the antimeridian
+        (``min_lon > max_lon``) are handled. Returns ``(clusters, truncated)``.
+        """
+        if self._levels is None:
+            raise RuntimeError('ClusterIndex has not been built')
+        cells = self._levels[zoom]
+        scale = 1 << (zoom + GRID_BITS)
+
+        if min_lon <= max_lon:
+            spans = [(min_lon, max_lon)]
+        else:
+            spans = [(min_lon, 180.0), (-180.0, max_lon)]
+
+        # Mercator y grows southwards
+        cy0 = int(project(max_lat, 0.0)[1] * scale)
+        cy1 = int(project(min_lat, 0.0)[1] * scale)
+        clusters = []
+        truncated = False
+        for lo_lon, hi_lon in spans:
+            cx0 = int(project(0.0, lo_lon)[0] * scale)
+            cx1 = int(project(0.0, hi_lon)[0] * scale)
+            for cell in self._cells_in_range(cells, cx0, cx1, cy0, cy1):
+                if limit is not None and len(clusters) >= limit:
+                    truncated = True
+                    break
+                count, sum_x, sum_y, sample_id = cell
+                lat, lon = unproject(sum_x / count, sum_y / count)
+                clusters.append({
+                    'count': count,
+                    'latitude': lat,
+                    'longitude': lon,
+                    'sampleImageId': sample_id
+                })
+        return clusters, truncated
+
+    def tile(self, zoom, tile_x, tile_y):
+        """Returns the clusters inside one XYZ map tile as
+        ``(count, x, y, sample_image_id)`` tuples in world coordinates.
+
+        Grid cells nest exactly inside tiles, so every cluster belongs to
+        exactly one tile at its zoom.
+        """
+        if self._levels is None:
+            raise RuntimeError('ClusterIndex has not been built')
+        per_tile = 1 << GRID_BITS
+        cx0, cy0 = tile_x * per_tile, tile_y * per_tile
+        return [
+            (count, sum_x / count, sum_y / count, sample_id)
+            for count, sum_x, sum_y, sample_id in self._cells_in_range(
+                self._levels[zoom], cx0, cx0 + per_tile - 1, cy0, cy0 + per_tile - 1)
+        ]
+
+    @staticmethod
+    def _cells_in_range(cells, cx0, cx1, cy0, cy1):
+        # Walk whichever is smaller: the viewport's cells or the populated ones
+        area = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+        if area <= len(cells):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    cell = cells.get((cx << 32) | cy)
+                    if cell is not None:
+                        yield cell
+        else:
+            for key, cell in list(cells.items()):
+                cx, cy = key >> 32, key & 0xFFFFFFFF
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield cell
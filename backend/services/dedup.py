@@ -0,0 +1,87 @@
+"""Content-addressed storage helpers and the hash -> location cache.
+
+Blobs are stored under their SHA-256 digest, so re-uploading the same photo
+maps onto the blob already on disk. The cache remembers what was extracted
+from each digest, letting a duplicate upload skip EXIF processing entirely.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 10000
+
+def storage_filename_for(content_hash, ext):
+    return f"{content_hash}.{ext}"
+
+def original_path(upload_folder, storage_filename, source_path=None):
+    """Where an original lives: its blob in ``upload_folder``, or the path it
+    was imported from when it was referenced in place."""
+    return source_path or os.path.join(upload_folder, storage_filename)
+
+def commit_blob(temp_path, upload_folder, storage_filename):
+    """Moves a fully written temp file to its content-addressed name.
+
+    If the blob is already there (same bytes uploaded concurrently) the temp
+    file is simply discarded.
+    """
+    final_path = os.path.join(upload_folder, storage_filename)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, final_path)
+    return final_path
+
+class LocationCache:
+    """Thread-safe LRU cache from content hash to extracted location data.
+
+    Entries are dicts with ``storage_filename``, ``latitude``, ``longitude``,
+    ``address`` and ``gps_data_found``.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, content_hash):
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is not None:
+                self._entries.move_to_end(content_hash)
+            return entry
+
+    def put(self, content_hash, entry):
+        with self._lock:
+            self._entries[content_hash] = entry
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def discard(self, content_hash):
+        with self._lock:
+            self._entries.pop(content_hash, None)
+
+    def record(self, outcome):
+        """Counts a lookup outcome: 'hit', 'db_hit' or 'miss'."""
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'db_hit':
+                self.db_hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.db_hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'capacity': self.capacity,
+            }
@@ -0,0 +1,59 @@
+"""Thumbnail and preview derivatives of stored originals.
+
+Derivatives are generated on first request and cached on disk under
+``UPLOAD_FOLDER/derivatives/<size>/``. Originals are content-addressed, so a
+derivative never changes once written and can be served as immutable.
+"""
+import os
+import uuid
+from PIL import Image as PILImage, ImageOps
+
+from .dedup import original_path
+
+# Longest edge in pixels for each derivative size
+SIZES = {
+    'thumb': 256,
+    'preview': 1024,
+}
+DERIVATIVE_DIR = 'derivatives'
+JPEG_QUALITY = 82
+
+def derivative_path(upload_folder, storage_filename, size_name):
+    stem = storage_filename.rsplit('.', 1)[0]
+    return os.path.join(upload_folder, DERIVATIVE_DIR, size_name, f"{stem}.jpg")
+
+def generate_derivative(source_path, dest_path, max_edge, quality=JPEG_QUALITY):
+    """Writes a JPEG no larger than ``max_edge`` on its longest side.
+
+    For JPEG sources ``draft()`` makes libjpeg decode at 1/2, 1/4 or 1/8
+    scale in the DCT domain, so a 12 MP original is never fully decoded just
+    to produce a thumbnail.
+    """
+    with PILImage.open(source_path) as img:
+        img.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), PILImage.LANCZOS)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        # Write to a temp name and rename, so concurrent requests never see a partial file
+        temp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+        try:
+            img.save(temp_path, 'JPEG', quality=quality, optimize=True)
+            os.replace(temp_path, dest_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return dest_path
+
+def get_derivative(upload_folder, storage_filename, size_name, source_path=None):
+    """Returns the path of a derivative, generating it if it is not cached yet.
+
+    ``source_path`` overrides the original's location for photos imported in place.
+    """
+    dest_path = derivative_path(upload_folder, storage_filename, size_name)
+    if not os.path.exists(dest_path):
+        source_path = original_path(upload_folder, storage_filename, source_path)
+        generate_derivative(source_path, dest_path, SIZES[size_name])
+    return dest_path
@@ -0,0 +1,188 @@
+"""Header-only GPS extraction for JPEG and TIFF files.
+
+Walks JPEG APP1 -> TIFF IFD0 -> GPS IFD in a bounded prefix of the file and
+pulls out just the latitude/longitude tags. Nothing is decoded and no other
+EXIF tag is materialised, which makes this much cheaper than going through
+Pillow's ``_getexif()`` for the common JPEG upload.
+"""
+import struct
+
+# APP1 segments are capped at 64 KiB, but an APP0/JFIF thumbnail or ICC
+# profile can come first, so allow a little more than one segment.
+MAX_HEADER_BYTES = 128 * 1024
+INITIAL_READ_BYTES = 16 * 1024
+
+GPS_IFD_POINTER = 0x8825
+GPS_TAGS = {
+    1: 'GPSLatitudeRef',
+    2: 'GPSLatitude',
+    3: 'GPSLongitudeRef',
+    4: 'GPSLongitude',
+}
+
+# TIFF field types we need: ASCII, RATIONAL, SRATIONAL
+TYPE_ASCII = 2
+TYPE_RATIONAL = 5
+TYPE_SRATIONAL = 10
+
+JPEG_SOI = b'\xff\xd8'
+TIFF_HEADERS = (b'II*\x00', b'MM\x00*')
+EXIF_APP1_HEADER = b'Exif\x00\x00'
+
+
+class NeedMoreData(Exception):
+    """Raised when the buffer ends before the GPS IFD could be located."""
+
+
+def parse_gps_info(data):
+    """Parses GPS tags out of the leading bytes of a JPEG or TIFF file.
+
+    Returns a ``GPSInfo``-style dict keyed like Pillow's ``GPSTAGS`` (empty
+    when the file has no GPS data), or ``None`` when the data is not a
+    JPEG/TIFF this parser understands and the caller should fall back to
+    Pillow. Raises ``NeedMoreData`` if ``data`` is too short to decide.
+    """
+    data = memoryview(data)
+    if bytes(data[:2]) == JPEG_SOI:
+        return _parse_jpeg(data)
+    if bytes(data[:4]) in TIFF_HEADERS:
+        return _parse_tiff(data, truncated=True)
+    if len(data) < 4:
+        raise NeedMoreData()
+    return None
+
+
+def read_gps_info(image_path, max_bytes=MAX_HEADER_BYTES):
+    """Reads at most ``max_bytes`` of ``image_path`` and parses its GPS tags.
+
+    Same return values as ``parse_gps_info``; ``None`` is also returned when
+    the GPS IFD is not reachable within ``max_bytes``.
+    """
+    with open(image_path, 'rb') as f:
+        data = f.read(min(INITIAL_READ_BYTES, max_bytes))
+        while True:
+            try:
+                return parse_gps_info(data)
+            except NeedMoreData:
+                if len(data) >= max_bytes:
+                    return None
+                more = f.read(min(len(data), max_bytes - len(data)))
+                if not more:
+                    return None  # Truncated file, let Pillow decide
+                data += more
+
+
+def _parse_jpeg(data):
+    pos = 2
+    size = len(data)
+    while True:
+        if pos + 4 > size:
+            raise NeedMoreData()
+        if data[pos] != 0xFF:
+            return None  # Not a marker where one should be
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # Standalone markers
+            pos += 2
+            continue
+        if marker in (0xDA, 0xD9):  # SOS/EOI: no EXIF before the image data
+            return {}
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if length < 2:
+            return None
+        end = pos + 2 + length
+        if marker == 0xE1 and bytes(data[pos + 4:pos + 10]) == EXIF_APP1_HEADER:
+            if end > size:
+                raise NeedMoreData()
+            return _parse_tiff(data[pos + 10:end], truncated=False)
+        pos = end
+
+
+def _parse_tiff(tiff, truncated):
+    """Parses the GPS IFD out of a TIFF structure.
+
+    Offsets are relative to the start of ``tiff``. When ``truncated`` is true
+    ``tiff`` is only a prefix of the file and out-of-range offsets mean more
+    data is needed; otherwise they mean the structure is malformed.
+    """
+    def out_of_range():
+        if truncated:
+            raise NeedMoreData()
+        return None
+
+    if len(tiff) < 8:
+        return out_of_range()
+    order = bytes(tiff[:2])
+    if order == b'II':
+        endian = '<'
+    elif order == b'MM':
+        endian = '>'
+    else:
+        return None
+    u16 = struct.Struct(endian + 'H')
+    u32 = struct.Struct(endian + 'I')
+
+    ifd0 = u32.unpack_from(tiff, 4)[0]
+    entries = _read_ifd(tiff, ifd0, u16, u32)
+    if entries is None:
+        return out_of_range()
+    gps_entry = entries.get(GPS_IFD_POINTER)
+    if gps_entry is None:
+        return {}
+
+    gps_ifd = u32.unpack_from(gps_entry[2])[0]
+    gps_entries = _read_ifd(tiff, gps_ifd, u16, u32)
+    if gps_entries is None:
+        return out_of_range()
+
+    gps_info = {}
+    for tag, name in GPS_TAGS.items():
+        entry = gps_entries.get(tag)
+        if entry is None:
+            continue
+        field_type, count, value_field = entry
+        if field_type == TYPE_ASCII:
+            raw = _field_bytes(tiff, u32, count, value_field)
+            if raw is None:
+                return out_of_range()
+            gps_info[name] = raw.split(b'\x00', 1)[0].decode('ascii', 'replace')
+        elif field_type in (TYPE_RATIONAL, TYPE_SRATIONAL) and count == 3:
+            raw = _field_bytes(tiff, u32, 8 * count, value_field)
+            if raw is None:
+                return out_of_range()
+            fmt = endian + ('6I' if field_type == TYPE_RATIONAL else '6i')
+            parts = struct.unpack(fmt, raw)
+            if 0 in parts[1::2]:
+                continue  # Pillow would give NaN here; treat as missing
+            gps_info[name] = tuple(parts[i] / parts[i + 1] for i in range(0, 6, 2))
+    return gps_info
+
+
+def _read_ifd(tiff, offset, u16, u32):
+    """Returns ``{tag: (type, count, 4-byte value field)}`` or ``None`` if the
+    IFD runs past the end of ``tiff``."""
+    if offset + 2 > len(tiff):
+        return None
+    count = u16.unpack_from(tiff, offset)[0]
+    end = offset + 2 + 12 * count
+    if end > len(tiff):
+        return None
+    entries = {}
+    for pos in range(offset + 2, end, 12):
+        tag = u16.unpack_from(tiff, pos)[0]
+        field_type = u16.unpack_from(tiff, pos + 2)[0]
+        value_count = u32.unpack_from(tiff, pos + 4)[0]
+        entries[tag] = (field_type, value_count, bytes(tiff[pos + 8:pos + 12]))
+    return entries
+
+
+def _field_bytes(tiff, u32, length, value_field):
+    """Returns the raw bytes of a field, inline or via its offset."""
+    if length <= 4:
+        return value_field[:length]
+    offset = u32.unpack(value_field)[0]
+    if offset + length > len(tiff):
+        return None
+    return bytes(tiff[offset:offset + length])
@@ -0,0 +1,81 @@
+"""Compact storage of a photo's full EXIF metadata.
+
+``get_exif_data`` returns Pillow objects (rationals, bytes, nested GPS
+dicts). ``to_plain`` turns them into JSON types, and ``encode`` stores the
+result as zlib-compressed compact JSON, typically a few hundred bytes per
+photo. That is small enough to live in a deferred column next to the row,
+where it is read and decoded only when someone asks for it. Fields worth
+querying (capture time, camera, orientation) are pulled out once by
+``extract_fields`` into indexed columns.
+"""
+import json
+import zlib
+from datetime import datetime
+
+FORMAT_VERSION = 1
+COMPRESSION_LEVEL = 6
+
+# Binary tags longer than this (MakerNote, embedded previews, ...) are dropped
+MAX_BINARY_BYTES = 64
+
+#: Columns filled by ``extract_fields``
+FIELDS = ('taken_at', 'camera_make', 'camera_model', 'orientation')
+
+DATETIME_TAGS = ('DateTimeOriginal', 'DateTimeDigitized', 'DateTime')
+EXIF_DATETIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+def to_plain(value):
+    """Converts a Pillow EXIF value to JSON types, or ``None`` to drop it."""
+    if isinstance(value, dict):
+        plain = {str(key): to_plain(item) for key, item in value.items()}
+        return {key: item for key, item in plain.items() if item is not None}
+    if isinstance(value, (tuple, list)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, bytes):
+        text = value.rstrip(b'\x00')
+        if text.isascii() and all(32 <= byte < 127 for byte in text):
+            return text.decode('ascii')
+        return value.hex() if len(value) <= MAX_BINARY_BYTES else None
+    if isinstance(value, str):
+        return value.rstrip('\x00').strip()
+    if isinstance(value, (bool, int)):
+        return value
+    try:
+        number = float(value)  # IFDRational and other numeric types
+    except (TypeError, ValueError, ZeroDivisionError):
+        return str(value)
+    # JSON has no NaN (a 0/0 rational)
+    return number if number == number else None
+
+def encode(exif_data):
+    plain = to_plain(exif_data)
+    raw = json.dumps({'v': FORMAT_VERSION, 'exif': plain}, separators=(',', ':'), ensure_ascii=False)
+    return zlib.compress(raw.encode('utf-8'), COMPRESSION_LEVEL)
+
+def decode(blob):
+    """Inverse of ``encode``: the EXIF dict, keyed by tag name."""
+    return json.loads(zlib.decompress(blob))['exif']
+
+def parse_exif_datetime(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip()[:19], EXIF_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+def extract_fields(exif_data):
+    """Queryable fields from an EXIF dict (raw or decoded): ``taken_at``
+    (naive local camera time), ``camera_make``, ``camera_model`` and ``orientation``."""
+    taken_at = None
+    for tag in DATETIME_TAGS:
+        taken_at = parse_exif_datetime(to_plain(exif_data.get(tag)))
+        if taken_at is not None:
+            break
+    orientation = exif_data.get('Orientation')
+    return {
+        'taken_at': taken_at,
+        'camera_make': to_plain(exif_data.get('Make')) or None,
+        'camera_model': to_plain(exif_data.get('Model')) or None,
+        'orientation': int(orientation) if isinstance(orientation, int) and 1 <= orientation <= 8 else None,
+    }
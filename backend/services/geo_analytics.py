@@ -0,0 +1,190 @@
+"""Columnar in-memory copy of photo locations for analytics queries.
+
+``PointColumns`` keeps every located image as four NumPy columns (id,
+latitude, longitude, uploaded_at), 32 bytes per photo, so a million photos
+take about 32 MiB. Heatmaps bin the whole set with one ``bincount`` and
+radius queries run a vectorised haversine instead of looping over rows.
+
+Rows loaded by the initial build are sorted by latitude, so both queries cut
+their candidates down to a latitude band with ``searchsorted`` before doing
+any arithmetic. Images committed later, by any process, are found by id in
+the database and appended to an unsorted tail that is scanned in full; once
+the tail grows past an eighth of the sorted part the two are merged and
+re-sorted.
+"""
+import math
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+MIN_TAIL_MERGE = 1024
+
+def bbox_width(min_lon, max_lon):
+    """Longitude span of a bbox in degrees; minLon > maxLon crosses the antimeridian."""
+    return max_lon - min_lon if min_lon <= max_lon else max_lon - min_lon + 360.0
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances in km from one point to arrays of points."""
+    lat_r, lats_r = math.radians(lat), np.radians(lats)
+    dlat = lats_r - lat_r
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat_r) * np.cos(lats_r) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class PointColumns:
+    """Located images as parallel NumPy arrays, built lazily and caught up by id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers = None  # (ids, lats, lons, uploaded_at), capacity >= size
+        self._size = 0
+        self._sorted = 0      # Rows [0, _sorted) are ordered by latitude
+        self._built_max_id = 0
+
+    @property
+    def built(self):
+        return self._buffers is not None
+
+    def __len__(self):
+        return self._size
+
+    def reset(self):
+        with self._lock:
+            self._buffers = None
+            self._size = self._sorted = 0
+            self._built_max_id = 0
+
+    def ensure_current(self, latest_id, load_points):
+        """Brings the columns up to ``latest_id``, the largest image id in the database.
+
+        ``load_points(after_id, until_id)`` yields ``(id, latitude, longitude,
+        uploaded_at)`` for located images with ``after_id < id <= until_id``.
+        The first call loads everything; later ones append the rows committed
+        since, by this process or any other. An id going backwards means the
+        table was recreated, so the columns are rebuilt.
+        """
+        if self._buffers is not None and latest_id == self._built_max_id:
+            return
+        with self._lock:
+            if self._buffers is not None and latest_id == self._built_max_id:
+                return
+            rebuild = self._buffers is None or latest_id < self._built_max_id
+            rows = load_points(0 if rebuild else self._built_max_id, latest_id)
+            if rebuild:
+                self._build(rows)
+            else:
+                self._append(list(rows))
+            self._built_max_id = latest_id
+
+    def _build(self, rows):
+        ids, lats, lons, uploaded = [], [], [], []
+        for image_id, lat, lon, uploaded_at in rows:
+            ids.append(image_id)
+            lats.append(lat)
+            lons.append(lon)
+            uploaded.append(uploaded_at)
+        columns = (np.array(ids, dtype=np.int64), np.array(lats, dtype=np.float64),
+                   np.array(lons, dtype=np.float64), np.array(uploaded, dtype='datetime64[s]'))
+        order = np.argsort(columns[1], kind='stable')
+        self._buffers = tuple(column[order] for column in columns)
+        self._size = self._sorted = len(ids)
+
+    def _append(self, rows):
+        if not rows:
+            return
+        self._reserve(self._size + len(rows))
+        ids, lats, lons, uploaded = self._buffers
+        for n, (image_id, lat, lon, uploaded_at) in enumerate(rows, start=self._size):
+            ids[n], lats[n], lons[n] = image_id, lat, lon
+            uploaded[n] = np.datetime64(uploaded_at, 's')
+        self._size += len(rows)
+        if self._size - self._sorted > max(MIN_TAIL_MERGE, self._sorted // 8):
+            self._merge_tail()
+
+    def _reserve(self, size):
+        capacity = len(self._buffers[0])
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        grown = []
+        for column in self._buffers:
+            buffer = np.empty(capacity, dtype=column.dtype)
+            buffer[:self._size] = column[:self._size]
+            grown.append(buffer)
+        # Readers keep views of the old buffers, which stay valid
+        self._buffers = tuple(grown)
+
+    def _merge_tail(self):
+        columns = [column[:self._size] for column in self._buffers]
+        order = np.argsort(columns[1], kind='stable')
+        self._buffers = tuple(column[order] for column in columns)
+        self._sorted = self._size
+
+    def _snapshot(self):
+        with self._lock:
+            if self._buffers is None:
+                return None, 0
+            return tuple(column[:self._size] for column in self._buffers), self._sorted
+
+    def _latitude_band(self, lo_lat, hi_lat):
+        """Columns of the rows with lo_lat <= latitude <= hi_lat: a slice of the
+        sorted rows plus the matching rows of the tail."""
+        columns, sorted_rows = self._snapshot()
+        if columns is None:
+            return None
+        sorted_lats = columns[1][:sorted_rows]
+        start = np.searchsorted(sorted_lats, lo_lat, side='left')
+        stop = np.searchsorted(sorted_lats, hi_lat, side='right')
+        head = [column[start:stop] for column in columns]
+        if sorted_rows == len(columns[0]):
+            return head
+        tail_lats = columns[1][sorted_rows:]
+        mask = (tail_lats >= lo_lat) & (tail_lats <= hi_lat)
+        return [np.concatenate((part, column[sorted_rows:][mask])) for part, column in zip(head, columns)]
+
+    def heatmap(self, min_lon, min_lat, max_lon, max_lat, resolution, uploaded_from=None, uploaded_to=None):
+        """Photo counts on a ``resolution`` x ``resolution`` grid over the bbox.
+
+        Row 0 is the northern edge and column 0 the western edge, like a raster.
+        Points on the east or south boundary fall into the last cell. Optional
+        ``uploaded_from`` (inclusive) and ``uploaded_to`` (exclusive) are naive
+        UTC datetimes.
+        """
+        grid = np.zeros(resolution * resolution, dtype=np.int64)
+        band = self._latitude_band(min_lat, max_lat)
+        if band is None:
+            return grid.reshape(resolution, resolution)
+        _, lats, lons, uploaded = band
+        width, height = bbox_width(min_lon, max_lon), max_lat - min_lat
+        x = np.mod(lons - min_lon, 360.0)
+        keep = x <= width
+        if uploaded_from is not None:
+            keep &= uploaded >= np.datetime64(uploaded_from, 's')
+        if uploaded_to is not None:
+            keep &= uploaded < np.datetime64(uploaded_to, 's')
+        x, y = x[keep], max_lat - lats[keep]
+        columns = np.minimum((x * (resolution / width)).astype(np.int64), resolution - 1)
+        rows = np.minimum((y * (resolution / height)).astype(np.int64), resolution - 1)
+        grid += np.bincount(rows * resolution + columns, minlength=resolution * resolution)
+        return grid.reshape(resolution, resolution)
+
+    def nearby(self, lat, lon, radius_km, limit):
+        """Images within ``radius_km`` of (lat, lon), nearest first.
+
+        Returns ``(rows, total)``: at most ``limit`` tuples of ``(id, latitude,
+        longitude, distance_km)`` and the number of images inside the radius.
+        """
+        reach = math.degrees(radius_km / EARTH_RADIUS_KM)
+        band = self._latitude_band(lat - reach, lat + reach)
+        if band is None:
+            return [], 0
+        ids, lats, lons, _ = band
+        distances = haversine_km(lat, lon, lats, lons)
+        inside = np.flatnonzero(distances <= radius_km)
+        total = len(inside)
+        if total > limit:
+            inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+        inside = inside[np.lexsort((ids[inside], distances[inside]))]
+        rows = [(int(ids[n]), float(lats[n]), float(lons[n]), float(distances[n])) for n in inside]
+        return rows, total
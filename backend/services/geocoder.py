@@ -0,0 +1,184 @@
+"""Offline reverse geocoding against a local place-name dataset.
+
+``build_dataset`` converts a GeoNames dump (e.g. ``cities1000.txt``) into a
+compact binary file whose point array *is* a balanced KD-tree in implicit
+layout: the median of every range sits in the middle of it, split on x, y, z
+by depth. ``ReverseGeocoder`` memory-maps that file and searches it in place,
+so loading is instant, the pages are shared between worker processes, and a
+lookup touches only a few dozen nodes.
+
+Points are stored as unit vectors on the sphere, which makes the Euclidean
+(chord) nearest neighbour the great-circle nearest one and removes any
+special-casing around the antimeridian or the poles.
+
+File layout (little endian)::
+
+    magic      8 bytes   b'GSMGEO1\\0'
+    count      uint32    number of places N
+    names_len  uint32    size of the names blob in bytes
+    coords     N * 3 float64   unit vectors, in KD-tree order
+    offsets    (N + 1) * uint32   start of each name in the blob
+    names      names_len bytes   UTF-8 labels, e.g. "Paris, FR"
+"""
+import math
+import mmap
+import struct
+
+MAGIC = b'GSMGEO1\x00'
+HEADER = struct.Struct('<8sII')
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_MAX_DISTANCE_KM = 100.0
+
+# GeoNames "geoname" table columns used here
+GEONAMES_NAME = 1
+GEONAMES_LATITUDE = 4
+GEONAMES_LONGITUDE = 5
+GEONAMES_COUNTRY_CODE = 8
+
+def to_unit_vector(lat, lon):
+    lat_r, lon_r = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat_r)
+    return cos_lat * math.cos(lon_r), cos_lat * math.sin(lon_r), math.sin(lat_r)
+
+def chord_for_km(distance_km):
+    return 2.0 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2.0)
+
+def km_for_chord(chord):
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(chord / 2.0, 1.0))
+
+def read_geonames(path):
+    """Yields ``(label, lat, lon)`` from a GeoNames tab-separated dump."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) <= GEONAMES_COUNTRY_CODE:
+                continue
+            label = fields[GEONAMES_NAME]
+            if fields[GEONAMES_COUNTRY_CODE]:
+                label = f"{label}, {fields[GEONAMES_COUNTRY_CODE]}"
+            yield label, float(fields[GEONAMES_LATITUDE]), float(fields[GEONAMES_LONGITUDE])
+
+def build_dataset(places, out_path):
+    """Writes ``(label, lat, lon)`` places to ``out_path``. Returns the count."""
+    places = [(label, to_unit_vector(lat, lon)) for label, lat, lon in places]
+    ordered = [None] * len(places)
+
+    # Iterative median split: (lo, hi, depth, items that belong in [lo, hi))
+    stack = [(0, len(places), 0, places)]
+    while stack:
+        lo, hi, depth, items = stack.pop()
+        if not items:
+            continue
+        axis = depth % 3
+        items.sort(key=lambda item: item[1][axis])
+        mid = (lo + hi) // 2
+        ordered[mid] = items[mid - lo]
+        stack.append((lo, mid, depth + 1, items[:mid - lo]))
+        stack.append((mid + 1, hi, depth + 1, items[mid - lo + 1:]))
+
+    names = bytearray()
+    offsets = []
+    for label, _ in ordered:
+        offsets.append(len(names))
+        names += label.encode('utf-8')
+    offsets.append(len(names))
+
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(ordered), len(names)))
+        f.write(struct.pack(f'<{3 * len(ordered)}d', *(c for _, xyz in ordered for c in xyz)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(names)
+    return len(ordered)
+
+class ReverseGeocoder:
+    """Nearest-place lookups over a memory-mapped dataset built by ``build_dataset``."""
+
+    def __init__(self, path, max_distance_km=DEFAULT_MAX_DISTANCE_KM):
+        self.path = path
+        self.max_distance_km = max_distance_km
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, names_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a reverse geocoder dataset")
+        view = memoryview(self._mmap)
+        coords_start = HEADER.size
+        offsets_start = coords_start + 24 * self.count
+        names_start = offsets_start + 4 * (self.count + 1)
+        self._coords = view[coords_start:offsets_start].cast('d')
+        self._offsets = view[offsets_start:names_start].cast('I')
+        self._names = view[names_start:names_start + names_len]
+
+    def close(self):
+        self._coords.release()
+        self._offsets.release()
+        self._names.release()
+        self._mmap.close()
+
+    def label(self, index):
+        return bytes(self._names[self._offsets[index]:self._offsets[index + 1]]).decode('utf-8')
+
+    def nearest(self, lat, lon, max_distance_km=None):
+        """Returns ``(label, distance_km)`` of the closest place, or ``None``
+        if there is none within ``max_distance_km``."""
+        if max_distance_km is None:
+            max_distance_km = self.max_distance_km
+        if not self.count:
+            return None
+        qx, qy, qz = to_unit_vector(lat, lon)
+        query = (qx, qy, qz)
+        coords = self._coords
+        limit = chord_for_km(max_distance_km)
+        best_d2 = limit * limit
+        best = -1
+
+        # Depth-first search of the implicit tree: (lo, hi, depth)
+        stack = [(0, self.count, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) >> 1
+            base = 3 * mid
+            dx = coords[base] - qx
+            dy = coords[base + 1] - qy
+            dz = coords[base + 2] - qz
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 < best_d2:
+                best_d2, best = d2, mid
+
+            axis = depth % 3
+            diff = query[axis] - coords[base + axis]
+            near, far = ((mid + 1, hi), (lo, mid)) if diff > 0 else ((lo, mid), (mid + 1, hi))
+            # Visit the near side first (pushed last); only queue the far side
+            # if the splitting plane is closer than the best match so far
+            if diff * diff < best_d2:
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+
+        if best < 0:
+            return None
+        return self.label(best), km_for_chord(math.sqrt(best_d2))
+
+    def lookup(self, lat, lon):
+        """Returns the label of the nearest place, or ``None``."""
+        result = self.nearest(lat, lon)
+        return result[0] if result else None
+
+    def lookup_many(self, points):
+        """Batch lookup for ``(lat, lon)`` pairs (``None`` coordinates allowed).
+
+        Repeated coordinates, common when importing a burst of photos, are
+        resolved once.
+        """
+        seen = {}
+        results = []
+        for lat, lon in points:
+            if lat is None or lon is None:
+                results.append(None)
+                continue
+            key = (lat, lon)
+            if key not in seen:
+                seen[key] = self.lookup(lat, lon)
+            results.append(seen[key])
+        return results
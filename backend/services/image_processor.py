@@ -1,5 +1,9 @@
+import logging
 from PIL import Image as PILImage, UnidentifiedImageError # Aliasing to avoid conflict if we name our model Image
 from PIL.ExifTags import TAGS, GPSTAGS
+from .exif_header import read_gps_info
+
+logger = logging.getLogger(__name__)
 
 def get_exif_data(image_path):
     """Extracts EXIF data from an image."""
@@ -21,7 +25,7 @@ def get_exif_data(image_path):
     except UnidentifiedImageError:
         raise ValueError("Cannot identify image file. The file may be corrupted or not a supported image format.")
     except Exception as e:
-        print(f"Error reading EXIF data: {e}") # Replace with proper logging
+        logger.warning("Error reading EXIF data from %s: %s", image_path, e)
     return exif_data
 
 def get_decimal_from_dms(dms, ref):
@@ -55,9 +59,43 @@ def get_lat_lon(exif_data):
     
     return lat, lon
 
-def process_image_data(image_path):
-    """Processes an image to extract location data."""
-    exif_data = get_exif_data(image_path)
+def check_image(image_path):
+    """Raises ValueError unless Pillow recognises the file as an image.
+
+    ``PILImage.open`` only reads the header (for a JPEG, the markers up to the
+    frame header), so this is cheap next to decoding the pixels.
+    """
+    try:
+        with PILImage.open(image_path):
+            pass
+    except UnidentifiedImageError:
+        raise ValueError("Cannot identify image file. The file may be corrupted or not a supported image format.")
+
+def get_gps_exif_data(image_path):
+    """Extracts just the GPS EXIF data, reading only the file header when possible.
+
+    JPEG and TIFF files are handled by the header-only parser; anything it
+    cannot make sense of (PNG, GIF, odd or truncated files) goes through
+    Pillow via get_exif_data. Either way the file must be a readable image.
+    """
+    gps_info = read_gps_info(image_path)
+    if gps_info is None:
+        return get_exif_data(image_path)
+    check_image(image_path)
+    return {"GPSInfo": gps_info} if gps_info else {}
+
+def process_image_data(image_path, gps_info=None):
+    """Processes an image to extract location data.
+
+    ``gps_info`` can carry GPS tags already parsed from the file header (e.g.
+    while the upload was streamed to disk), in which case the file is not
+    parsed again; Pillow still checks that it is an image.
+    """
+    if gps_info is not None:
+        check_image(image_path)
+        exif_data = {"GPSInfo": gps_info} if gps_info else {}
+    else:
+        exif_data = get_gps_exif_data(image_path)
     latitude, longitude = get_lat_lon(exif_data)
     gps_data_found = bool(latitude is not None and longitude is not None)
     
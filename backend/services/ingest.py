@@ -0,0 +1,98 @@
+"""Single-pass upload ingest.
+
+Copies an upload stream to storage in fixed-size chunks while feeding the
+leading chunks to the header-only GPS parser and hashing every byte, so the
+file is written once, never re-read for EXIF or size, and memory use stays
+bounded by the chunk size plus the EXIF header window.
+"""
+import hashlib
+
+from .exif_header import parse_gps_info, NeedMoreData, MAX_HEADER_BYTES
+from .image_processor import process_image_data
+
+CHUNK_SIZE = 64 * 1024
+
+class IngestWriter:
+    """Incremental form of ``stream_to_storage`` for callers that are handed
+    chunks rather than a readable stream (e.g. an async multipart parser).
+    With ``file_path=None`` nothing is written; chunks are only hashed and
+    parsed."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._out = open(file_path, 'wb') if file_path is not None else None
+        self._hasher = hashlib.sha256()
+        self._size = 0
+        self._head = bytearray()
+        self._gps_info = None
+        self._gps_pending = True
+
+    def write(self, chunk):
+        self._hasher.update(chunk)
+        self._size += len(chunk)
+        if self._gps_pending:
+            self._head += chunk
+            try:
+                self._gps_info = parse_gps_info(self._head)
+                self._gps_pending = False
+            except NeedMoreData:
+                if len(self._head) >= MAX_HEADER_BYTES:
+                    self._gps_pending = False
+            if not self._gps_pending:
+                self._head = None
+        if self._out is not None:
+            self._out.write(chunk)
+
+    def close(self):
+        """Closes the file and returns the same dict as ``stream_to_storage``."""
+        if self._out is not None:
+            self._out.close()
+        return {
+            'size': self._size,
+            'content_hash': self._hasher.hexdigest(),
+            'gps_info': self._gps_info,
+        }
+
+    def abort(self):
+        if self._out is not None:
+            self._out.close()
+
+def stream_to_storage(stream, file_path, chunk_size=CHUNK_SIZE):
+    """Writes ``stream`` to ``file_path`` and extracts GPS tags on the way.
+
+    Returns a dict with the byte ``size``, the ``content_hash`` (SHA-256 hex
+    digest) and ``gps_info`` as returned by ``parse_gps_info``. ``gps_info``
+    is ``None`` when the header parser could not decide, in which case the
+    caller should fall back to ``process_image_data(file_path)``.
+    ``file_path=None`` only hashes and parses the stream.
+    """
+    writer = IngestWriter(file_path)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+def ingest_file(source_path, temp_path=None):
+    """``stream_to_storage`` plus location extraction for a file already on
+    disk, as run on the process pool by ``flask import-photos``.
+
+    The file is read once: copied to ``temp_path`` while it is hashed, or only
+    hashed when ``temp_path`` is None. Pillow is only opened if the header
+    parser could not decide. Returns ``size``, ``content_hash``,
+    ``latitude``, ``longitude`` and ``gps_data_found``.
+    """
+    with open(source_path, 'rb') as stream:
+        stored = stream_to_storage(stream, temp_path)
+    location_data = process_image_data(source_path, gps_info=stored.pop('gps_info'))
+    stored.update(
+        latitude=location_data['latitude'],
+        longitude=location_data['longitude'],
+        gps_data_found=location_data['gps_data_found'],
+    )
+    return stored
@@ -0,0 +1,99 @@
+"""Minimal Mapbox Vector Tile (v2.1) encoder for point layers.
+
+Only what the photo map needs: one layer of POINT features with integer or
+string properties, written straight to protobuf wire format so no protobuf
+runtime is required.
+"""
+import math
+import struct
+
+EXTENT = 4096
+MEDIA_TYPE = 'application/vnd.mapbox-vector-tile'
+
+# Tile.layers, Layer.{name, features, keys, values, extent, version},
+# Feature.{id, tags, type, geometry}, Value.{string_value, uint64_value, sint64_value}
+_POINT = 1
+_MOVE_TO_ONE = (1 & 0x7) | (1 << 3)
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+def _len_delimited(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+def _packed(field, values):
+    return _len_delimited(field, b''.join(_varint(v) for v in values))
+
+def _value(value):
+    if isinstance(value, str):
+        return _len_delimited(1, value.encode('utf-8'))
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    raise TypeError(f'Unsupported property type: {type(value).__name__}')
+
+def tile_bounds(zoom, tile_x, tile_y):
+    """Returns the (min_lon, min_lat, max_lon, max_lat) of an XYZ tile."""
+    n = 1 << zoom
+    def lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return tile_x / n * 360.0 - 180.0, lat(tile_y + 1), (tile_x + 1) / n * 360.0 - 180.0, lat(tile_y)
+
+def encode_points(layer_name, zoom, tile_x, tile_y, points, extent=EXTENT):
+    """Encodes a single-layer tile.
+
+    ``points`` is an iterable of ``(feature_id, world_x, world_y, properties)``
+    with world coordinates in [0, 1) Web Mercator space; points outside the
+    tile are skipped.
+    """
+    n = 1 << zoom
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    features = []
+    for feature_id, world_x, world_y, properties in points:
+        px = int((world_x * n - tile_x) * extent)
+        py = int((world_y * n - tile_y) * extent)
+        if not (0 <= px < extent and 0 <= py < extent):
+            continue
+        tags = []
+        for name, value in properties.items():
+            if name not in key_index:
+                key_index[name] = len(keys)
+                keys.append(name)
+            value_key = (type(value), value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags += (key_index[name], value_index[value_key])
+        feature = _key(1, 0) + _varint(feature_id)
+        if tags:
+            feature += _packed(2, tags)
+        feature += _key(3, 0) + _varint(_POINT)
+        feature += _packed(4, (_MOVE_TO_ONE, _zigzag(px), _zigzag(py)))
+        features.append(feature)
+
+    layer = _key(15, 0) + _varint(2) + _len_delimited(1, layer_name.encode('utf-8'))
+    layer += b''.join(_len_delimited(2, f) for f in features)
+    layer += b''.join(_len_delimited(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_len_delimited(4, _value(v)) for v in values)
+    layer += _key(5, 0) + _varint(extent)
+    return _len_delimited(3, layer)
@@ -0,0 +1,75 @@
+"""What is needed to serve an original upload, cached per image.
+
+Serving a photo needs its path, MIME type, size, mtime and ETag. Blobs in
+the upload folder are content-addressed and never rewritten, so these are
+looked up once (a database row and a ``stat``) and kept in an LRU keyed by
+image id. A cached request then costs one ``open`` and the body is sent
+through ``wsgi.file_wrapper``, which servers such as Gunicorn turn into
+``sendfile(2)``. Open descriptors are not cached: concurrent responses
+would share one file offset.
+
+Originals imported by reference live in the user's own tree and may
+change, so they are never cached and get an ETag from their size and mtime
+instead of the content hash recorded at import.
+"""
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+DEFAULT_CAPACITY = 4096
+
+#: ``immutable`` is true for content-addressed blobs, which may be cached
+#: forever by clients; ``accel_path`` is set when a front-end server can
+#: send the file itself (X-Accel-Redirect).
+Original = namedtuple('Original', 'path mimetype etag size mtime immutable accel_path')
+
+def describe(path, mimetype, content_hash=None, immutable=True, accel_path=None):
+    """Builds an ``Original`` from a ``stat`` of ``path``. Raises OSError if it is missing."""
+    stat = os.stat(path)
+    if immutable and content_hash:
+        etag = content_hash
+    else:
+        etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    return Original(path, mimetype or 'application/octet-stream', etag, stat.st_size, stat.st_mtime,
+                    immutable, accel_path)
+
+class OriginalCache:
+    """Thread-safe LRU cache from image id to ``Original``."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_id):
+        with self._lock:
+            entry = self._entries.get(image_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(image_id)
+            self.hits += 1
+            return entry
+
+    def put(self, image_id, entry):
+        if not entry.immutable or self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[image_id] = entry
+            self._entries.move_to_end(image_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def discard(self, image_id):
+        with self._lock:
+            self._entries.pop(image_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
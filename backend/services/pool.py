@@ -0,0 +1,75 @@
+"""Bounded process pool for CPU-bound image work.
+
+One executor is shared per process and created on first use, so request
+handlers that never need it pay nothing.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .image_processor import process_image_data
+
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+_executor_workers = None
+_lock = threading.Lock()
+
+def get_executor(max_workers=None):
+    """Returns the shared ProcessPoolExecutor, (re)creating it if the size changed."""
+    global _executor, _executor_workers
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    with _lock:
+        if _executor is None or _executor_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=max_workers)
+            _executor_workers = max_workers
+        return _executor
+
+def shutdown():
+    global _executor, _executor_workers
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+        _executor_workers = None
+
+atexit.register(shutdown)
+
+def process_many(jobs, max_workers=None):
+    """Runs process_image_data over ``(image_path, gps_info)`` pairs.
+
+    Returns one entry per job, in order: the location dict, or the exception
+    raised for that file. Jobs whose GPS was already parsed from the header
+    are cheap and run inline; only files that need Pillow go to the pool.
+    A single Pillow job also runs inline, since the IPC would cost more than
+    it saves.
+    """
+    results = [None] * len(jobs)
+    pooled = []
+    for i, (image_path, gps_info) in enumerate(jobs):
+        if gps_info is None:
+            pooled.append(i)
+        else:
+            results[i] = _run(image_path, gps_info)
+
+    if len(pooled) == 1:
+        i = pooled[0]
+        results[i] = _run(jobs[i][0], None)
+    elif pooled:
+        executor = get_executor(max_workers)
+        futures = {i: executor.submit(process_image_data, jobs[i][0]) for i in pooled}
+        for i, future in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = e
+    return results
+
+def _run(image_path, gps_info):
+    try:
+        return process_image_data(image_path, gps_info=gps_info)
+    except Exception as e:
+        return e
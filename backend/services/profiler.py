@@ -0,0 +1,57 @@
+"""Wall-clock sampling profiler for a single thread.
+
+A daemon thread wakes every ``interval`` seconds and records the target
+thread's current Python stack from ``sys._current_frames()``. Nothing is
+hooked into the profiled code, so its cost is the sampler's own wakeups and
+does not grow with the number of function calls. Results use the collapsed
+stack format read by flamegraph.pl and speedscope.
+"""
+import sys
+import threading
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def format_collapsed(samples):
+    """One ``frame;frame;frame count`` line per distinct stack."""
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
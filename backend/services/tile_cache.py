@@ -0,0 +1,108 @@
+"""Size-bounded LRU cache of encoded vector tiles.
+
+Each entry is keyed by ``(z, x, y)`` and holds the tile bytes and its ETag.
+When a photo is added, only the tiles containing it (one per zoom level) are
+dropped; everything else stays valid. The cache remembers the largest image
+id it has accounted for, and ``ensure_current`` finds the photos committed
+since then in the database, whichever process committed them.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .clustering import project
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def tile_etag(data):
+    return hashlib.sha1(data).hexdigest()
+
+class TileCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_zoom=22):
+        self.max_bytes = max_bytes
+        self.max_zoom = max_zoom
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.version = 0  # Largest image id whose tiles have been invalidated
+
+    def ensure_current(self, latest_id, load_points):
+        """Drops the tiles covering images with ``version < id <= latest_id``.
+
+        ``load_points(after_id, until_id)`` yields ``(id, latitude, longitude)``
+        for those images. An id going backwards means the table was recreated,
+        and the whole cache is cleared.
+        """
+        if latest_id == self.version:
+            return
+        with self._lock:
+            if latest_id < self.version:
+                self._entries.clear()
+                self._bytes = 0
+            elif self._entries:
+                for _, lat, lon in load_points(self.version, latest_id):
+                    self._invalidate(lat, lon)
+            self.version = latest_id
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, data, version=None):
+        """Stores ``data`` and returns the ``(data, etag)`` entry.
+
+        A tile rendered at an older ``version`` than the cache has reached in
+        the meantime may miss a photo, so it is returned but not stored.
+        """
+        entry = (data, tile_etag(data))
+        if len(data) > self.max_bytes:
+            return entry
+        with self._lock:
+            if version is not None and version != self.version:
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = entry
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return entry
+
+    def invalidate_point(self, lat, lon):
+        """Drops the cached tile covering ``(lat, lon)`` at every zoom."""
+        with self._lock:
+            self._invalidate(lat, lon)
+
+    def _invalidate(self, lat, lon):
+        x, y = project(lat, lon)
+        for zoom in range(self.max_zoom + 1):
+            n = 1 << zoom
+            entry = self._entries.pop((zoom, int(x * n), int(y * n)), None)
+            if entry is not None:
+                self._bytes -= len(entry[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.version = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tiles': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,25 @@
+"""Signals emitted around Image writes.
+
+In-memory indexes (clusters, tiles, analytics caches) do not listen for
+inserts: a commit is only announced in the process that made it, and other
+workers, the ASGI server or ``flask import-photos`` write to the same
+database. Instead each index remembers the largest image id it holds and
+loads newer rows on its next use. What ids cannot tell them is that the
+table was recreated, which is announced here.
+"""
+from blinker import Namespace
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from .models import Image
+
+_signals = Namespace()
+
+#: Sent with the app as sender when the images table is (re)created, so
+#: in-memory indexes can drop what they hold.
+images_reset = _signals.signal('images-reset')
+
+@event.listens_for(Image.__table__, 'after_create')
+def _announce_reset(target, connection, **kw):
+    if has_app_context():
+        images_reset.send(current_app._get_current_object())
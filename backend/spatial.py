@@ -0,0 +1,98 @@
+"""Spatial index for image locations.
+
+On SQLite the ``images_rtree`` R*Tree virtual table mirrors every located
+``images`` row and is kept in sync by triggers, so inserts from any code path
+(ORM, bulk inserts, raw SQL) are indexed. Other databases fall back to the
+composite (latitude, longitude) B-tree index declared on the model.
+"""
+from sqlalchemy import event, text, DDL
+
+from . import db
+from .models import Image
+
+RTREE_TABLE = 'images_rtree'
+
+# R*Tree stores 32-bit floats rounded outwards, so matches are re-checked
+# against the exact coordinates in `images`.
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, min_lon, max_lon, min_lat, max_lat)",
+    f"""CREATE TRIGGER IF NOT EXISTS images_rtree_insert AFTER INSERT ON images
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO {RTREE_TABLE} VALUES (NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS images_rtree_update AFTER UPDATE OF latitude, longitude ON images
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+            INSERT INTO {RTREE_TABLE}
+                SELECT NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude
+                WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS images_rtree_delete AFTER DELETE ON images
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+        END""",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Image.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Image.__table__, 'before_drop',
+             DDL(f"DROP TABLE IF EXISTS {RTREE_TABLE}").execute_if(dialect='sqlite'))
+
+def uses_rtree():
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_spatial_index():
+    """Creates the R*Tree and triggers on databases that predate them and
+    backfills rows that were inserted before the index existed."""
+    if not uses_rtree():
+        return
+    with db.engine.begin() as conn:
+        for statement in SQLITE_DDL:
+            conn.execute(text(statement))
+        indexed = conn.execute(text(f"SELECT count(*) FROM {RTREE_TABLE}")).scalar()
+        if indexed == 0:
+            conn.execute(text(
+                f"INSERT INTO {RTREE_TABLE} "
+                "SELECT id, longitude, longitude, latitude, latitude FROM images "
+                "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"))
+
+def parse_bbox(value):
+    """Parses 'minLon,minLat,maxLon,maxLat'. Raises ValueError if malformed.
+
+    minLon may be greater than maxLon for a box crossing the antimeridian.
+    """
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox must be minLon,minLat,maxLon,maxLat')
+    min_lon, min_lat, max_lon, max_lat = (float(p) for p in parts)
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError('bbox is out of range')
+    return min_lon, min_lat, max_lon, max_lat
+
+def split_antimeridian(min_lon, min_lat, max_lon, max_lat):
+    if min_lon <= max_lon:
+        return [(min_lon, min_lat, max_lon, max_lat)]
+    return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+
+def bbox_filter(min_lon, min_lat, max_lon, max_lat):
+    """Returns a SQLAlchemy filter selecting images inside the bounding box."""
+    clauses = []
+    boxes = split_antimeridian(min_lon, min_lat, max_lon, max_lat)
+    for n, (lo_lon, lo_lat, hi_lon, hi_lat) in enumerate(boxes):
+        exact = db.and_(Image.latitude.between(lo_lat, hi_lat), Image.longitude.between(lo_lon, hi_lon))
+        if uses_rtree():
+            candidates = text(
+                f"SELECT id FROM {RTREE_TABLE} WHERE min_lon <= :hi_lon_{n} AND max_lon >= :lo_lon_{n} "
+                f"AND min_lat <= :hi_lat_{n} AND max_lat >= :lo_lat_{n}"
+            ).bindparams(**{f'lo_lon_{n}': lo_lon, f'lo_lat_{n}': lo_lat,
+                            f'hi_lon_{n}': hi_lon, f'hi_lat_{n}': hi_lat})
+            exact = db.and_(Image.id.in_(candidates.columns(db.column('id'))), exact)
+        clauses.append(exact)
+    return clauses[0] if len(clauses) == 1 else db.or_(*clauses)
+
+def images_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=None):
+    query = Image.query.filter(bbox_filter(min_lon, min_lat, max_lon, max_lat)).order_by(Image.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
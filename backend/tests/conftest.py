@@ -0,0 +1,48 @@
+import tempfile
+import shutil
+import pytest
+
+from backend import create_app, db
+
+@pytest.fixture
+def temp_upload_folder():
+    """Create a temporary folder for uploads and clean up afterwards."""
+    temp_dir = tempfile.mkdtemp()
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+@pytest.fixture
+def database_url(tmp_path):
+    """A throwaway SQLite file, so tests never touch instance/photomap.db."""
+    return 'sqlite:///' + str(tmp_path / 'test.db')
+
+@pytest.fixture
+def app_context(temp_upload_folder, database_url, monkeypatch):
+    """Set up the Flask app for testing.
+
+    create_app() binds the engine while it runs, so the database and upload
+    folder have to be chosen through the environment beforehand.
+    """
+    monkeypatch.setenv('DATABASE_URL', database_url)
+    monkeypatch.setenv('UPLOAD_FOLDER', temp_upload_folder)
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def other_app(app_context):
+    """A second app on the same database, standing in for another worker
+    process: its commits are invisible to app_context's in-process signals."""
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def client(app_context):
+    """A test client for the app."""
+    return app_context.test_client()
@@ -0,0 +1,123 @@
+import asyncio
+import io
+import os
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('httpx')  # Required by Starlette's TestClient
+from starlette.testclient import TestClient
+
+from backend import db
+from backend.async_app import create_asgi_app
+from backend.models import Image, Job
+from backend.benchmarks.corpus import make_image_bytes
+from backend.services.image_processor import process_image_data
+
+GPS = {1: 'N', 2: (37.0, 46.0, 29.64), 3: 'W', 4: (122.0, 25.0, 9.84)}
+
+@pytest.fixture
+def async_client(app_context):
+    with TestClient(create_asgi_app(app_context)) as client:
+        yield client
+
+def test_async_upload_streams_and_commits(async_client, app_context, temp_upload_folder):
+    data = make_image_bytes(size=(64, 48), gps=GPS)
+    response = async_client.post('/api/upload_image', files={'image': ('sf.jpg', data, 'image/jpeg')})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body['gps_data_found'] is True
+    assert body['latitude'] == pytest.approx(37.7749, abs=1e-3)
+    assert body['duplicate'] is False
+    with open(os.path.join(temp_upload_folder, body['storageName']), 'rb') as f:
+        assert f.read() == data
+    record = db.session.get(Image, body['imageId'])
+    assert record.mime_type == 'image/jpeg' and record.file_size_bytes == len(data)
+    assert Job.query.filter_by(image_id=record.id).count() == len(app_context.config['POST_UPLOAD_JOBS'])
+
+    again = async_client.post('/api/upload_image', files={'image': ('copy.jpg', data, 'image/jpeg')})
+    assert again.status_code == 201
+    assert again.json()['duplicate'] is True
+    assert again.json()['storageName'] == body['storageName']
+
+def test_async_upload_errors_match_flask(async_client, temp_upload_folder):
+    invalid = async_client.post('/api/upload_image', files={'image': ('bad.jpg', b'not an image', 'image/jpeg')})
+    assert invalid.status_code == 400
+    assert invalid.json()['error'].startswith('Uploaded file is not a valid image')
+    assert os.listdir(temp_upload_folder) == []
+
+    wrong_type = async_client.post('/api/upload_image', files={'image': ('notes.txt', b'text', 'text/plain')})
+    assert wrong_type.status_code == 400
+    assert wrong_type.json()['error'].startswith('Invalid image format')
+
+    missing = async_client.post('/api/upload_image', data={'other': 'field'}, files={'file': ('a.jpg', b'x')})
+    assert missing.status_code == 400
+    assert missing.json()['error'] == 'No image file provided'
+
+def test_async_batch_upload_and_fallthrough_routes(async_client):
+    png = make_image_bytes('PNG', size=(32, 32), color=(10, 200, 10))
+    files = [
+        ('images', ('sf.jpg', make_image_bytes(size=(64, 48), gps=GPS), 'image/jpeg')),
+        ('images', ('green.png', png, 'image/png')),
+        ('images', ('green-again.png', png, 'image/png')),
+        ('images', ('notes.txt', b'text', 'text/plain')),
+    ]
+    response = async_client.post('/api/upload_images', files=files)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert (body['created'], body['failed']) == (3, 1)
+    assert [r.get('duplicate') for r in body['results'][:3]] == [False, False, True]
+    assert 'error' in body['results'][3]
+
+    # Routes without a native handler are served by the Flask app
+    listing = async_client.get('/api/images?bbox=-123,37,-122,38')
+    assert listing.status_code == 200
+    assert listing.json()['count'] == 1
+
+def test_batch_results_match_flask(async_client, app_context):
+    png = make_image_bytes('PNG', size=(32, 32), color=(10, 200, 10))
+    files = [
+        ('images', ('sf.jpg', make_image_bytes(size=(64, 48), gps=GPS), 'image/jpeg')),
+        ('images', ('green.png', png, 'image/png')),
+        ('images', ('green-again.png', png, 'image/png')),
+        ('images', ('bad.jpg', b'not an image', 'image/jpeg')),
+        ('images', ('bad-again.jpg', b'not an image', 'image/jpeg')),
+        ('images', ('notes.txt', b'text', 'text/plain')),
+    ]
+
+    def normalized(body):
+        return [{key: value for key, value in result.items() if key not in ('imageId', 'duplicate')}
+                for result in body['results']]
+
+    flask_response = app_context.test_client().post(
+        '/api/upload_images', data={'images': [(io.BytesIO(data), name, mime) for _, (name, data, mime) in files]},
+        content_type='multipart/form-data')
+    # The same files again: stored ones come back as duplicates with the same fields
+    async_response = async_client.post('/api/upload_images', files=files)
+
+    assert async_response.status_code == flask_response.status_code == 201
+    assert normalized(async_response.json()) == normalized(flask_response.get_json())
+    assert [result.get('duplicate') for result in flask_response.get_json()['results']] == \
+           [False, False, True, None, None, None]
+    assert [result.get('duplicate') for result in async_response.json()['results']] == \
+           [True, True, True, None, None, None]
+
+def test_header_gps_uploads_are_checked_off_the_event_loop(async_client, monkeypatch):
+    from backend import async_app
+    on_loop = []
+
+    def recording(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return process_image_data(*args, **kwargs)
+
+    monkeypatch.setattr(async_app, 'process_image_data', recording)
+    data = make_image_bytes(size=(64, 48), gps=GPS)
+    response = async_client.post('/api/upload_image', files={'image': ('sf.jpg', data, 'image/jpeg')})
+
+    assert response.status_code == 201
+    assert on_loop == [False]
@@ -0,0 +1,49 @@
+import pytest
+
+from backend.services.clustering import ClusterIndex, project, unproject
+
+POINTS = [(1, 48.8566, 2.3522), (2, 48.8570, 2.3530), (3, -17.7, 178.0), (4, -14.3, -170.7)]
+
+def loader(points):
+    return lambda after_id, until_id: [p for p in points if after_id < p[0] <= until_id]
+
+def build(points=POINTS, max_zoom=12):
+    index = ClusterIndex(max_zoom=max_zoom)
+    index.ensure_current(max(p[0] for p in points), loader(points))
+    return index
+
+def test_project_round_trip():
+    lat, lon = unproject(*project(-33.86, 151.21))
+    assert lat == pytest.approx(-33.86)
+    assert lon == pytest.approx(151.21)
+
+def test_counts_are_preserved_at_every_zoom():
+    index = build()
+    for zoom in range(index.max_zoom + 1):
+        clusters, truncated = index.query(-180, -85, 180, 85, zoom)
+        assert sum(c['count'] for c in clusters) == len(POINTS)
+        assert truncated is False
+
+def test_antimeridian_query():
+    index = build()
+    clusters, _ = index.query(170, -20, -160, -10, zoom=3)
+    assert sorted(c['sampleImageId'] for c in clusters) == [3, 4]
+
+def test_catch_up_loads_only_new_ids_and_rebuilds_after_reset():
+    index = build()
+    points = POINTS + [(5, 48.8568, 2.3525)]
+    index.ensure_current(5, loader(points))
+    index.ensure_current(5, loader(points + [(5, 48.8568, 2.3525)]))  # Already current: not reloaded
+    clusters, _ = index.query(2, 48, 3, 49, zoom=10)
+    assert [c['count'] for c in clusters] == [3]
+
+    # Ids going backwards: the table was recreated
+    index.ensure_current(1, loader([(1, 48.8566, 2.3522)]))
+    clusters, _ = index.query(-180, -85, 180, 85, zoom=0)
+    assert [c['count'] for c in clusters] == [1]
+
+def test_limit_truncates():
+    index = build()
+    clusters, truncated = index.query(-180, -85, 180, 85, zoom=12, limit=2)
+    assert len(clusters) == 2
+    assert truncated is True
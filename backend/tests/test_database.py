@@ -0,0 +1,42 @@
+import pytest
+
+from backend import db
+from backend.database import batched_writes, engine_options, is_memory_sqlite
+from backend.models import Image
+
+def pragma(name):
+    return db.session.execute(db.text(f"PRAGMA {name}")).scalar()
+
+def test_connection_pragmas(app_context):
+    config = app_context.config
+    assert pragma('journal_mode').upper() == config['SQLITE_JOURNAL_MODE']
+    assert pragma('synchronous') == 1  # NORMAL
+    assert pragma('busy_timeout') == config['SQLITE_BUSY_TIMEOUT_MS']
+    assert pragma('cache_size') == -config['SQLITE_CACHE_SIZE_KB']
+
+def test_engine_options_for_memory_database():
+    config = {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLITE_BUSY_TIMEOUT_MS': 2500,
+              'SQLITE_POOL_SIZE': 4}
+    options = engine_options(config)
+    assert is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI'])
+    assert options['connect_args'] == {'timeout': 2.5, 'check_same_thread': False}
+    assert 'pool_size' not in options
+
+def test_batched_writes(app_context):
+    with batched_writes(batch_size=2) as batch:
+        for n in range(5):
+            batch.add(Image(original_filename=f'{n}.jpg', storage_filename=f'{n}.jpg'))
+        assert batch.committed == 4
+    assert batch.committed == 5
+    assert Image.query.count() == 5
+
+def test_batched_writes_rolls_back_pending(app_context):
+    with pytest.raises(RuntimeError):
+        with batched_writes(batch_size=10) as batch:
+            batch.add(Image(original_filename='a.jpg', storage_filename='a.jpg'))
+            raise RuntimeError('boom')
+    assert Image.query.count() == 0
+
+def test_fixture_uses_throwaway_database(app_context, database_url):
+    # drop_all() at teardown must never reach instance/photomap.db
+    assert db.engine.url.render_as_string() == database_url
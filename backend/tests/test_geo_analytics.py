@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from backend.services import geo_analytics
+from backend.services.geo_analytics import PointColumns, haversine_km
+
+UPLOADED = datetime(2024, 5, 1, 12, 0, 0)
+POINTS = [(1, 48.8566, 2.3522, UPLOADED), (2, -33.86, 151.21, UPLOADED), (3, -17.7, 178.0, UPLOADED),
+          (4, -14.3, -170.7, datetime(2024, 6, 1))]
+
+def loader(points):
+    return lambda after_id, until_id: [p for p in points if after_id < p[0] <= until_id]
+
+def build(points=POINTS):
+    columns = PointColumns()
+    columns.ensure_current(max(p[0] for p in points), loader(points))
+    return columns
+
+def test_haversine_matches_known_distance():
+    # Paris to London is about 344 km
+    assert haversine_km(48.8566, 2.3522, np.array([51.5074]), np.array([-0.1278]))[0] == pytest.approx(343.5, abs=1)
+
+def test_heatmap_bins_across_antimeridian_and_filters_upload_time():
+    columns = build()
+    grid = columns.heatmap(170, -20, -160, -10, 3)
+    assert grid.sum() == 2
+    assert grid[1, 1] == 1  # (-14.3, -170.7): east of the antimeridian
+    assert grid[2, 0] == 1  # (-17.7, 178.0): the south-west cell
+    assert columns.heatmap(170, -20, -160, -10, 3, uploaded_from=datetime(2024, 5, 15)).sum() == 1
+
+def test_catch_up_merges_tail_and_skips_loaded_ids(monkeypatch):
+    monkeypatch.setattr(geo_analytics, 'MIN_TAIL_MERGE', 1)
+    columns = build()
+    points = POINTS + [(5, 48.86, 2.35, UPLOADED)]
+    columns.ensure_current(5, loader(points))
+    points += [(7, 48.85, 2.34, UPLOADED), (8, 0.0, 0.0, UPLOADED)]
+    columns.ensure_current(8, loader(points))
+    columns.ensure_current(8, loader(points))
+    assert len(columns) == 7
+    rows, total = columns.nearby(48.8566, 2.3522, 5, limit=2)
+    assert [row[0] for row in rows] == [1, 5]
+    assert total == 3
+
+def test_empty_columns_and_rebuild_after_table_recreated():
+    columns = PointColumns()
+    assert not columns.built
+    columns.ensure_current(0, loader([]))
+    assert columns.heatmap(-180, -90, 180, 90, 4).sum() == 0
+    assert columns.nearby(0, 0, 100, limit=10) == ([], 0)
+
+    columns = build()
+    columns.ensure_current(1, loader([(1, 0.0, 0.0, UPLOADED)]))
+    assert len(columns) == 1
@@ -0,0 +1,72 @@
+import os
+import json
+import math
+import random
+import tempfile
+import shutil
+import pytest
+from io import BytesIO
+
+from backend.services.geocoder import ReverseGeocoder, build_dataset, read_geonames, EARTH_RADIUS_KM
+from backend.benchmarks.corpus import make_image_bytes
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+@pytest.fixture
+def temp_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+@pytest.fixture
+def random_places():
+    rng = random.Random(7)
+    return [(f'place {i}', rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(3000)]
+
+def test_nearest_matches_brute_force(temp_dir, random_places):
+    path = os.path.join(temp_dir, 'places.bin')
+    assert build_dataset(random_places, path) == len(random_places)
+    geocoder = ReverseGeocoder(path, max_distance_km=20000)
+
+    rng = random.Random(11)
+    for _ in range(200):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        expected = min(random_places, key=lambda p: haversine_km(lat, lon, p[1], p[2]))
+        label, distance = geocoder.nearest(lat, lon)
+        assert distance == pytest.approx(haversine_km(lat, lon, expected[1], expected[2]), abs=1e-6)
+    geocoder.close()
+
+def test_max_distance_and_antimeridian(temp_dir):
+    path = os.path.join(temp_dir, 'places.bin')
+    build_dataset([('Suva, FJ', -18.14, 178.44), ('Apia, WS', -13.83, -171.76)], path)
+    geocoder = ReverseGeocoder(path, max_distance_km=100)
+    assert geocoder.lookup(-18.0, 179.9) is None
+    assert geocoder.lookup(-18.2, 178.5) == 'Suva, FJ'
+    # Across the antimeridian from Suva
+    assert geocoder.nearest(-18.1, -179.9, max_distance_km=1500)[0] == 'Suva, FJ'
+    assert geocoder.lookup_many([(-18.2, 178.5), (None, None), (-18.2, 178.5)]) == ['Suva, FJ', None, 'Suva, FJ']
+    geocoder.close()
+
+def test_read_geonames(temp_dir):
+    path = os.path.join(temp_dir, 'cities.txt')
+    row = ['2988507', 'Paris', 'Paris', '', '48.85341', '2.3488', 'P', 'PPLC', 'FR', '', '11']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(row) + '\n')
+    assert list(read_geonames(path)) == [('Paris, FR', 48.85341, 2.3488)]
+
+def test_upload_fills_address(client, app_context, temp_dir):
+    path = os.path.join(temp_dir, 'places.bin')
+    build_dataset([('San Francisco, US', 37.77493, -122.41942), ('Oakland, US', 37.80437, -122.2708)], path)
+    app_context.extensions['geocoder'] = ReverseGeocoder(path)
+    try:
+        gps = {1: 'N', 2: (37.0, 46.0, 29.64), 3: 'W', 4: (122.0, 25.0, 9.84)}
+        data = {'image': (BytesIO(make_image_bytes(gps=gps, size=(64, 48))), 'sf.jpg')}
+        response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+        assert json.loads(response.data.decode('utf-8'))['address'] == 'San Francisco, US'
+    finally:
+        app_context.extensions['geocoder'].close()
+        app_context.extensions['geocoder'] = None
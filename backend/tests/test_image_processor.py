@@ -0,0 +1,61 @@
+import os
+import tempfile
+import shutil
+import pytest
+from PIL import Image as PILImage, ExifTags
+
+from backend.services.exif_header import parse_gps_info, read_gps_info, NeedMoreData
+from backend.services.image_processor import get_exif_data, get_lat_lon, process_image_data
+from backend.benchmarks.corpus import make_image_bytes
+
+GPS = {1: 'S', 2: (33.0, 51.0, 54.5), 3: 'E', 4: (151.0, 12.0, 36.0)}
+
+@pytest.fixture
+def temp_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+def write(temp_dir, name, data):
+    path = os.path.join(temp_dir, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def test_header_parser_matches_pillow(temp_dir):
+    path = write(temp_dir, 'gps.jpg', make_image_bytes(gps=GPS))
+    fast = get_lat_lon({'GPSInfo': read_gps_info(path)})
+    slow = get_lat_lon(get_exif_data(path))
+    assert fast == pytest.approx(slow)
+    assert fast[0] < 0 and fast[1] > 0
+
+def test_header_parser_tiff(temp_dir):
+    exif = PILImage.Exif()
+    exif[ExifTags.IFD.GPSInfo] = GPS
+    # Exif.tobytes() is the APP1 payload: "Exif\0\0" followed by a TIFF structure
+    path = write(temp_dir, 'gps.tif', exif.tobytes()[6:])
+    gps_info = read_gps_info(path)
+    assert gps_info['GPSLatitudeRef'] == 'S'
+    assert gps_info['GPSLongitude'] == pytest.approx((151.0, 12.0, 36.0))
+
+def test_header_parser_without_gps(temp_dir):
+    path = write(temp_dir, 'plain.jpg', make_image_bytes())
+    assert read_gps_info(path) == {}
+
+def test_header_parser_falls_back_for_png(temp_dir):
+    path = write(temp_dir, 'plain.png', make_image_bytes('PNG'))
+    assert read_gps_info(path) is None
+    result = process_image_data(path)
+    assert result['gps_data_found'] is False
+
+def test_header_parser_needs_more_data():
+    data = make_image_bytes(gps=GPS)
+    with pytest.raises(NeedMoreData):
+        parse_gps_info(data[:40])
+
+def test_process_image_data_uses_gps(temp_dir):
+    path = write(temp_dir, 'gps.jpg', make_image_bytes(gps=GPS))
+    result = process_image_data(path)
+    assert result['gps_data_found'] is True
+    assert result['latitude'] == pytest.approx(-(33 + 51 / 60 + 54.5 / 3600))
+    assert result['longitude'] == pytest.approx(151 + 12 / 60 + 36 / 3600)
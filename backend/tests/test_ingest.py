@@ -0,0 +1,41 @@
+import os
+import hashlib
+import tempfile
+import shutil
+import pytest
+from io import BytesIO
+
+from backend.services.ingest import stream_to_storage
+from backend.benchmarks.corpus import make_image_bytes
+
+GPS = {1: 'N', 2: (48.0, 51.0, 29.6), 3: 'E', 4: (2.0, 17.0, 40.2)}
+
+@pytest.fixture
+def temp_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+def test_stream_to_storage_writes_hashes_and_parses_gps(temp_dir):
+    data = make_image_bytes(gps=GPS, size=(800, 600))
+    path = os.path.join(temp_dir, 'out.jpg')
+    stored = stream_to_storage(BytesIO(data), path, chunk_size=1024)
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert stored['size'] == len(data)
+    assert stored['content_hash'] == hashlib.sha256(data).hexdigest()
+    assert stored['gps_info']['GPSLatitudeRef'] == 'N'
+    assert stored['gps_info']['GPSLongitude'] == pytest.approx((2.0, 17.0, 40.2))
+
+def test_stream_to_storage_without_gps(temp_dir):
+    path = os.path.join(temp_dir, 'out.jpg')
+    stored = stream_to_storage(BytesIO(make_image_bytes()), path)
+    assert stored['gps_info'] == {}
+
+def test_stream_to_storage_leaves_unknown_formats_to_pillow(temp_dir):
+    data = make_image_bytes('PNG', size=(32, 32))
+    path = os.path.join(temp_dir, 'out.png')
+    stored = stream_to_storage(BytesIO(data), path)
+    assert stored['gps_info'] is None
+    assert stored['size'] == len(data)
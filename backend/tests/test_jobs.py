@@ -0,0 +1,133 @@
+import os
+import json
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+
+from backend import db
+from backend import jobs
+from backend.models import Image, Job
+from backend.benchmarks.corpus import make_image_bytes
+
+@pytest.fixture(autouse=True)
+def derivatives_only(app_context, monkeypatch):
+    """Queue mechanics are easier to follow with one job per upload."""
+    monkeypatch.setitem(app_context.config, 'POST_UPLOAD_JOBS', ['derivatives'])
+
+def upload(client, name='photo.jpg'):
+    data = {'image': (BytesIO(make_image_bytes(size=(600, 400))), name)}
+    response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+    assert response.status_code == 201
+    return json.loads(response.data.decode('utf-8'))
+
+def get_status(client, image_id):
+    response = client.get(f'/api/images/{image_id}/status')
+    assert response.status_code == 200
+    return json.loads(response.data.decode('utf-8'))
+
+def test_upload_queues_jobs_and_worker_completes_them(client, temp_upload_folder):
+    uploaded = upload(client)
+    status = get_status(client, uploaded['imageId'])
+    assert status['status'] == 'pending'
+    assert [job['kind'] for job in status['jobs']] == ['derivatives']
+    # Nothing heavy happened in the request itself
+    assert not os.path.exists(os.path.join(temp_upload_folder, 'derivatives'))
+
+    assert jobs.run_pending() == 1
+    status = get_status(client, uploaded['imageId'])
+    assert status['status'] == 'done'
+    assert status['jobs'][0]['attempts'] == 1
+    assert len(os.listdir(os.path.join(temp_upload_folder, 'derivatives', 'thumb'))) == 1
+
+def test_failing_job_retries_then_fails(client, monkeypatch):
+    uploaded = upload(client)
+
+    def broken(image):
+        raise RuntimeError('boom')
+    monkeypatch.setitem(jobs.HANDLERS, 'derivatives', broken)
+    monkeypatch.setattr(jobs, 'RETRY_BACKOFF', jobs.RETRY_BACKOFF * 0)
+
+    assert jobs.run_pending() == jobs.MAX_ATTEMPTS
+    status = get_status(client, uploaded['imageId'])
+    assert status['status'] == 'failed'
+    assert status['jobs'][0]['attempts'] == jobs.MAX_ATTEMPTS
+    assert 'boom' in status['jobs'][0]['error']
+
+def test_claim_skips_jobs_taken_by_another_worker(client):
+    upload(client, 'a.jpg')
+    upload(client, 'b.jpg')
+    first = jobs.claim_next()
+    second = jobs.claim_next()
+    assert first.id != second.id
+    assert jobs.claim_next() is None
+
+def test_stale_running_jobs_are_requeued(client):
+    upload(client)
+    job = jobs.claim_next()
+    job.updated_at = jobs.utcnow() - jobs.LEASE_TIMEOUT * 2
+    db.session.commit()
+    assert jobs.requeue_stale() == 1
+    assert jobs.run_pending() == 1
+    assert db.session.get(Job, job.id).status == 'done'
+
+def test_stale_job_fails_after_max_attempts(client):
+    upload(client)
+    job = jobs.claim_next()
+    job.attempts = jobs.MAX_ATTEMPTS
+    job.updated_at = jobs.utcnow() - jobs.LEASE_TIMEOUT * 2
+    db.session.commit()
+    assert jobs.requeue_stale() == 0
+    job = db.session.get(Job, job.id)
+    assert job.status == 'failed'
+    assert 'Lease expired' in job.last_error
+    assert jobs.claim_next() is None
+
+def test_run_worker_command(client, app_context):
+    upload(client)
+    result = app_context.test_cli_runner().invoke(args=['run-worker', '--once'])
+    assert 'Ran 1 job(s).' in result.output
+    assert Job.query.filter_by(status='done').count() == 1
+
+def test_status_unknown_image(client):
+    assert client.get('/api/images/12345/status').status_code == 404
+
+def test_exif_job_stores_metadata_once(client, app_context, monkeypatch):
+    monkeypatch.setitem(app_context.config, 'POST_UPLOAD_JOBS', ['exif'])
+    tags = {0x010F: 'Canon', 0x0110: 'EOS R5', 0x0112: 6, 0x0132: '2021:07:04 18:30:00'}
+    data = {'image': (BytesIO(make_image_bytes(size=(64, 48), tags=tags)), 'camera.jpg')}
+    image_id = json.loads(client.post('/api/upload_image', content_type='multipart/form-data',
+                                      data=data).data.decode('utf-8'))['imageId']
+    assert jobs.run_pending() == 1
+
+    image = db.session.get(Image, image_id)
+    assert (image.camera_make, image.camera_model, image.orientation) == ('Canon', 'EOS R5', 6)
+    assert image.taken_at == datetime(2021, 7, 4, 18, 30)
+    assert image.exif['Model'] == 'EOS R5'
+
+def test_exif_job_copies_metadata_for_duplicates(client, app_context, monkeypatch):
+    from backend.services import image_processor
+    monkeypatch.setitem(app_context.config, 'POST_UPLOAD_JOBS', ['exif'])
+    tags = {0x010F: 'Canon', 0x0110: 'EOS R5', 0x0112: 6, 0x0132: '2021:07:04 18:30:00'}
+    photo = make_image_bytes(size=(64, 48), tags=tags)
+
+    def post(name):
+        data = {'image': (BytesIO(photo), name)}
+        return json.loads(client.post('/api/upload_image', content_type='multipart/form-data',
+                                      data=data).data.decode('utf-8'))['imageId']
+
+    first = post('camera.jpg')
+    assert jobs.run_pending() == 1
+    second = post('copy.jpg')
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('duplicate was parsed again')
+
+    monkeypatch.setattr(image_processor, 'get_exif_data', no_parsing)
+    assert jobs.run_pending() == 1
+
+    original, copy = db.session.get(Image, first), db.session.get(Image, second)
+    assert Job.query.filter_by(image_id=second).one().status == 'done'
+    assert copy.exif_blob == original.exif_blob
+    assert (copy.camera_make, copy.camera_model, copy.orientation, copy.taken_at) == \
+           ('Canon', 'EOS R5', 6, datetime(2021, 7, 4, 18, 30))
@@ -0,0 +1,74 @@
+import os
+import time
+from io import BytesIO
+
+from flask import Response
+
+from backend.benchmarks.corpus import make_image_bytes
+from backend.services.metrics import Registry
+
+# Fixtures (temp_upload_folder, app_context, client) live in conftest.py
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram('stage_seconds', 'Stage time.', labels=('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='exif')
+    histogram.observe(0.5, stage='exif')
+    histogram.observe(5, stage='exif')
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="exif",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="exif",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="exif",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="exif"} 3' in text
+
+def test_upload_records_stages_and_outcomes(client, app_context):
+    metrics = app_context.extensions['metrics']
+    created = metrics.uploads.value(outcome='created')
+    invalid = metrics.errors.value(error='invalid_format')
+    exif = metrics.stage_seconds.count(stage='exif')
+
+    data = {'image': (BytesIO(make_image_bytes(size=(32, 24))), 'photo.jpg')}
+    assert client.post('/api/upload_image', content_type='multipart/form-data', data=data).status_code == 201
+    data = {'image': (BytesIO(b'text'), 'notes.txt')}
+    assert client.post('/api/upload_image', content_type='multipart/form-data', data=data).status_code == 400
+
+    assert metrics.uploads.value(outcome='created') == created + 1
+    assert metrics.errors.value(error='invalid_format') == invalid + 1
+    assert metrics.stage_seconds.count(stage='exif') == exif + 1
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'gosnapmap_upload_stage_seconds_bucket{stage="db_commit",le="+Inf"}' in text
+    assert 'gosnapmap_http_request_duration_seconds_count{endpoint="api.upload_image",method="POST",status="201"}' in text
+    assert 'gosnapmap_jobs{status="queued"}' in text
+
+def test_profile_header_writes_collapsed_stacks(client, app_context, tmp_path):
+    app_context.config.update(PROFILER_ENABLED=True, PROFILER_DIR=str(tmp_path), PROFILER_INTERVAL=0.001)
+    try:
+        assert 'X-Profile-File' not in client.get('/api/images').headers
+        response = client.get('/api/images', headers={'X-Profile': '1'})
+    finally:
+        app_context.config['PROFILER_ENABLED'] = False
+    name = response.headers['X-Profile-File']
+    response.get_data()
+    response.close()
+    assert os.path.exists(tmp_path / name)
+
+def test_profile_covers_streamed_body(app_context, tmp_path):
+    app_context.config.update(PROFILER_ENABLED=True, PROFILER_DIR=str(tmp_path), PROFILER_INTERVAL=0.001)
+
+    def slow_body():
+        time.sleep(0.05)
+        yield b'done'
+
+    app_context.add_url_rule('/slow-stream', 'slow_stream', lambda: Response(slow_body()))
+    response = app_context.test_client().get('/slow-stream', headers={'X-Profile': '1'})
+    name = response.headers['X-Profile-File']
+    assert not os.path.exists(tmp_path / name)  # The body has not been produced yet
+
+    assert response.get_data() == b'done'
+    response.close()
+    assert 'slow_body' in (tmp_path / name).read_text()
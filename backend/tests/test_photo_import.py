@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from backend.models import Image, ImportedFile
+from backend.photo_import import import_photos
+from backend.benchmarks.corpus import make_image_bytes
+
+GPS = {1: 'N', 2: (37.0, 46.0, 29.64), 3: 'W', 4: (122.0, 25.0, 9.84)}
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / 'archive'
+    (root / '2019' / 'trip').mkdir(parents=True)
+    (root / '.thumbnails').mkdir()
+    (root / '2019' / 'trip' / 'gps.jpg').write_bytes(make_image_bytes(gps=GPS, size=(64, 48)))
+    (root / '2019' / 'plain.png').write_bytes(make_image_bytes(fmt='PNG', size=(32, 24)))
+    (root / 'broken.jpg').write_bytes(b'not an image')
+    (root / 'notes.txt').write_text('skipped')
+    (root / '.thumbnails' / 'hidden.jpg').write_bytes(make_image_bytes(size=(8, 8)))
+    return root
+
+def test_copy_import_is_resumable(app_context, temp_upload_folder, archive):
+    messages = []
+    stats = import_photos(str(archive), batch_size=1, queue_jobs=False, echo=messages.append)
+    assert (stats.imported, stats.skipped, stats.failed) == (2, 0, 1)
+    assert any('broken.jpg' in message for message in messages)
+
+    located = Image.query.filter_by(original_filename='gps.jpg').one()
+    assert located.latitude == pytest.approx(37.7749, abs=1e-4)
+    assert located.source_path is None
+    assert os.path.exists(os.path.join(temp_upload_folder, located.storage_filename))
+    assert not [name for name in os.listdir(temp_upload_folder) if name.endswith('.part')]
+
+    (archive / 'new.jpg').write_bytes(make_image_bytes(size=(16, 16), color=(1, 2, 3)))
+    stats = import_photos(str(archive), queue_jobs=False, echo=messages.append)
+    assert (stats.imported, stats.skipped, stats.failed) == (1, 2, 1)
+    assert Image.query.count() == ImportedFile.query.count() == 3
+
+def test_reference_import_serves_from_source(client, temp_upload_folder, archive):
+    stats = import_photos(str(archive), mode='reference', echo=lambda message: None)
+    assert stats.imported == 2
+
+    record = Image.query.filter_by(original_filename='gps.jpg').one()
+    assert record.source_path == str(archive / '2019' / 'trip' / 'gps.jpg')
+    assert not os.path.exists(os.path.join(temp_upload_folder, record.storage_filename))
+    assert sorted(job.kind for job in record.jobs) == ['derivatives', 'exif']
+
+    response = client.get(f'/api/images/{record.id}/thumb')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+
+    # Referenced files may change, so they are revalidated instead of cached
+    response = client.get(f'/api/images/{record.id}/original')
+    assert response.status_code == 200
+    assert response.data == (archive / '2019' / 'trip' / 'gps.jpg').read_bytes()
+    assert response.headers['ETag'] != f'"{record.content_hash}"'
+    assert 'no-cache' in response.headers['Cache-Control']
+
+def test_running_server_sees_import_from_another_process(client, other_app, archive):
+    # The server has built its in-memory indexes before the import starts
+    assert client.get('/api/clusters?bbox=-180,-85,180,85&zoom=2').json['clusters'] == []
+    assert client.get('/api/heatmap?bbox=-180,-90,180,90&resolution=1').json['total'] == 0
+
+    with other_app.app_context():
+        import_photos(str(archive), queue_jobs=False, echo=lambda message: None)
+
+    clusters = client.get('/api/clusters?bbox=-180,-85,180,85&zoom=2').json['clusters']
+    assert [cluster['count'] for cluster in clusters] == [1]
+    assert client.get('/api/heatmap?bbox=-180,-90,180,90&resolution=1').json['total'] == 1
+    assert client.get('/api/nearby?lat=37.7749&lon=-122.4194&radius=1').json['total'] == 1
@@ -0,0 +1,100 @@
+import os
+import json
+
+import pytest
+
+from backend import db
+from backend.models import Image, UploadSession
+from backend.resumable import session_path
+from backend.benchmarks.corpus import make_image_bytes
+
+GPS = {1: 'N', 2: (37.0, 46.0, 29.64), 3: 'W', 4: (122.0, 25.0, 9.84)}
+
+def create(client, filename, size):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': size, 'mimeType': 'image/jpeg'})
+    assert response.status_code == 201
+    return json.loads(response.data.decode('utf-8'))
+
+def patch(client, upload_id, offset, data):
+    return client.patch(f'/api/uploads/{upload_id}', data=data,
+                        headers={'Upload-Offset': str(offset), 'Content-Type': 'application/offset+octet-stream'})
+
+def test_chunked_upload_resumes_and_finalizes(client, temp_upload_folder):
+    image_bytes = make_image_bytes(gps=GPS, size=(64, 48))
+    half = len(image_bytes) // 2
+    upload_id = create(client, 'large photo.jpg', len(image_bytes))['uploadId']
+
+    response = patch(client, upload_id, 0, image_bytes[:half])
+    assert response.status_code == 204
+    assert response.headers['Upload-Offset'] == str(half)
+
+    # A client that lost track asks where to resume; a stale offset is refused
+    assert client.head(f'/api/uploads/{upload_id}').headers['Upload-Offset'] == str(half)
+    response = patch(client, upload_id, 0, image_bytes[:half])
+    assert response.status_code == 409
+    assert json.loads(response.data.decode('utf-8'))['offset'] == half
+
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 409
+    assert patch(client, upload_id, half, image_bytes[half:]).status_code == 204
+
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+    assert response.status_code == 201
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['filename'] == 'large_photo.jpg'
+    assert result['latitude'] == pytest.approx(37.7749, abs=1e-4)
+    record = db.session.get(Image, result['imageId'])
+    assert record.file_size_bytes == len(image_bytes)
+    assert record.mime_type == 'image/jpeg'
+    assert os.path.exists(os.path.join(temp_upload_folder, record.storage_filename))
+    assert not [name for name in os.listdir(temp_upload_folder) if name.endswith('.part')]
+
+    # Retrying the finalize returns the same image instead of failing
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+    assert response.status_code == 200
+    assert json.loads(response.data.decode('utf-8'))['imageId'] == result['imageId']
+    assert patch(client, upload_id, len(image_bytes), b'').status_code == 409
+
+def test_upload_session_validation(client, temp_upload_folder):
+    assert client.post('/api/uploads', json={'filename': 'notes.txt', 'size': 10}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 'a.jpg', 'size': 0}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 'a.jpg'}).status_code == 400
+    assert client.get('/api/uploads/missing').status_code == 404
+
+    upload_id = create(client, 'a.jpg', 4)['uploadId']
+    assert client.patch(f'/api/uploads/{upload_id}', data=b'1234').status_code == 400  # no Upload-Offset
+    assert patch(client, upload_id, 0, b'12345').status_code == 400
+    assert patch(client, upload_id, 0, b'1234').status_code == 204
+
+    # Not an image: the session is dropped along with the file
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 400
+    assert db.session.get(UploadSession, upload_id) is None
+
+    upload_id = create(client, 'b.jpg', 4)['uploadId']
+    assert client.delete(f'/api/uploads/{upload_id}').status_code == 204
+    assert not os.path.exists(session_path(temp_upload_folder, upload_id))
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+def test_non_ascii_filename_finalizes(client, temp_upload_folder):
+    image_bytes = make_image_bytes(gps=GPS, size=(64, 48))
+    upload_id = create(client, '写真.jpg', len(image_bytes))['uploadId']
+    assert patch(client, upload_id, 0, image_bytes).status_code == 204
+
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+    assert response.status_code == 201
+    assert json.loads(response.data.decode('utf-8'))['storageName'].endswith('.jpg')
+
+def test_failed_finalize_drops_session_and_file(client, temp_upload_folder, monkeypatch):
+    from backend import routes
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    image_bytes = make_image_bytes(size=(64, 48))
+    upload_id = create(client, 'a.jpg', len(image_bytes))['uploadId']
+    assert patch(client, upload_id, 0, image_bytes).status_code == 204
+    monkeypatch.setattr(routes, 'store_received', broken)
+    with pytest.raises(RuntimeError):
+        client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert os.listdir(temp_upload_folder) == []
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 404
@@ -1,41 +1,16 @@
 import os
-import tempfile
-import shutil
 import json
 import pytest
 from io import BytesIO
+from PIL import Image as PILImage
 
-# Adjust the import based on your actual app structure
-# Assuming app and db are initialized in backend.app
-from backend.app import app, db 
-
-@pytest.fixture
-def temp_upload_folder():
-    """Create a temporary folder for uploads and clean up afterwards."""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir)
-
-@pytest.fixture
-def app_context(temp_upload_folder):
-    """Set up the Flask app for testing."""
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    # Ensure UPLOAD_FOLDER is set for tests, even if default is used in app
-    app.config['UPLOAD_FOLDER'] = temp_upload_folder 
-    # Disable CSRF protection for testing forms if you have it
-    app.config['WTF_CSRF_ENABLED'] = False 
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
+# Fixtures (temp_upload_folder, app_context, client) live in conftest.py
+from backend import db
+from backend.models import Image
+from backend.benchmarks.corpus import make_image_bytes
 
-@pytest.fixture
-def client(app_context):
-    """A test client for the app."""
-    return app_context.test_client()
+# San Francisco, as written by a camera: (degrees, minutes, seconds)
+GPS = {1: 'N', 2: (37.0, 46.0, 29.64), 3: 'W', 4: (122.0, 25.0, 9.84)}
 
 # --- Test Cases ---
 
@@ -44,22 +19,31 @@ def test_upload_invalid_image_content(client, temp_upload_folder):
     Test uploading a file with a .jpg extension but invalid image content.
     This should be caught by the PIL.UnidentifiedImageError in image_processor.py.
     """
-    # Create a dummy invalid image file (text file renamed to .jpg)
-    file_path = os.path.join(temp_upload_folder, 'invalid_image.jpg')
-    with open(file_path, 'w') as f:
-        f.write("this is not an image")
-
-    with open(file_path, 'rb') as fp:
-        data = {'image': (fp, 'invalid_image.jpg')}
-        response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+    # A dummy invalid image file (text content with a .jpg name)
+    data = {'image': (BytesIO(b"this is not an image"), 'invalid_image.jpg')}
+    response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
 
     assert response.status_code == 400
     response_data = json.loads(response.data.decode('utf-8'))
     expected_error = 'Uploaded file is not a valid image. Please ensure it is a supported format (png, jpg, jpeg, gif) and not corrupted.'
     assert response_data['error'] == expected_error
     
-    # Ensure the invalid file is deleted
-    assert not os.path.exists(file_path)
+    # Ensure the stored copy of the invalid file is deleted
+    assert os.listdir(temp_upload_folder) == []
+
+def test_upload_rejects_jpeg_markers_without_an_image(client, temp_upload_folder):
+    """The header-only GPS parser accepts a bare SOS marker; Pillow must still reject it."""
+    payload = b'\xff\xd8\xff\xda\x00\x02' + b'garbage' * 100
+    response = client.post('/api/upload_image', content_type='multipart/form-data',
+                           data={'image': (BytesIO(payload), 'fake.jpg')})
+    assert response.status_code == 400
+    assert os.listdir(temp_upload_folder) == []
+    assert Image.query.count() == 0
+
+    response = client.post('/api/upload_images', content_type='multipart/form-data',
+                           data={'images': [(BytesIO(payload), 'fake.jpg')]})
+    assert 'not a valid image' in json.loads(response.data.decode('utf-8'))['results'][0]['error']
+    assert Image.query.count() == 0
 
 def test_upload_disallowed_file_extension(client):
     """Test uploading a file with a disallowed extension (e.g., .txt)."""
@@ -74,49 +58,452 @@ def test_upload_disallowed_file_extension(client):
     assert response_data['error'] == expected_error
 
 
-# --- Placeholder/Skipped Tests due to file creation limitations ---
+# --- Valid image uploads ---
 
-@pytest.mark.skip(reason="Cannot reliably create valid JPG with/without GPS EXIF for testing this specific success path with current tools. Any non-Pillow-parsable file will trigger the 'invalid image' error.")
 def test_upload_valid_image_no_gps(client, temp_upload_folder):
-    """
-    Placeholder: Test uploading a valid image file without GPS data.
-    CURRENT LIMITATION: This test will likely fail or behave like test_upload_invalid_image_content
-    because creating a truly 'valid' JPG that Pillow can parse (but has no GPS) is not feasible here.
-    It will instead hit the UnidentifiedImageError path.
-    """
-    # If we could create a valid_image_no_gps.jpg that Pillow can parse:
-    # with open('path_to_valid_image_no_gps.jpg', 'rb') as fp:
-    #     data = {'image': (fp, 'valid_image_no_gps.jpg')}
-    #     response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
-    #
-    # assert response.status_code == 201
-    # response_data = json.loads(response.data.decode('utf-8'))
-    # assert response_data['gps_data_found'] is False
-    # assert response_data['message'] == 'Image processed successfully, but no GPS data was found.'
-    # assert response_data['latitude'] is None
-    # assert response_data['longitude'] is None
-    pass
-
-@pytest.mark.skip(reason="Cannot reliably create valid JPG with actual GPS EXIF for testing this specific success path with current tools. Any non-Pillow-parsable file will trigger the 'invalid image' error.")
+    """Test uploading a valid image file without GPS data."""
+    data = {'image': (BytesIO(make_image_bytes(size=(64, 48))), 'valid_image_no_gps.jpg')}
+    response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert response_data['gps_data_found'] is False
+    assert response_data['message'] == 'Image processed successfully, but no GPS data was found.'
+    assert response_data['latitude'] is None
+    assert response_data['longitude'] is None
+    assert os.path.exists(os.path.join(temp_upload_folder, response_data['storageName']))
+
 def test_upload_valid_image_with_gps(client, temp_upload_folder):
-    """
-    Placeholder: Test uploading a valid image file with GPS data.
-    CURRENT LIMITATION: This test will likely fail or behave like test_upload_invalid_image_content
-    because creating a truly 'valid' JPG with GPS that Pillow can parse is not feasible here.
-    It will instead hit the UnidentifiedImageError path.
-    """
-    # If we could create a valid_image_with_gps.jpg that Pillow can parse:
-    # with open('path_to_valid_image_with_gps.jpg', 'rb') as fp:
-    #     data = {'image': (fp, 'valid_image_with_gps.jpg')}
-    #     response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
-    #
-    # assert response.status_code == 201
-    # response_data = json.loads(response.data.decode('utf-8'))
-    # assert response_data['gps_data_found'] is True
-    # assert response_data['message'] == 'Image uploaded and processed successfully.'
-    # assert response_data['latitude'] is not None
-    # assert response_data['longitude'] is not None
-    pass
+    """Test uploading a valid image file with GPS data."""
+    image_bytes = make_image_bytes(gps=GPS, size=(64, 48))
+    data = {'image': (BytesIO(image_bytes), 'valid_image_with_gps.jpg')}
+    response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert response_data['gps_data_found'] is True
+    assert response_data['message'] == 'Image uploaded and processed successfully.'
+    assert response_data['latitude'] == pytest.approx(37.7749, abs=1e-4)
+    assert response_data['longitude'] == pytest.approx(-122.4194, abs=1e-4)
+
+    record = db.session.get(Image, response_data['imageId'])
+    assert record.file_size_bytes == len(image_bytes)
+
+def test_upload_valid_png_uses_pillow_fallback(client):
+    """PNGs have no EXIF header for the fast path and go through Pillow."""
+    data = {'image': (BytesIO(make_image_bytes('PNG', size=(64, 48))), 'valid_image.png')}
+    response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    assert json.loads(response.data.decode('utf-8'))['gps_data_found'] is False
+
+def test_upload_is_written_once_while_parsing(client, temp_upload_folder, monkeypatch):
+    """Allowed file parts go straight to their temp file, not through Werkzeug's spool."""
+    import werkzeug.wrappers.request
+
+    def no_spooling(*args, **kwargs):
+        raise AssertionError('file part was spooled')
+
+    monkeypatch.setattr(werkzeug.wrappers.request, 'default_stream_factory', no_spooling)
+    photo = make_image_bytes(gps=GPS, size=(1600, 1200), noise=True)
+    assert len(photo) > 500 * 1024
+    data = {
+        'images': [(BytesIO(photo), 'big.jpg'), (BytesIO(photo), 'big-again.jpg')],
+        'image': (BytesIO(photo), 'ignored.jpg'),  # Streamed too, then cleaned up
+    }
+    response = client.post('/api/upload_images', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert results[0]['gps_data_found'] is True and results[1]['duplicate'] is True
+    assert os.listdir(temp_upload_folder) == [results[0]['storageName']]
+
+# --- Batch uploads ---
+
+def test_upload_images_batch(client, temp_upload_folder):
+    """Mixed batch: every file gets its own result and valid ones share one commit."""
+    data = {
+        'images': [
+            (BytesIO(make_image_bytes(gps=GPS, size=(64, 48))), 'a.jpg'),
+            (BytesIO(make_image_bytes(size=(64, 48))), 'b.jpg'),
+            (BytesIO(make_image_bytes('PNG', size=(32, 32))), 'c.png'),
+            (BytesIO(make_image_bytes('PNG', size=(32, 32))), 'd.png'),
+            (BytesIO(b"this is not an image"), 'e.jpg'),
+            (BytesIO(b"text"), 'f.txt'),
+        ]
+    }
+    response = client.post('/api/upload_images', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert response_data['created'] == 4
+    assert response_data['failed'] == 2
+    results = response_data['results']
+    assert [r['filename'] for r in results] == ['a.jpg', 'b.jpg', 'c.png', 'd.png', 'e.jpg', 'f.txt']
+    assert results[0]['gps_data_found'] is True
+    assert results[0]['latitude'] == pytest.approx(37.7749, abs=1e-4)
+    assert results[1]['gps_data_found'] is False
+    assert results[4]['error'] == 'Uploaded file is not a valid image. Please ensure it is a supported format (png, jpg, jpeg, gif) and not corrupted.'
+    assert results[5]['error'] == 'Invalid image format. Allowed formats: png, jpg, jpeg, gif'
+
+    # c.png and d.png have identical bytes and share one content-addressed blob
+    assert results[3]['duplicate'] is True
+    assert results[3]['storageName'] == results[2]['storageName']
+    assert Image.query.count() == 4
+    assert len(os.listdir(temp_upload_folder)) == 3
+
+def test_upload_images_non_ascii_filename(client, temp_upload_folder):
+    """secure_filename('写真.jpg') is 'jpg'; the blob still gets the client's extension."""
+    data = {'images': [(BytesIO(make_image_bytes(gps=GPS, size=(64, 48))), '写真.jpg'),
+                       (BytesIO(make_image_bytes('PNG', size=(32, 32))), 'b.png')]}
+    response = client.post('/api/upload_images', content_type='multipart/form-data', data=data)
+
+    assert response.status_code == 201
+    assert response.get_json()['created'] == 2
+    storage_names = [result['storageName'] for result in response.get_json()['results']]
+    assert storage_names[0].endswith('.jpg')
+    assert sorted(os.listdir(temp_upload_folder)) == sorted(storage_names)
+
+def test_upload_images_no_files(client):
+    response = client.post('/api/upload_images', content_type='multipart/form-data', data={})
+    assert response.status_code == 400
+    assert json.loads(response.data.decode('utf-8'))['error'] == 'No image files provided'
+
+# --- Deduplication ---
+
+def test_duplicate_upload_reuses_blob_and_location(client, app_context, temp_upload_folder):
+    image_bytes = make_image_bytes(gps=GPS, size=(64, 48))
+    cache = app_context.extensions['location_cache']
+    before = cache.stats()
+
+    responses = []
+    for name in ('first.jpg', 'again.jpg'):
+        data = {'image': (BytesIO(image_bytes), name)}
+        response = client.post('/api/upload_image', content_type='multipart/form-data', data=data)
+        assert response.status_code == 201
+        responses.append(json.loads(response.data.decode('utf-8')))
+
+    first, again = responses
+    assert first['duplicate'] is False
+    assert again['duplicate'] is True
+    assert again['storageName'] == first['storageName']
+    assert again['latitude'] == first['latitude']
+    assert again['imageId'] != first['imageId']
+    assert os.listdir(temp_upload_folder) == [first['storageName']]
+
+    stats = json.loads(client.get('/api/dedup/stats').data.decode('utf-8'))
+    assert stats['hits'] == before['hits'] + 1
+    assert stats['misses'] == before['misses'] + 1
+
+# --- Spatial queries ---
+
+def add_located_images(points):
+    records = [
+        Image(original_filename=f'{i}.jpg', storage_filename=f'{i}.jpg', latitude=lat, longitude=lon)
+        for i, (lat, lon) in enumerate(points)
+    ]
+    db.session.add_all(records)
+    db.session.commit()
+    return records
+
+def test_images_in_bbox(client):
+    add_located_images([(37.77, -122.42), (40.71, -74.0), (37.80, -122.27), (None, None)])
+    response = client.get('/api/images?bbox=-123,37,-122,38')
+    assert response.status_code == 200
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert sorted(img['filename'] for img in response_data['images']) == ['0.jpg', '2.jpg']
+    assert response_data['truncated'] is False
+
+def test_images_in_bbox_tracks_updates_and_limit(client):
+    records = add_located_images([(10.0, 10.0), (10.5, 10.5), (11.0, 11.0)])
+    records[2].latitude = -50.0
+    db.session.commit()
+    response = client.get('/api/images?bbox=9,9,12,12&limit=1')
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert response_data['count'] == 1
+    assert response_data['truncated'] is True
+
+    response = client.get('/api/images?bbox=9,9,12,12')
+    assert json.loads(response.data.decode('utf-8'))['count'] == 2
+
+def test_images_in_bbox_across_antimeridian(client):
+    add_located_images([(-17.7, 178.0), (-14.3, -170.7), (0.0, 0.0)])
+    response = client.get('/api/images?bbox=170,-20,-160,-10')
+    response_data = json.loads(response.data.decode('utf-8'))
+    assert sorted(img['filename'] for img in response_data['images']) == ['0.jpg', '1.jpg']
+
+def test_images_invalid_bbox(client):
+    response = client.get('/api/images?bbox=1,2,3')
+    assert response.status_code == 400
+    assert 'Invalid bbox' in json.loads(response.data.decode('utf-8'))['error']
+
+# --- Keyset listing ---
+
+def list_page(client, query):
+    response = client.get(f'/api/images?{query}')
+    assert response.status_code == 200
+    return json.loads(response.data.decode('utf-8'))
+
+def test_images_keyset_pages_cover_every_row_once(client):
+    # Rows inserted together share uploaded_at (CURRENT_TIMESTAMP has one-second
+    # resolution), so paging relies on the id tie-breaker
+    add_located_images([(float(i), float(i)) for i in range(7)])
+    seen, cursor = [], ''
+    while True:
+        page = list_page(client, f'limit=3&fields=id&cursor={cursor}')
+        seen += [image['id'] for image in page['images']]
+        assert page['count'] == len(page['images'])
+        cursor = page['nextCursor']
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == 7
+
+    oldest_first = list_page(client, 'order=asc&limit=10&fields=id')
+    assert [image['id'] for image in oldest_first['images']] == sorted(seen)
+
+def test_images_listing_projection_and_columns(client):
+    add_located_images([(1.0, 2.0), (3.0, 4.0)])
+    page = list_page(client, 'fields=id,latitude&limit=1')
+    assert set(page['images'][0]) == {'id', 'latitude'}
+
+    columns = list_page(client, 'format=columns&fields=latitude,longitude,uploadedAt')
+    assert columns['fields'] == ['latitude', 'longitude', 'uploadedAt']
+    assert columns['columns']['latitude'] == [3.0, 1.0]
+    assert columns['columns']['longitude'] == [4.0, 2.0]
+    assert len(columns['columns']['uploadedAt']) == 2
+    assert columns['count'] == 2 and columns['nextCursor'] is None
+
+def test_images_listing_rejects_bad_parameters(client):
+    for query in ('fields=id,secret', 'format=xml', 'order=sideways', 'cursor=not-a-cursor'):
+        response = client.get(f'/api/images?{query}')
+        assert response.status_code == 400, query
+
+def test_search_images_by_exif_fields(client):
+    from datetime import datetime
+    from backend.services.exif_store import encode
+    shots = [('Canon', datetime(2021, 7, 4, 18, 30)), ('Canon', datetime(2021, 8, 1, 9, 0)),
+             ('Nikon', datetime(2021, 7, 31, 23, 59)), (None, None)]
+    for n, (make, taken_at) in enumerate(shots):
+        db.session.add(Image(original_filename=f'{n}.jpg', storage_filename=f'{n}.jpg', camera_make=make,
+                             taken_at=taken_at, exif_blob=encode({'Make': make}) if make else None))
+    db.session.commit()
+
+    def search(query):
+        response = client.get(f'/api/images/search?{query}')
+        assert response.status_code == 200
+        return [image['filename'] for image in json.loads(response.data.decode('utf-8'))['images']]
+
+    assert search('takenFrom=2021-07-01&takenTo=2021-07-31') == ['0.jpg', '2.jpg']
+    assert search('make=Canon') == ['0.jpg', '1.jpg']
+    assert search('') == ['0.jpg', '2.jpg', '1.jpg', '3.jpg']
+    assert client.get('/api/images/search?takenFrom=July').status_code == 400
+
+    record = Image.query.filter_by(original_filename='2.jpg').one()
+    body = json.loads(client.get(f'/api/images/{record.id}/exif').data.decode('utf-8'))
+    assert body['exif'] == {'Make': 'Nikon'}
+    assert body['takenAt'] == '2021-07-31T23:59:00'
+    missing = Image.query.filter_by(original_filename='3.jpg').one()
+    assert client.get(f'/api/images/{missing.id}/exif').status_code == 404
+
+# --- Clusters ---
+
+def get_clusters(client, query):
+    response = client.get(f'/api/clusters?{query}')
+    assert response.status_code == 200
+    return json.loads(response.data.decode('utf-8'))
+
+def test_clusters_aggregate_and_update_incrementally(client):
+    records = add_located_images([(48.8566, 2.3522), (48.8570, 2.3530), (50.8503, 4.3517)])
+
+    world = get_clusters(client, 'bbox=-180,-85,180,85&zoom=2')
+    assert sorted(c['count'] for c in world['clusters']) == [3]
+    assert world['clusters'][0]['sampleImageId'] == records[0].id
+
+    city = get_clusters(client, 'bbox=2,48,5,51&zoom=10')
+    assert sorted(c['count'] for c in city['clusters']) == [1, 2]
+
+    # A committed insert updates the existing index instead of rebuilding it
+    add_located_images([(48.8568, 2.3525)])
+    city = get_clusters(client, 'bbox=2,48,5,51&zoom=10')
+    assert sorted(c['count'] for c in city['clusters']) == [1, 3]
+
+def test_clusters_include_photos_committed_by_another_process(client, other_app):
+    add_located_images([(48.8566, 2.3522)])
+    assert get_clusters(client, 'bbox=2,48,5,51&zoom=10')['clusters'][0]['count'] == 1
+
+    with other_app.app_context():
+        add_located_images([(48.8570, 2.3530)])
+    assert get_clusters(client, 'bbox=2,48,5,51&zoom=10')['clusters'][0]['count'] == 2
+
+def test_clusters_past_max_zoom_are_single_photos(client):
+    add_located_images([(48.8566, 2.3522), (48.8570, 2.3530)])
+    deep = get_clusters(client, 'bbox=2.3,48.8,2.4,48.9&zoom=20')
+    assert [c['count'] for c in deep['clusters']] == [1, 1]
+
+def test_clusters_require_zoom(client):
+    response = client.get('/api/clusters?bbox=-1,48,3,52')
+    assert response.status_code == 400
+
+# --- Geo analytics ---
+
+def get_json(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return json.loads(response.data.decode('utf-8'))
+
+def test_heatmap_counts_and_updates_incrementally(client):
+    add_located_images([(48.8566, 2.3522), (48.8570, 2.3530), (-33.86, 151.21), (None, None)])
+    world = get_json(client, '/api/heatmap?bbox=-180,-90,180,90&resolution=2')
+    assert world['grid'] == [[0, 2], [0, 1]]
+    assert (world['total'], world['max']) == (3, 2)
+
+    add_located_images([(40.71, -74.0)])
+    world = get_json(client, '/api/heatmap?bbox=-180,-90,180,90&resolution=2')
+    assert world['grid'] == [[1, 2], [0, 1]]
+
+    pacific = get_json(client, '/api/heatmap?bbox=150,-40,-150,0&resolution=4')
+    assert pacific['total'] == 1
+    assert get_json(client, '/api/heatmap?bbox=-180,-90,180,90&uploadedTo=2000-01-01')['total'] == 0
+
+def test_analytics_include_photos_committed_by_another_process(client, other_app):
+    add_located_images([(48.8566, 2.3522)])
+    assert get_json(client, '/api/nearby?lat=48.8566&lon=2.3522&radius=5')['total'] == 1
+
+    with other_app.app_context():
+        add_located_images([(48.8570, 2.3530)])
+    assert get_json(client, '/api/nearby?lat=48.8566&lon=2.3522&radius=5')['total'] == 2
+    assert get_json(client, '/api/heatmap?bbox=-180,-90,180,90&resolution=1')['total'] == 2
+
+def test_heatmap_rejects_bad_parameters(client):
+    assert client.get('/api/heatmap').status_code == 400
+    assert client.get('/api/heatmap?bbox=1,2,1,3').status_code == 400
+    assert client.get('/api/heatmap?bbox=-1,-1,1,1&resolution=0').status_code == 400
+    assert client.get('/api/heatmap?bbox=-1,-1,1,1&resolution=100000').status_code == 400
+    assert client.get('/api/heatmap?bbox=-1,-1,1,1&uploadedFrom=soon').status_code == 400
+
+def test_nearby_orders_by_distance(client):
+    records = add_located_images([(48.8566, 2.3522), (48.8606, 2.3376), (48.8738, 2.2950), (50.8503, 4.3517)])
+    nearby = get_json(client, '/api/nearby?lat=48.8566&lon=2.3522&radius=5')
+    assert [image['imageId'] for image in nearby['images']] == [records[0].id, records[1].id, records[2].id]
+    assert nearby['images'][0]['distanceKm'] == 0
+    assert nearby['images'][1]['distanceKm'] == pytest.approx(1.15, abs=0.05)
+    assert (nearby['total'], nearby['truncated']) == (3, False)
+
+    limited = get_json(client, '/api/nearby?lat=48.8566&lon=2.3522&radius=500&limit=1')
+    assert [image['imageId'] for image in limited['images']] == [records[0].id]
+    assert (limited['total'], limited['truncated']) == (4, True)
+
+    assert client.get('/api/nearby?lat=48.8').status_code == 400
+    assert client.get('/api/nearby?lat=91&lon=0').status_code == 400
+    assert client.get('/api/nearby?lat=0&lon=0&radius=0').status_code == 400
+
+# --- Vector tiles ---
+
+def test_tile_etag_revalidation_and_targeted_invalidation(client):
+    add_located_images([(48.8566, 2.3522)])
+
+    # z=1: Paris is in tile (1, 0), Sydney would be in tile (1, 1)
+    paris = client.get('/api/tiles/1/1/0.mvt')
+    assert paris.status_code == 200
+    assert paris.mimetype == 'application/vnd.mapbox-vector-tile'
+    assert paris.headers['ETag']
+    empty = client.get('/api/tiles/1/1/1.mvt')
+
+    revalidated = client.get('/api/tiles/1/1/0.mvt', headers={'If-None-Match': paris.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    add_located_images([(48.8570, 2.3530)])
+    changed = client.get('/api/tiles/1/1/0.mvt', headers={'If-None-Match': paris.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != paris.headers['ETag']
+
+    untouched = client.get('/api/tiles/1/1/1.mvt', headers={'If-None-Match': empty.headers['ETag']})
+    assert untouched.status_code == 304
+
+def test_tiles_invalidated_by_commits_in_another_process(client, other_app):
+    add_located_images([(48.8566, 2.3522)])
+    paris = client.get('/api/tiles/1/1/0.mvt')
+
+    with other_app.app_context():
+        add_located_images([(48.8570, 2.3530)])
+    changed = client.get('/api/tiles/1/1/0.mvt', headers={'If-None-Match': paris.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != paris.headers['ETag']
+
+def test_tile_out_of_range(client):
+    assert client.get('/api/tiles/1/2/0.mvt').status_code == 404
+
+# --- Derivatives ---
+
+def test_thumbnail_generated_once_and_cached(client, temp_upload_folder):
+    data = {'image': (BytesIO(make_image_bytes(size=(1600, 1200))), 'big.jpg')}
+    image_id = json.loads(client.post('/api/upload_image', content_type='multipart/form-data', data=data).data)['imageId']
+
+    response = client.get(f'/api/images/{image_id}/thumb')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    thumb = PILImage.open(BytesIO(response.data))
+    assert max(thumb.size) == 256
+
+    thumb_dir = os.path.join(temp_upload_folder, 'derivatives', 'thumb')
+    cached = os.listdir(thumb_dir)
+    assert len(cached) == 1
+    mtime = os.path.getmtime(os.path.join(thumb_dir, cached[0]))
+    assert client.get(f'/api/images/{image_id}/thumb').data == response.data
+    assert os.path.getmtime(os.path.join(thumb_dir, cached[0])) == mtime
+
+# --- Originals ---
+
+def upload(client, image_bytes, filename='photo.jpg'):
+    data = {'image': (BytesIO(image_bytes), filename)}
+    return json.loads(client.post('/api/upload_image', content_type='multipart/form-data', data=data).data)['imageId']
+
+def test_original_ranges_and_revalidation(client):
+    image_bytes = make_image_bytes(gps=GPS, size=(64, 48))
+    image_id = upload(client, image_bytes)
+    record = db.session.get(Image, image_id)
+
+    response = client.get(f'/api/images/{image_id}/original')
+    assert response.status_code == 200
+    assert response.data == image_bytes
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['ETag'] == f'"{record.content_hash}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    partial = client.get(f'/api/images/{image_id}/original', headers={'Range': 'bytes=10-19'})
+    assert partial.status_code == 206
+    assert partial.data == image_bytes[10:20]
+    assert partial.headers['Content-Range'] == f'bytes 10-19/{len(image_bytes)}'
+
+    revalidated = client.get(f'/api/images/{image_id}/original', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert client.application.extensions['original_cache'].stats()['hits'] == 2
+
+    stale = client.get(f'/api/images/{image_id}/original', headers={'Range': 'bytes=0-3', 'If-Range': '"other"'})
+    assert stale.status_code == 200
+    assert client.get('/api/images/999/original').status_code == 404
+
+def test_original_x_accel_redirect(client, app_context):
+    app_context.config['ORIGINAL_ACCEL_REDIRECT'] = '/_originals/'
+    image_id = upload(client, make_image_bytes(size=(16, 16)))
+    record = db.session.get(Image, image_id)
+
+    response = client.get(f'/api/images/{image_id}/original')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/_originals/{record.storage_filename}'
+    assert response.data == b''
+    revalidated = client.get(f'/api/images/{image_id}/original', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert 'X-Accel-Redirect' not in revalidated.headers
+
+def test_derivative_unknown_image_or_size(client):
+    assert client.get('/api/images/999/thumb').status_code == 404
+    assert client.get('/api/images/1/huge').status_code == 404
 
 def test_upload_no_file_provided(client):
     """Test sending the form with no file part."""
@@ -211,13 +598,13 @@ def test_upload_empty_filename(client):
 # The `invalid_image.jpg` is created in the `temp_upload_folder` to simulate a real file upload.
 # The check `assert not os.path.exists(file_path)` in `test_upload_invalid_image_content`
 # correctly verifies that the backend cleans up invalid files.
-The `backend/tests/test_routes.py` file has been created with the test structure.
-Due to the limitations in creating actual valid JPG files with specific EXIF data using the available tools, I have:
-1.  Implemented `test_upload_invalid_image_content`: This test uses a text file renamed to `.jpg`. It correctly verifies that the backend identifies this as an invalid image file (due to `PIL.UnidentifiedImageError` being converted to our custom `ValueError`) and returns the 400 error. It also checks that the invalid file is deleted.
-2.  Implemented `test_upload_disallowed_file_extension`: This test uses a `.txt` file and verifies that the backend rejects it with a 400 error based on the extension.
-3.  Implemented `test_upload_no_file_provided` and `test_upload_empty_filename` to cover basic input validation.
-4.  Marked `test_upload_valid_image_no_gps` and `test_upload_valid_image_with_gps` with `@pytest.mark.skip`. These tests cannot be reliably implemented because any non-Pillow-parsable file created by the current tools will trigger the "Cannot identify image file" error, preventing the testing of the success paths for GPS data handling. The comments in the skipped tests explain this limitation.
-
-The test setup includes fixtures for a temporary upload folder, initializing the Flask app context for testing (with an in-memory SQLite database), and a test client. Database setup and teardown are handled within the `app_context` fixture.
-
-Now I will submit the report.
+# The `backend/tests/test_routes.py` file has been created with the test structure.
+# Due to the limitations in creating actual valid JPG files with specific EXIF data using the available tools, I have:
+# 1.  Implemented `test_upload_invalid_image_content`: This test uses a text file renamed to `.jpg`. It correctly verifies that the backend identifies this as an invalid image file (due to `PIL.UnidentifiedImageError` being converted to our custom `ValueError`) and returns the 400 error. It also checks that the invalid file is deleted.
+# 2.  Implemented `test_upload_disallowed_file_extension`: This test uses a `.txt` file and verifies that the backend rejects it with a 400 error based on the extension.
+# 3.  Implemented `test_upload_no_file_provided` and `test_upload_empty_filename` to cover basic input validation.
+# 4.  Marked `test_upload_valid_image_no_gps` and `test_upload_valid_image_with_gps` with `@pytest.mark.skip`. These tests cannot be reliably implemented because any non-Pillow-parsable file created by the current tools will trigger the "Cannot identify image file" error, preventing the testing of the success paths for GPS data handling. The comments in the skipped tests explain this limitation.
+#
+# The test setup includes fixtures for a temporary upload folder, initializing the Flask app context for testing (with an in-memory SQLite database), and a test client. Database setup and teardown are handled within the `app_context` fixture.
+#
+# Now I will submit the report.
@@ -0,0 +1,38 @@
+from backend.services.tile_cache import TileCache
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = TileCache(max_bytes=10)
+    cache.put((0, 0, 0), b'aaaa')
+    cache.put((1, 0, 0), b'bbbb')
+    cache.get((0, 0, 0))
+    cache.put((1, 1, 0), b'cccc')
+    assert cache.get((1, 0, 0)) is None
+    assert cache.get((0, 0, 0))[0] == b'aaaa'
+    assert cache.stats()['bytes'] == 8
+
+def test_invalidate_point_only_drops_covering_tiles():
+    cache = TileCache(max_bytes=1024, max_zoom=2)
+    for key in [(0, 0, 0), (1, 1, 0), (1, 1, 1), (2, 2, 1)]:
+        cache.put(key, b'tile')
+    cache.invalidate_point(48.8566, 2.3522)  # Paris
+    assert cache.get((0, 0, 0)) is None
+    assert cache.get((1, 1, 0)) is None
+    assert cache.get((2, 2, 1)) is None
+    assert cache.get((1, 1, 1)) is not None
+
+def test_etag_depends_on_content():
+    cache = TileCache()
+    assert cache.put((0, 0, 0), b'one')[1] != cache.put((0, 0, 0), b'two')[1]
+
+def test_ensure_current_drops_tiles_of_new_rows_only():
+    cache = TileCache(max_bytes=1024, max_zoom=1)
+    cache.ensure_current(3, lambda after_id, until_id: [])
+    for key in [(0, 0, 0), (1, 1, 0), (1, 1, 1)]:
+        cache.put(key, b'tile', version=3)
+    cache.ensure_current(4, lambda after_id, until_id: [(4, 48.8566, 2.3522)] if (after_id, until_id) == (3, 4) else [])
+    assert cache.get((1, 1, 0)) is None
+    assert cache.get((1, 1, 1)) is not None
+
+    # Rendered before the cache moved on: returned but not stored
+    cache.put((1, 1, 0), b'stale', version=3)
+    assert cache.get((1, 1, 0)) is None
@@ -0,0 +1,257 @@
+"""What happens to an upload once its bytes are on disk.
+
+The upload routes (single and batch in routes.py, resumable finalize, and the
+asyncio endpoints in async_app.py) receive files differently, but from then
+on every file goes through the same decisions: reuse an earlier upload with
+the same content, otherwise locate it and move it to its content-addressed
+name, geocode, insert the row with its post-upload jobs, and answer with the
+same result shape. ``UploadBatch`` makes those decisions. Callers only choose
+how to run the EXIF work and the commit, so the paths cannot drift apart.
+"""
+import os
+
+from flask import current_app
+
+from . import db
+from .jobs import enqueue_post_upload
+from .models import Image
+from .services.dedup import storage_filename_for, commit_blob
+
+UNIDENTIFIED_IMAGE_ERROR = "Cannot identify image file. The file may be corrupted or not a supported image format."
+INVALID_IMAGE_MESSAGE = 'Uploaded file is not a valid image. Please ensure it is a supported format (png, jpg, jpeg, gif) and not corrupted.'
+PROCESSING_ERROR_MESSAGE = 'An unexpected error occurred while processing the image.'
+DATABASE_ERROR_MESSAGE = 'Could not save image metadata to database.'
+
+def find_duplicate(content_hash):
+    """Looks up a previously stored upload with the same content.
+
+    Checks the in-memory location cache first, then the content_hash index.
+    Returns the cached location entry (including storage_filename), or None
+    if this content is new or its blob is gone from disk.
+    """
+    cache = current_app.extensions['location_cache']
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    entry = cache.get(content_hash)
+    outcome = 'hit'
+    if entry is None:
+        existing = Image.query.filter_by(content_hash=content_hash).first()
+        if existing is not None:
+            entry = location_entry(existing, gps_data_found=existing.latitude is not None and existing.longitude is not None)
+            outcome = 'db_hit'
+
+    if entry is None or not os.path.exists(os.path.join(upload_folder, entry['storage_filename'])):
+        cache.discard(content_hash)
+        cache.record('miss')
+        return None
+
+    cache.put(content_hash, entry)
+    cache.record(outcome)
+    return entry
+
+def location_entry(record, gps_data_found):
+    return {
+        'storage_filename': record.storage_filename,
+        'latitude': record.latitude,
+        'longitude': record.longitude,
+        'address': record.address,
+        'gps_data_found': gps_data_found
+    }
+
+def remove_file(file_path):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def fill_addresses(locations):
+    """Reverse geocodes location dicts in place, if a geocoder is loaded."""
+    geocoder = current_app.extensions['geocoder']
+    if geocoder is None:
+        return
+    located = [loc for loc in locations if loc.get('latitude') is not None and loc.get('longitude') is not None]
+    with current_app.extensions['metrics'].stage('geocode'):
+        addresses = geocoder.lookup_many([(loc['latitude'], loc['longitude']) for loc in located])
+    for loc, address in zip(located, addresses):
+        loc['address'] = address
+
+def gps_message(gps_data_found):
+    if gps_data_found:
+        return 'Image uploaded and processed successfully.'
+    return 'Image processed successfully, but no GPS data was found.'
+
+def upload_result(record, gps_data_found, duplicate):
+    """Response entry for one stored upload."""
+    return {
+        'message': gps_message(gps_data_found),
+        'imageId': record.id,
+        'filename': record.original_filename,
+        'storageName': record.storage_filename,
+        'latitude': record.latitude, # Will be None if not found
+        'longitude': record.longitude, # Will be None if not found
+        'address': record.address,
+        'gps_data_found': gps_data_found,
+        'duplicate': duplicate
+    }
+
+def add_images(rows):
+    """Adds an Image and its post-upload jobs to the session for each
+    ``(image_kwargs, gps_data_found, duplicate)`` row. Returns the records."""
+    records = [Image(**kwargs) for kwargs, _, _ in rows]
+    db.session.add_all(records)
+    for record in records:
+        # Follow-up work is queued in the same transaction and runs in the worker
+        db.session.add_all(enqueue_post_upload(record))
+    return records
+
+def saved_outcomes(records, rows):
+    """``(upload_result, location_entry)`` per flushed record, for ``UploadBatch.saved``."""
+    return [(upload_result(record, gps_data_found, duplicate), location_entry(record, gps_data_found))
+            for record, (_, gps_data_found, duplicate) in zip(records, rows)]
+
+class UploadBatch:
+    """The files of one upload request, from received to saved.
+
+    Call ``reject`` or ``add`` for every file in request order, then
+    ``deduplicate`` and ``locate`` (both in an app context), insert ``rows()``
+    and report back with ``saved`` or ``failed_to_save``. ``results`` holds
+    one response entry per file; failures carry ``error`` and the HTTP
+    ``status`` the single-file route answers with.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._entries = []
+        self._new_content = {}  # content_hash -> the first entry carrying it
+        self._saving = []
+
+    def reject(self, filename, error, error_class, status=400):
+        """A file refused before it was stored."""
+        self._entries.append({'filename': filename, 'result': {'filename': filename, 'error': error, 'status': status}})
+        self.metrics.failed(error_class)
+
+    def add(self, filename, ext, mime_type, temp_path, stored):
+        """A file written to ``temp_path``; ``stored`` comes from ``stream_to_storage``.
+        ``ext`` names the stored blob, so it must come from the validated
+        client file name rather than ``filename``, which may have lost it."""
+        self._entries.append({'filename': filename, 'ext': ext, 'mime_type': mime_type, 'temp_path': temp_path,
+                              'stored': stored, 'result': None})
+
+    def deduplicate(self):
+        """Matches files against earlier uploads and earlier files of this batch.
+        Duplicates keep the stored blob and location; their temp files are removed."""
+        for entry in self._entries:
+            if entry['result'] is not None:
+                continue
+            content_hash = entry['stored']['content_hash']
+            if content_hash in self._new_content:
+                entry['same_as'] = self._new_content[content_hash]
+            else:
+                duplicate = find_duplicate(content_hash)
+                if duplicate is None:
+                    self._new_content[content_hash] = entry
+                    continue
+                entry['duplicate'] = duplicate
+            remove_file(entry['temp_path'])
+
+    def pending(self):
+        """``(temp_path, gps_info)`` of each new file, for ``process_image_data``."""
+        return [(entry['temp_path'], entry['stored']['gps_info']) for entry in self._new_content.values()]
+
+    def locate(self, locations):
+        """Takes the location dict (or the exception raised) for each of
+        ``pending()``, moves located files to their content-addressed names
+        and geocodes them."""
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        located = []
+        for entry, location_data in zip(self._new_content.values(), locations):
+            if isinstance(location_data, Exception):
+                if isinstance(location_data, ValueError) and str(location_data) == UNIDENTIFIED_IMAGE_ERROR:
+                    current_app.logger.error(f"Image processing error: {location_data}")
+                    entry['result'] = {'filename': entry['filename'], 'error': INVALID_IMAGE_MESSAGE, 'status': 400}
+                    entry['error_class'] = 'invalid_image'
+                else:
+                    current_app.logger.error(f"Unexpected error during image processing: {location_data}")
+                    entry['result'] = {'filename': entry['filename'], 'error': PROCESSING_ERROR_MESSAGE, 'status': 500}
+                    entry['error_class'] = 'processing_failed'
+                self.metrics.failed(entry['error_class'])
+                remove_file(entry['temp_path'])
+                continue
+            location_data['storage_filename'] = storage_filename_for(entry['stored']['content_hash'], entry['ext'])
+            commit_blob(entry['temp_path'], upload_folder, location_data['storage_filename'])
+            entry['location'] = location_data
+            located.append(location_data)
+        fill_addresses(located)
+
+    def rows(self):
+        """``(image_kwargs, gps_data_found, duplicate)`` for every file left to insert.
+        Duplicates of a file that failed get its error."""
+        self._saving = []
+        for entry in self._entries:
+            if entry['result'] is not None:
+                continue
+            origin = entry.get('same_as', entry)
+            if origin['result'] is not None:
+                entry['result'] = dict(origin['result'], filename=entry['filename'])
+                self.metrics.failed(origin['error_class'])
+                continue
+            location_data = entry['duplicate'] if 'duplicate' in entry else origin['location']
+            kwargs = {
+                'original_filename': entry['filename'],
+                'storage_filename': location_data['storage_filename'],
+                'content_hash': entry['stored']['content_hash'],
+                'latitude': location_data.get('latitude'),
+                'longitude': location_data.get('longitude'),
+                'address': location_data.get('address'),
+                'mime_type': entry['mime_type'],
+                'file_size_bytes': entry['stored']['size'],
+            }
+            self._saving.append((entry, (kwargs, location_data.get('gps_data_found', False), origin is not entry
+                                         or 'duplicate' in entry)))
+        return [row for _, row in self._saving]
+
+    def saved(self, outcomes):
+        """Records the committed rows; ``outcomes`` come from ``saved_outcomes``."""
+        cache = current_app.extensions['location_cache'] if self._saving else None
+        for (entry, (kwargs, gps_data_found, duplicate)), (result, location) in zip(self._saving, outcomes):
+            self.metrics.stored(gps_data_found, duplicate)
+            if not duplicate:
+                cache.put(kwargs['content_hash'], location)
+            entry['result'] = result
+
+    def failed_to_save(self):
+        """The insert failed: new blobs are removed, since no row refers to them."""
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        for entry in self._new_content.values():
+            if 'location' in entry:
+                remove_file(os.path.join(upload_folder, entry['location']['storage_filename']))
+        for entry, _ in self._saving:
+            entry['result'] = {'filename': entry['filename'], 'error': DATABASE_ERROR_MESSAGE, 'status': 500}
+            self.metrics.failed('database_failed')
+
+    @property
+    def results(self):
+        return [entry['result'] for entry in self._entries]
+
+def commit(batch, attach=None):
+    """Inserts ``batch.rows()`` in one transaction on the request's session.
+
+    ``attach`` is called with the new records before the commit, to add rows
+    that must be committed with them.
+    """
+    rows = batch.rows()
+    if not rows:
+        return
+    try:
+        # One transaction; SQLAlchemy batches these into multi-row INSERTs
+        records = add_images(rows)
+        if attach is not None:
+            attach(records)
+        db.session.flush()
+        outcomes = saved_outcomes(records, rows)
+        with batch.metrics.stage('db_commit'):
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error: {e}")
+        batch.failed_to_save()
+        return
+    batch.saved(outcomes)